@@ -0,0 +1,220 @@
+"""
+Benchmark por etapa del pipeline CNPV + MGN y de la carga del dashboard.
+
+Sobre datos de ``benchmarks.sinteticos`` (o los reales, con la misma
+estructura de carpetas) mide cada paso por separado: lectura, mapeo de
+códigos, reclasificación y agregación por manzana de viviendas y hogares,
+unión viv/hog, lectura y unión con la geometría, indicadores, exportación
+GeoParquet, el pipeline completo (en frío y en caché) y el
+``cargar_datos`` del dashboard. También informa la memoria de cada tabla
+con el esquema compacto y con los tipos por defecto (``miv.esquema``).
+El resultado se escribe en JSON (versión del código, entorno, parámetros,
+segundos/filas por etapa y memoria por tabla) para comparar versiones con
+``--comparar``.
+
+Uso (desde cnpv_mgn_integration/manzanas_co):
+
+    python -m benchmarks.sinteticos --salida /tmp/cnpv_sint --manzanas 20000
+    python -m benchmarks.bench_etapas --datos /tmp/cnpv_sint --dpto 66 \\
+        --resultado bench_66.json [--comparar bench_anterior.json]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from miv.esquema import CLAVE_MANZANA, informar_memoria, reporte_memoria
+from miv.etapas import AlmacenEtapas
+from miv.exportar import exportar_geoparquet
+from miv.indicadores import DERIVADOS, Indicadores
+from miv.ingesta import (
+    CLAVE_ENCUESTA, TABLA_HOG, TABLA_VIV, TAM_BLOQUE, conteos_de_bloque, leer_mgn,
+    leer_por_bloques, porcentajes_de_conteos, tabla_de_conteos,
+)
+from miv.nacional import descubrir_departamentos
+from miv.pipeline import (
+    COLUMNAS_CONSERVAR, COLUMNAS_MANZANAS, ejecutar_pipeline, etapa_clean, etapa_join,
+    etapa_manzanas, etapa_mzn_completo,
+)
+from miv.reclasificacion import reclasificar
+
+DIR_DASHBOARD = Path(__file__).resolve().parents[3] / 'dashboard_cordoba'
+
+
+@contextmanager
+def medir(nombre, resultados):
+    """
+    Cronometra el bloque; ``registro['filas']`` se puede fijar dentro
+    """
+    registro = {'etapa': nombre, 'filas': None}
+    inicio = time.perf_counter()
+    yield registro
+    registro['segundos'] = round(time.perf_counter() - inicio, 4)
+    resultados.append(registro)
+    filas = f"{registro['filas']:>12,}" if registro['filas'] is not None else ' ' * 12
+    print(f"  {nombre:<28} {registro['segundos']:>9.3f} s {filas}")
+
+
+def medir_pipeline(rutas, tam_bloque=TAM_BLOQUE):
+    """
+    Segundos por etapa y memoria por tabla (antes/después del esquema)
+    """
+    resultados = []
+    memoria = []
+    with medir('ingesta_mgn', resultados) as r:
+        mapeo = leer_mgn(rutas['mgn'], tam_bloque)
+        r['filas'] = len(mapeo)
+    memoria.append(reporte_memoria({'mgn': mapeo.reset_index()}))
+
+    agregados = {}
+    for nombre, tabla in (('viv', TABLA_VIV), ('hog', TABLA_HOG)):
+        with medir(f'lectura_{nombre}', resultados) as r:
+            df = pd.concat(leer_por_bloques(rutas[nombre], tabla['dtypes'], tam_bloque),
+                           ignore_index=True)
+            r['filas'] = len(df)
+        with medir(f'mapeo_codigos_{nombre}', resultados) as r:
+            df = df.dropna(subset=tabla['no_nulas'])
+            df[CLAVE_MANZANA] = df[CLAVE_ENCUESTA].map(mapeo)
+            r['filas'] = len(df)
+        with medir(f'reclasificacion_{nombre}', resultados) as r:
+            df = reclasificar(df, tabla['registro'], {})
+            r['filas'] = len(df)
+        memoria.append(reporte_memoria({f'{nombre}_reclas': df}))
+        with medir(f'agregacion_{nombre}', resultados) as r:
+            manzanas = mapeo.cat.categories
+            conteos = tabla_de_conteos(conteos_de_bloque(df, len(manzanas), tabla), manzanas)
+            agregados[nombre] = porcentajes_de_conteos(conteos, tabla)
+            r['filas'] = len(agregados[nombre])
+
+    with medir('union_viv_hog', resultados) as r:
+        completo = etapa_mzn_completo(agregados['viv'], agregados['hog'])
+        r['filas'] = len(completo)
+    with medir('lectura_manzanas', resultados) as r:
+        manzanas = etapa_manzanas(rutas['manzanas'], COLUMNAS_MANZANAS)
+        r['filas'] = len(manzanas)
+    with medir('union_geometria', resultados) as r:
+        unido = etapa_join(manzanas, completo)
+        r['filas'] = len(unido)
+    with medir('indicadores', resultados) as r:
+        final = etapa_clean(unido, COLUMNAS_CONSERVAR)
+        Indicadores(final).tabla(DERIVADOS)
+        r['filas'] = len(final)
+    memoria.append(reporte_memoria({'viv_agg': agregados['viv'], 'hog_agg': agregados['hog'],
+                                    'manzanas': manzanas, 'mnz_clean': final}))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with medir('exportar_geoparquet', resultados) as r:
+            exportar_geoparquet(final, Path(tmp) / 'mnz.parquet')
+            r['filas'] = len(final)
+        almacen = AlmacenEtapas(Path(tmp) / 'cache', verbose=False)
+        for nombre in ('pipeline_frio', 'pipeline_en_cache'):
+            with medir(nombre, resultados) as r:
+                etapas = ejecutar_pipeline(rutas, None, tam_bloque=tam_bloque,
+                                           almacen=almacen, estricto=False)
+                r['filas'] = len(etapas['mnz_clean'].valor())
+    return resultados, pd.concat(memoria, ignore_index=True)
+
+
+def medir_dashboard(directorio=DIR_DASHBOARD):
+    """
+    ``cargar_datos`` del dashboard (ruta completa y artefacto precalculado)
+    """
+    resultados = []
+    if not Path(directorio).exists():
+        return resultados
+    sys.path.insert(0, str(directorio))
+    import datos
+    from cubo import Cubo
+
+    with medir('dashboard_procesar', resultados) as r:
+        tabla, col_nom, _, _ = datos.procesar()
+        r['filas'] = len(tabla)
+    if datos.artefacto_vigente():
+        with medir('dashboard_artefacto', resultados) as r:
+            tabla, col_nom, _, _ = datos.leer_artefacto()
+            r['filas'] = len(tabla)
+    with medir('dashboard_cargar_datos', resultados) as r:
+        tabla, col_nom, _, _ = datos.cargar()
+        Cubo.desde_tabla(tabla, col_nom, datos.COLUMNAS_NUMERICAS)
+        r['filas'] = len(tabla)
+    return resultados
+
+
+def version_codigo():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True,
+                              text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocida'
+
+
+def entorno():
+    import numpy
+    import pyarrow
+    import shapely
+
+    return {'python': platform.python_version(), 'plataforma': platform.platform(),
+            'pandas': pd.__version__, 'numpy': numpy.__version__,
+            'pyarrow': pyarrow.__version__, 'shapely': shapely.__version__}
+
+
+def comparar(actual, anterior):
+    """
+    Imprime la razón actual / anterior por etapa
+    """
+    previos = {r['etapa']: r['segundos'] for r in anterior['etapas']}
+    print(f"\nComparación con {anterior['version']} ({anterior['fecha']}):")
+    for r in actual['etapas']:
+        if r['etapa'] in previos and previos[r['etapa']] > 0:
+            razon = r['segundos'] / previos[r['etapa']]
+            marca = '  <-- más lento' if razon > 1.2 else ''
+            print(f"  {r['etapa']:<28} {previos[r['etapa']]:>9.3f} -> {r['segundos']:>9.3f} s "
+                  f"(x{razon:.2f}){marca}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--datos', required=True, help='carpeta con cnpv/ y mgn/')
+    parser.add_argument('--dpto', default='66')
+    parser.add_argument('--tam-bloque', type=int, default=TAM_BLOQUE)
+    parser.add_argument('--resultado', default='bench_etapas.json')
+    parser.add_argument('--comparar')
+    parser.add_argument('--sin-dashboard', action='store_true')
+    args = parser.parse_args()
+
+    datos = Path(args.datos)
+    rutas = descubrir_departamentos(datos / 'cnpv', datos / 'mgn')[args.dpto]
+    print(f"Departamento {args.dpto}:")
+    etapas, memoria = medir_pipeline(rutas, args.tam_bloque)
+    print("Memoria por tabla (tipos por defecto -> esquema):")
+    informar_memoria(memoria)
+    if not args.sin_dashboard:
+        print("Dashboard:")
+        etapas += medir_dashboard()
+
+    resultado = {
+        'suite': 'bench_etapas',
+        'version': version_codigo(),
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'entorno': entorno(),
+        'parametros': {'dpto': args.dpto, 'tam_bloque': args.tam_bloque,
+                       'datos': str(datos.resolve())},
+        'etapas': etapas,
+        'memoria': memoria.to_dict('records'),
+    }
+    Path(args.resultado).write_text(json.dumps(resultado, indent=1, ensure_ascii=False))
+    print(f"\nResultados: {args.resultado}")
+    if args.comparar:
+        comparar(resultado, json.loads(Path(args.comparar).read_text()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: porcentajes por manzana con groupby.apply vs. bincount.
+
+Uso (desde cnpv_mgn_integration/manzanas_co):
+
+    python -m benchmarks.bench_porcentajes --manzanas 20000 --registros 600000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from miv.porcentajes import (
+    VARIABLES_HOG, VARIABLES_VIV, porcentajes_por_manzana,
+    porcentajes_por_manzana_apply,
+)
+
+
+def datos_sinteticos(n_manzanas, n_registros, variables, semilla=0):
+    """
+    Registros con clave de manzana y códigos ya reclasificados (con NaN)
+    """
+    rng = np.random.default_rng(semilla)
+    manzanas = pd.Series(np.arange(n_manzanas)).astype(str).str.zfill(16)
+    df = pd.DataFrame({
+        'COD_DANE_ANM': ('660011' + manzanas).to_numpy()[rng.integers(0, n_manzanas, n_registros)]
+    })
+    for columna, valores_map in variables.items():
+        valores = rng.integers(1, len(valores_map) + 1, n_registros).astype('float64')
+        valores[rng.random(n_registros) < 0.02] = np.nan
+        df[columna] = valores
+    return df
+
+
+def cronometrar(funcion, *args, repeticiones=1):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--manzanas', type=int, default=20000)
+    parser.add_argument('--registros', type=int, default=600000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    for nombre, variables in (('viviendas', VARIABLES_VIV), ('hogares', VARIABLES_HOG)):
+        df = datos_sinteticos(args.manzanas, args.registros, variables)
+        t_apply, ref = cronometrar(porcentajes_por_manzana_apply, df, variables)
+        t_vect, nuevo = cronometrar(porcentajes_por_manzana, df, variables,
+                                    repeticiones=args.repeticiones)
+        pd.testing.assert_frame_equal(nuevo, ref, check_dtype=False)
+        print(f"{nombre:10s} registros={len(df):,} manzanas={len(ref):,} "
+              f"apply={t_apply:.2f}s bincount={t_vect:.3f}s "
+              f"x{t_apply / t_vect:.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Generador de datos sintéticos CNPV 2018 / MGN con la forma de los reales.
+
+Escribe, por departamento, ``CNPV2018_1VIV_A2_<dpto>.CSV``,
+``CNPV2018_2HOG_A2_<dpto>.CSV``, ``CNPV2018_5PER_A2_<dpto>.CSV`` y
+``CNPV2018_MGN_A2_<dpto>.CSV`` (en
+``<salida>/cnpv``) y el shapefile ``mnz_<dpto>.shp`` (en ``<salida>/mgn``),
+con los nombres de columna y los dominios de códigos que usa el notebook
+(``mapeo_*`` y sentinelas de ``reclasificacion.py``) y códigos de manzana
+de 22 dígitos (departamento, municipio, clase, sector, sección, manzana).
+La estructura es la que espera ``miv.nacional``: de un departamento a los
+33 se escala con ``--departamentos`` y ``--manzanas``.
+
+Incluye las imperfecciones que el pipeline debe tolerar: encuestas del MGN
+sin vivienda, hogares múltiples por vivienda, celdas vacías, sentinelas
+(99 / 9), manzanas censales sin geometría y geometrías sin registros.
+
+Uso (desde cnpv_mgn_integration/manzanas_co):
+
+    python -m benchmarks.sinteticos --salida /tmp/cnpv_sint --departamentos 66
+    python -m benchmarks.sinteticos --salida /tmp/cnpv_sint --nacional --manzanas 20000
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from miv.pipeline import COLUMNAS_MANZANAS
+from miv.reclasificacion import REGISTRO
+
+# Códigos DANE de los 33 departamentos
+DEPARTAMENTOS = [
+    '05', '08', '11', '13', '15', '17', '18', '19', '20', '23', '25',
+    '27', '41', '44', '47', '50', '52', '54', '63', '66', '68', '70',
+    '73', '76', '81', '85', '86', '88', '91', '94', '95', '97', '99',
+]
+
+MANZANAS_POR_MPIO = 2_000
+VIVIENDAS_POR_MANZANA = 25
+LADO_MANZANA = 0.0008       # grados
+PASO_MANZANA = 0.001
+
+# Proporciones de las imperfecciones
+P_ENCUESTA_SIN_VIV = 0.03   # encuestas MGN sin registro de vivienda
+P_VACIA = 0.01              # celdas vacías por variable
+P_SENTINELA = 0.02          # "no sabe / no informa"
+P_SIN_GEOMETRIA = 0.01      # manzanas censales que no están en el shapefile
+P_SIN_REGISTROS = 0.02      # manzanas del shapefile sin registros censales
+
+
+def codigos_manzana(dpto, n_manzanas):
+    """
+    Códigos ``COD_DANE_ANM`` de 22 dígitos: dpto(2) mpio(3) clase(1)
+    sector/sección rural y centro poblado en cero (8), sector urbano(4),
+    sección(2) y manzana(2)
+    """
+    i = np.arange(n_manzanas)
+    mpio = i // MANZANAS_POR_MPIO * 3 + 1
+    j = i % MANZANAS_POR_MPIO
+    sector, seccion, manzana = j // 200, j // 20 % 10, j % 20 + 1
+    return (dpto + pd.Series(mpio).map('{:03d}'.format)
+            + '1' + '0' * 8
+            + pd.Series(sector).map('{:04d}'.format)
+            + pd.Series(seccion).map('{:02d}'.format)
+            + pd.Series(manzana).map('{:02d}'.format)).to_numpy()
+
+
+def _codigos(rng, columna, n):
+    """
+    Códigos enteros de ``columna`` en el dominio de su mapeo, con
+    sentinelas y vacíos (``pd.NA``) en las proporciones configuradas
+    """
+    entrada = REGISTRO[columna]
+    if 'mapeo' in entrada:
+        valores = rng.choice(np.array(list(entrada['mapeo'])), n)
+    elif columna == 'H_NRO_CUARTOS':
+        valores = rng.integers(1, 9, n)
+    else:
+        valores = rng.integers(1, 5, n)
+    valores = pd.array(valores, dtype='Int64')
+    sentinela = entrada.get('sentinela')
+    if sentinela is not None:
+        valores[rng.random(n) < P_SENTINELA] = sentinela
+    valores[rng.random(n) < P_VACIA] = pd.NA
+    return valores
+
+
+def generar_departamento(dpto, dir_cnpv, dir_mgn, n_manzanas, viviendas_por_manzana,
+                         semilla=0):
+    """
+    Escribe los cinco archivos de un departamento y devuelve sus conteos
+    """
+    rng = np.random.default_rng([semilla, int(dpto)])
+    codigos = codigos_manzana(dpto, n_manzanas)
+
+    # Viviendas por manzana censal; algunas manzanas quedan sin registros
+    por_manzana = rng.poisson(viviendas_por_manzana, n_manzanas)
+    por_manzana[rng.random(n_manzanas) < P_SIN_REGISTROS] = 0
+    n_enc = int(por_manzana.sum())
+    manzana_enc = np.repeat(np.arange(n_manzanas), por_manzana)
+    encuestas = np.arange(1, n_enc + 1, dtype=np.int64)
+
+    mgn = pd.DataFrame({
+        'U_DPTO': dpto,
+        'U_MPIO': pd.Series(codigos[manzana_enc]).str[2:5].to_numpy(),
+        'UA_CLASE': 1,
+        'COD_ENCUESTAS': encuestas,
+        'U_VIVIENDA': 1,
+        'COD_DANE_ANM': codigos[manzana_enc],
+    })
+    mgn.to_csv(Path(dir_cnpv) / f"CNPV2018_MGN_A2_{dpto}.CSV", index=False)
+
+    con_viv = rng.random(n_enc) >= P_ENCUESTA_SIN_VIV
+    enc_viv = encuestas[con_viv]
+    n_viv = len(enc_viv)
+    viv = pd.DataFrame({
+        'TIPO_REG': 2, 'U_DPTO': dpto, 'UA_CLASE': 1,
+        'COD_ENCUESTAS': enc_viv,
+        'V_TIPO_VIV': rng.integers(1, 7, n_viv),
+        'V_CON_OCUP': 1,
+        'V_TOT_HOG': 1,
+        **{c: _codigos(rng, c, n_viv) for c in ('V_MAT_PARED', 'V_MAT_PISO', 'V_TIPO_SERSA')},
+    })
+    # Hogares: 1 por vivienda, a veces 2 o 3 (misma COD_ENCUESTAS)
+    hogares = 1 + (rng.random(n_viv) < 0.05) + (rng.random(n_viv) < 0.01)
+    viv['V_TOT_HOG'] = hogares
+    viv.to_csv(Path(dir_cnpv) / f"CNPV2018_1VIV_A2_{dpto}.CSV", index=False)
+
+    enc_hog = np.repeat(enc_viv, hogares)
+    n_hog = len(enc_hog)
+    hog = pd.DataFrame({
+        'TIPO_REG': 3, 'U_DPTO': dpto, 'UA_CLASE': 1,
+        'COD_ENCUESTAS': enc_hog,
+        'H_NROHOG': np.arange(1, n_hog + 1) - np.repeat(np.cumsum(hogares) - hogares, hogares),
+        **{c: _codigos(rng, c, n_hog) for c in
+           ('H_NRO_CUARTOS', 'H_NRO_DORMIT', 'H_DONDE_PREPALIM', 'H_AGUA_COCIN')},
+        'HA_TOT_PER': rng.integers(1, 7, n_hog),
+    })
+    hog.to_csv(Path(dir_cnpv) / f"CNPV2018_2HOG_A2_{dpto}.CSV", index=False)
+
+    # Personas: HA_TOT_PER por hogar
+    por_hogar = hog['HA_TOT_PER'].to_numpy()
+    n_per = int(por_hogar.sum())
+    per = pd.DataFrame({
+        'TIPO_REG': 5, 'U_DPTO': dpto, 'UA_CLASE': 1,
+        'COD_ENCUESTAS': np.repeat(enc_hog, por_hogar),
+        'P_NROHOG': np.repeat(hog['H_NROHOG'].to_numpy(), por_hogar),
+        'P_NRO_PER': np.arange(1, n_per + 1) - np.repeat(np.cumsum(por_hogar) - por_hogar,
+                                                         por_hogar),
+        'P_SEXO': rng.integers(1, 3, n_per),
+        **{c: _codigos(rng, c, n_per) for c in ('P_EDADR', 'CONDICION_FISICA', 'P_NIVEL_ANOSR')},
+    })
+    per.to_csv(Path(dir_cnpv) / f"CNPV2018_5PER_A2_{dpto}.CSV", index=False)
+
+    generar_manzanas(dpto, codigos, por_manzana, rng, Path(dir_mgn) / f"mnz_{dpto}.shp")
+    return {'dpto': dpto, 'manzanas': n_manzanas, 'mgn': n_enc, 'viv': n_viv, 'hog': n_hog,
+            'per': n_per}
+
+
+def generar_manzanas(dpto, codigos, viviendas, rng, ruta):
+    """
+    Shapefile de manzanas en grilla con las columnas ``COLUMNAS_MANZANAS``
+    """
+    import geopandas as gpd
+    import shapely
+
+    n = len(codigos)
+    presentes = rng.random(n) >= P_SIN_GEOMETRIA
+    codigos, viviendas = codigos[presentes], viviendas[presentes]
+    n = len(codigos)
+
+    # Cada departamento en su propia celda de 1.5° x 2°
+    k = DEPARTAMENTOS.index(dpto) if dpto in DEPARTAMENTOS else int(dpto) % 33
+    lado = int(np.ceil(np.sqrt(n)))
+    i = np.arange(n)
+    x0 = -78.0 + (k % 6) * 1.5 + (i % lado) * PASO_MANZANA
+    y0 = -4.0 + (k // 6) * 2.0 + (i // lado) * PASO_MANZANA
+
+    personas = rng.binomial(viviendas * 4, 0.8)
+    datos = {c: rng.integers(0, 20, n) for c in COLUMNAS_MANZANAS}
+    datos.update({
+        'COD_DANE_A': codigos,
+        'DPTO_CCDGO': dpto,
+        'MPIO_CDPMP': pd.Series(codigos).str[:5].to_numpy(),
+        'CLAS_CCDGO': '1',
+        'DENSIDAD': rng.uniform(0, 500, n).round(2),
+        'TVIVIENDA': viviendas,
+        'TP16_HOG': viviendas,
+        'TP27_PERSO': personas,
+        'NMB_LC_CM': '',
+        'TP_LC_CM': '',
+    })
+    for servicio in ('EE', 'ACU', 'ALC', 'GAS', 'RECB'):
+        prefijo = 'TP19_RECB' if servicio == 'RECB' else f'TP19_{servicio}_'
+        con = rng.binomial(viviendas, rng.uniform(0.5, 1.0, n))
+        datos[f'{prefijo}1'], datos[f'{prefijo}2'] = con, viviendas - con
+    gdf = gpd.GeoDataFrame(datos, geometry=shapely.box(x0, y0, x0 + LADO_MANZANA,
+                                                       y0 + LADO_MANZANA), crs=4326)
+
+    # Manzanas del MGN sin registros censales
+    extra = max(1, int(n * P_SIN_REGISTROS))
+    sin_registros = gdf.iloc[:extra].copy()
+    sin_registros['COD_DANE_A'] = [f"{dpto}999{j:016d}" for j in range(extra)]
+    sin_registros['geometry'] = sin_registros.geometry.translate(yoff=-10 * PASO_MANZANA)
+    gdf = pd.concat([gdf, sin_registros], ignore_index=True)
+    gdf.to_file(ruta)
+
+
+def generar(salida, departamentos=('66',), n_manzanas=20_000,
+            viviendas_por_manzana=VIVIENDAS_POR_MANZANA, semilla=0):
+    """
+    Genera los departamentos pedidos; devuelve las rutas ``cnpv`` y ``mgn``
+    """
+    dir_cnpv, dir_mgn = Path(salida) / 'cnpv', Path(salida) / 'mgn'
+    dir_cnpv.mkdir(parents=True, exist_ok=True)
+    dir_mgn.mkdir(parents=True, exist_ok=True)
+    for dpto in departamentos:
+        inicio = time.perf_counter()
+        conteo = generar_departamento(dpto, dir_cnpv, dir_mgn, n_manzanas,
+                                      viviendas_por_manzana, semilla)
+        print(f"[{dpto}] {conteo['manzanas']:,} manzanas, {conteo['viv']:,} viviendas, "
+              f"{conteo['hog']:,} hogares, {conteo['per']:,} personas "
+              f"({time.perf_counter() - inicio:.1f} s)")
+    return dir_cnpv, dir_mgn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--salida', required=True)
+    parser.add_argument('--departamentos', nargs='+', default=['66'])
+    parser.add_argument('--nacional', action='store_true', help='los 33 departamentos')
+    parser.add_argument('--manzanas', type=int, default=20_000, help='por departamento')
+    parser.add_argument('--viviendas-por-manzana', type=int, default=VIVIENDAS_POR_MANZANA)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    departamentos = DEPARTAMENTOS if args.nacional else args.departamentos
+    generar(args.salida, departamentos, args.manzanas, args.viviendas_por_manzana, args.semilla)
+
+
+if __name__ == '__main__':
+    main()
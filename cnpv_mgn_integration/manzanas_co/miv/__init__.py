@@ -0,0 +1,3 @@
+"""
+Integración CNPV 2018 - MGN a nivel de manzana (capa MIV).
+"""
@@ -0,0 +1,216 @@
+"""
+Agregación jerárquica de la capa de manzanas por prefijos del código DANE.
+
+``COD_DANE_A`` (22 dígitos) contiene todos los niveles superiores:
+departamento (2), municipio (5), sector urbano (18) y sección urbana (20).
+Las manzanas se ordenan una vez por código; así cada nivel es un conjunto
+de tramos contiguos y se suma con ``np.add.reduceat`` sobre el nivel
+inmediatamente inferior (sección -> sector -> municipio -> departamento):
+una sola pasada sobre las manzanas y sin disolver geometrías.
+
+Los conteos (viviendas, hogares, personas, ``TP34_*``...) se suman; los
+indicadores (``PCT_*``, ``HACIN``, ``PA_*``...) no se promedian: se evalúa
+el registro de ``miv.indicadores`` sobre la suma de su numerador y de su
+denominador. Cuando la capa no trae el numerador (``PA_*``, o ``PCT_*`` de
+capas exportadas sin ``TP19_*``) se reconstruye por manzana como razón x
+denominador, redondeado al entero.
+
+La geometría de un nivel solo se disuelve si se pide (``disolver``). Los
+resultados se guardan como etapas del ``AlmacenEtapas``:
+
+    from miv.agregados import ejecutar_agregados, tabla_nivel
+    etapas = ejecutar_agregados(almacen, etapas['mnz_clean'], disolver=['municipio'])
+    municipios = tabla_nivel(etapas['agregados'].valor(), 'municipio')
+
+Uso (contexto censal para el dashboard de Córdoba):
+
+    python -m miv.agregados mnz_ris_miv_clean.parquet \\
+        --salida ../../dashboard_cordoba/censo_cor.parquet
+"""
+import argparse
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from .esquema import CLAVE_GEO, ESQUEMA_MANZANA, aplicar_esquema
+from .indicadores import INDICADORES, Indicadores, Razon
+
+# Nivel -> (columna del código en el MGN, largo del prefijo de COD_DANE_A)
+NIVELES = {
+    'departamento': ('DPTO_CCDGO', 2),
+    'municipio': ('MPIO_CDPMP', 5),
+    'sector': ('SETU_CCNCT', 18),
+    'seccion': ('SECU_CCNCT', 20),
+}
+
+COL_NIVEL, COL_CODIGO, COL_MANZANAS = 'NIVEL', 'CODIGO', 'N_MANZANAS'
+
+# Conteos aditivos de la capa final
+SUMAS = ['TVIVIENDA', 'TP16_HOG', 'TP27_PERSO', 'N_VIV', 'N_HOG', 'N_PER', 'NCUA', 'NDOR']
+PATRON_SUMAS = re.compile(r'TP\d+_\d+_[A-Z]+$')     # TP9_1_USO, TP14_1_TIP, TP34_1_EDA...
+
+
+def columnas_suma(columnas):
+    return [c for c in columnas if c in SUMAS or PATRON_SUMAS.match(c)]
+
+
+def _razones_nivel(capa, registro):
+    """
+    Registro a evaluar en cada nivel y numeradores a reconstruir por
+    manzana: un indicador sin su base en ``capa`` pero guardado se rehace
+    con el numerador ``_num_<indicador>`` (razón x denominador, redondeado)
+    """
+    indicadores = Indicadores(capa, registro)
+    por_nivel, reconstruidos = {}, {}
+    for nombre, razon in registro.items():
+        if razon.denominador not in capa.columns:
+            continue
+        if indicadores.calculable(nombre):
+            por_nivel[nombre] = razon
+        elif nombre in capa.columns:
+            valor = capa[nombre].to_numpy(dtype='float64', na_value=np.nan)
+            base = capa[razon.denominador].to_numpy(dtype='float64', na_value=0)
+            reconstruidos[f'_num_{nombre}'] = np.nan_to_num(np.round(valor * base / razon.escala))
+            por_nivel[nombre] = Razon(f'_num_{nombre}', razon.denominador, razon.escala,
+                                      razon.decimales)
+    return por_nivel, reconstruidos
+
+
+def _tramos(codigos):
+    """
+    Inicio de cada tramo de códigos iguales (``codigos`` ordenados)
+    """
+    if not len(codigos):
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+
+
+def agregar(capa, niveles=tuple(NIVELES), registro=INDICADORES, clave=CLAVE_GEO):
+    """
+    Sumas e indicadores de ``capa`` en cada nivel de ``niveles``, apilados
+    en una tabla (``NIVEL``, ``CODIGO``, ``N_MANZANAS``, sumas, indicadores)
+    """
+    razones, reconstruidos = _razones_nivel(capa, registro)
+    sumas = columnas_suma(capa.columns)
+    sumas += [c for r in razones.values() for c in r.base
+              if c in capa.columns and c not in sumas]
+    codigos = capa[clave].astype(str).to_numpy()
+    orden = np.argsort(codigos, kind='stable')
+    codigos = codigos[orden]
+
+    nombres = sumas + list(reconstruidos)
+    valores = np.column_stack(
+        [capa[c].to_numpy(dtype='float64', na_value=0) for c in sumas]
+        + list(reconstruidos.values()) + [np.ones(len(capa))]
+    )[orden]
+
+    # De lo más fino a lo más grueso: cada nivel suma el anterior
+    tablas = []
+    for nivel in sorted(niveles, key=lambda n: -NIVELES[n][1]):
+        prefijos = codigos.astype(f'<U{NIVELES[nivel][1]}')
+        inicio = _tramos(prefijos)
+        if len(valores):
+            valores = np.add.reduceat(valores, inicio, axis=0)
+        codigos = prefijos[inicio]
+
+        tabla = pd.DataFrame(valores[:, :-1], columns=nombres)
+        tabla = pd.concat([tabla, Indicadores(tabla, razones).tabla(razones)], axis=1)
+        tabla = tabla.drop(columns=list(reconstruidos))
+        tabla.insert(0, COL_MANZANAS, valores[:, -1].astype('int64'))
+        tabla.insert(0, COL_CODIGO, codigos)
+        tabla.insert(0, COL_NIVEL, nivel)
+        tablas.append(tabla)
+    resultado = pd.concat(tablas[::-1], ignore_index=True)
+    resultado[sumas] = resultado[sumas].round().astype('int64')
+    return aplicar_esquema(resultado, ESQUEMA_MANZANA)
+
+
+def tabla_nivel(agregados, nivel):
+    """
+    Filas de un nivel con el código en su columna del MGN (p. ej. ``MPIO_CDPMP``)
+    """
+    tabla = agregados[agregados[COL_NIVEL] == nivel].drop(columns=COL_NIVEL)
+    return tabla.rename(columns={COL_CODIGO: NIVELES[nivel][0]}).reset_index(drop=True)
+
+
+def disolver(capa, nivel, clave=CLAVE_GEO):
+    """
+    Geometría de ``nivel`` como unión de sus manzanas (solo si se pide)
+    """
+    import geopandas as gpd
+
+    codigos = capa[clave].astype(str).to_numpy()
+    orden = np.argsort(codigos, kind='stable')
+    prefijos = codigos[orden].astype(f'<U{NIVELES[nivel][1]}')
+    geometrias = np.asarray(capa.geometry.values)[orden]
+    inicio = _tramos(prefijos)
+    fin = np.r_[inicio[1:], len(prefijos)]
+    unidas = [shapely.union_all(geometrias[a:b]) for a, b in zip(inicio, fin)]
+    return gpd.GeoDataFrame({NIVELES[nivel][0]: prefijos[inicio]}, geometry=unidas, crs=capa.crs)
+
+
+# ── Etapas ───────────────────────────────────────────────────────────────────
+def etapa_agregados(capa, niveles=tuple(NIVELES)):
+    return agregar(capa, niveles)
+
+
+def etapa_disolver(capa, nivel):
+    return disolver(capa, nivel)
+
+
+def ejecutar_agregados(almacen, capa, niveles=tuple(NIVELES), disolver=()):
+    """
+    Etapa ``agregados`` (todos los niveles en una tabla) y, para cada nivel
+    de ``disolver``, ``geo_<nivel>``. Devuelve un dict nombre -> ``Etapa``.
+    """
+    etapas = {}
+    etapas['agregados'] = almacen.ejecutar(
+        'agregados', etapa_agregados, depende=[capa], parametros={'niveles': list(niveles)})
+    for nivel in disolver:
+        etapas[f'geo_{nivel}'] = almacen.ejecutar(
+            f'geo_{nivel}', etapa_disolver, depende=[capa], parametros={'nivel': nivel})
+    return etapas
+
+
+def informar(agregados):
+    for nivel, tabla in agregados.groupby(COL_NIVEL, sort=False):
+        print(f"{nivel:<13} {len(tabla):>8,} unidades, {tabla[COL_MANZANAS].sum():>10,} manzanas")
+
+
+def leer_capa(ruta, columnas=None):
+    """
+    Capa de manzanas sin geometría (GeoParquet, dataset particionado o shapefile)
+    """
+    ruta = Path(ruta)
+    if ruta.is_dir() or ruta.suffix == '.parquet':
+        import pyarrow.parquet as pq
+
+        if columnas is None:
+            archivo = next(ruta.rglob('*.parquet')) if ruta.is_dir() else ruta
+            columnas = [c for c in pq.read_schema(archivo).names if c != 'geometry']
+        return pd.read_parquet(ruta, columns=columnas)
+    import geopandas as gpd
+
+    capa = gpd.read_file(ruta, columns=columnas, ignore_geometry=True)
+    return pd.DataFrame(capa)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('capa', help='GeoParquet (o dataset nacional) de manzanas')
+    parser.add_argument('--salida', required=True, help='Parquet con los agregados')
+    parser.add_argument('--niveles', nargs='+', default=['departamento', 'municipio'],
+                        choices=list(NIVELES))
+    args = parser.parse_args()
+
+    agregados = agregar(leer_capa(args.capa), args.niveles)
+    informar(agregados)
+    agregados.to_parquet(args.salida, index=False)
+    print(f"Agregados: {args.salida}")
+
+
+if __name__ == '__main__':
+    main()
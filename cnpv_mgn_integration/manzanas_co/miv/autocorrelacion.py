@@ -0,0 +1,371 @@
+"""
+Autocorrelación espacial local (LISA y Getis-Ord Gi*) de indicadores por manzana.
+
+Sobre la capa final (``mnz_clean``) se construye la vecindad de las
+manzanas como grafo disperso en formato CSR (``Pesos``: ``indptr`` e
+``indices``, sin matriz densa n x n) con un ``STRtree`` de shapely:
+
+* ``distancia``: manzanas a menos de ``tolerancia`` metros (banda de
+  distancia entre bordes: las manzanas del MGN están separadas por calles y
+  casi nunca se tocan, así que la contigüidad queen estricta, por vértice
+  compartido, las dejaría casi todas sin vecinos);
+* ``rook``: además comparten al menos ``longitud_min`` metros de borde
+  frente a frente (no solo una esquina);
+* ``knn``: los ``k`` centroides más cercanos.
+
+El grafo se guarda como etapa del ``AlmacenEtapas`` (tabla de aristas), de
+modo que no se recalcula mientras no cambien la capa ni los parámetros.
+
+Por cada indicador se calcula el I de Moran local (pesos estandarizados
+por fila) y el Gi* (pesos binarios con la propia manzana) con inferencia
+por permutaciones condicionales: para cada manzana se sortean los valores
+de sus vecinos entre el resto de manzanas, vectorizado sobre todas las
+permutaciones de un lote de manzanas y con los lotes repartidos entre
+procesos. Cada permutación toma tantas manzanas distintas como vecinos
+tiene la manzana (sin reemplazo, algoritmo de Floyd vectorizado: el costo
+depende del número de vecinos y no del total de manzanas). Ambas
+estadísticas son monótonas en la suma de los vecinos, así que comparten
+sorteos y pseudo p-valor (``P_SIM_*``).
+
+Columnas agregadas por indicador ``<col>``: ``LISA_<col>`` (I local),
+``LISA_Q_<col>`` (0 no significativo, 1 alto-alto, 2 bajo-alto, 3 bajo-bajo,
+4 alto-bajo), ``GI_<col>`` (puntaje z del Gi*) y ``P_SIM_<col>``.
+
+    from miv.autocorrelacion import ejecutar_autocorrelacion
+    etapas = ejecutar_autocorrelacion(almacen, etapas['mnz_clean'], ['HACIN'])
+    capa = etapas['mnz_autocorrelacion'].valor()
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from .casos import CRS_METRICO
+from .indicadores import Indicadores
+
+COLUMNAS = ['HACIN', 'PCT_ACUEDUCTO']
+TIPOS = ('distancia', 'rook', 'knn')
+TOLERANCIA = 25              # metros, ancho de calle con andenes
+K_VECINOS = 8
+PERMUTACIONES = 999
+ALFA = 0.05
+MEMORIA_LOTE = 64 * 2 ** 20  # bytes de valores sorteados por lote
+
+# Cuadrantes del diagrama de Moran (solo manzanas significativas)
+NO_SIGNIFICATIVO, ALTO_ALTO, BAJO_ALTO, BAJO_BAJO, ALTO_BAJO = range(5)
+CUADRANTES = {NO_SIGNIFICATIVO: 'no significativo', ALTO_ALTO: 'alto-alto',
+              BAJO_ALTO: 'bajo-alto', BAJO_BAJO: 'bajo-bajo', ALTO_BAJO: 'alto-bajo'}
+
+
+# ── Pesos ────────────────────────────────────────────────────────────────────
+class Pesos:
+    """
+    Vecindad binaria en CSR: los vecinos de ``i`` son
+    ``indices[indptr[i]:indptr[i + 1]]``
+    """
+
+    def __init__(self, indptr, indices):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+
+    @classmethod
+    def desde_aristas(cls, origen, destino, n):
+        origen = np.asarray(origen, dtype=np.int64)
+        destino = np.asarray(destino, dtype=np.int64)
+        orden = np.lexsort((destino, origen))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origen, minlength=n), out=indptr[1:])
+        return cls(indptr, destino[orden])
+
+    @classmethod
+    def desde_tabla(cls, tabla, n):
+        return cls.desde_aristas(tabla['origen'].to_numpy(), tabla['destino'].to_numpy(), n)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @property
+    def cardinalidad(self):
+        return np.diff(self.indptr)
+
+    def origenes(self):
+        return np.repeat(np.arange(len(self)), self.cardinalidad)
+
+    def tabla(self):
+        """
+        Aristas como DataFrame (lo que se guarda en el almacén)
+        """
+        return pd.DataFrame({'origen': self.origenes().astype(np.int32),
+                             'destino': self.indices.astype(np.int32)})
+
+    def rezago(self, valores):
+        """
+        Suma de ``valores`` sobre los vecinos de cada manzana
+        """
+        return np.bincount(self.origenes(), weights=valores[self.indices], minlength=len(self))
+
+    def subconjunto(self, mascara):
+        """
+        Grafo restringido a las manzanas de ``mascara`` (renumeradas)
+        """
+        origen, destino = self.origenes(), self.indices
+        conservar = mascara[origen] & mascara[destino]
+        nuevo = np.cumsum(mascara) - 1
+        return Pesos.desde_aristas(nuevo[origen[conservar]], nuevo[destino[conservar]],
+                                   int(mascara.sum()))
+
+
+def _sin_diagonal(i, j):
+    distintos = i != j
+    return i[distintos], j[distintos]
+
+
+def contiguidad(geometrias, tipo='distancia', tolerancia=TOLERANCIA, longitud_min=None):
+    """
+    Vecindad ``distancia`` o ``rook`` de polígonos en CRS métrico
+    """
+    geometrias = np.asarray(geometrias)
+    arbol = shapely.STRtree(geometrias)
+    if tolerancia:
+        i, j = arbol.query(geometrias, predicate='dwithin', distance=tolerancia)
+    else:
+        i, j = arbol.query(geometrias, predicate='intersects')
+    i, j = _sin_diagonal(i, j)
+
+    if tipo == 'rook':
+        # Borde de i dentro de la tolerancia de j; una esquina aporta a lo
+        # sumo ~2 * tolerancia, por eso el mínimo por defecto es mayor
+        if longitud_min is None:
+            longitud_min = 3 * tolerancia if tolerancia else 0
+        par = i < j
+        i, j = i[par], j[par]
+        cercania = shapely.buffer(geometrias, tolerancia) if tolerancia else geometrias
+        compartido = shapely.length(shapely.intersection(shapely.boundary(geometrias[i]),
+                                                         cercania[j]))
+        frente = compartido > longitud_min
+        i, j = np.concatenate([i[frente], j[frente]]), np.concatenate([j[frente], i[frente]])
+    return Pesos.desde_aristas(i, j, len(geometrias))
+
+
+def knn(geometrias, k=K_VECINOS):
+    """
+    Los ``k`` centroides más cercanos de cada polígono (relación no simétrica).
+    Se busca dentro de un radio que se duplica para las manzanas que aún no
+    tienen ``k`` vecinos.
+    """
+    puntos = shapely.centroid(np.asarray(geometrias))
+    n = len(puntos)
+    k = min(k, n - 1)
+    if k < 1:
+        return Pesos.desde_aristas([], [], n)
+    xy = shapely.get_coordinates(puntos)
+    arbol = shapely.STRtree(puntos)
+    xmin, ymin, xmax, ymax = shapely.total_bounds(puntos)
+    radio = max(np.sqrt((xmax - xmin) * (ymax - ymin) * (k + 1) / (np.pi * n)), 1.0)
+
+    origen, destino = [], []
+    pendientes = np.arange(n)
+    while len(pendientes):
+        i, j = arbol.query(puntos[pendientes], predicate='dwithin', distance=radio)
+        i, j = _sin_diagonal(pendientes[i], j)
+        distancia = np.hypot(*(xy[i] - xy[j]).T)
+        orden = np.lexsort((j, distancia, i))
+        i, j = i[orden], j[orden]
+        inicio = np.flatnonzero(np.r_[True, i[1:] != i[:-1]])
+        rango = np.arange(len(i)) - np.repeat(inicio, np.diff(np.r_[inicio, len(i)]))
+        completas = np.bincount(i, minlength=n) >= k
+        tomar = completas[i] & (rango < k)
+        origen.append(i[tomar])
+        destino.append(j[tomar])
+        pendientes = pendientes[~completas[pendientes]]
+        radio *= 2
+    return Pesos.desde_aristas(np.concatenate(origen), np.concatenate(destino), n)
+
+
+def construir_pesos(geometrias, tipo='distancia', k=K_VECINOS, tolerancia=TOLERANCIA):
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo de vecindad desconocido: {tipo} (use {', '.join(TIPOS)})")
+    if tipo == 'knn':
+        return knn(geometrias, k)
+    return contiguidad(geometrias, tipo, tolerancia)
+
+
+def etapa_pesos(capa, tipo='distancia', k=K_VECINOS, tolerancia=TOLERANCIA, crs=CRS_METRICO):
+    """
+    Aristas (posiciones en ``capa``) de la vecindad de las manzanas
+    """
+    geometrias = capa.geometry.to_crs(crs).values
+    geometrias = shapely.make_valid(np.asarray(geometrias))
+    return construir_pesos(geometrias, tipo, k, tolerancia).tabla()
+
+
+# ── Permutaciones ────────────────────────────────────────────────────────────
+_DATOS = {}
+
+
+def _iniciar(datos):
+    _DATOS.update(datos)
+
+
+def _sortear_distintos(rng, n, k, permutaciones):
+    """
+    Para cada fila, ``permutaciones`` sorteos de ``k[fila]`` índices
+    distintos de ``range(n)`` (algoritmo de Floyd, vectorizado sobre filas y
+    permutaciones). Forma (max(k), filas, permutaciones): una matriz
+    contigua por posición, -1 donde la fila tiene menos vecinos.
+    """
+    kmax = int(k.max())
+    sorteo = np.full((kmax, len(k), permutaciones), -1, dtype=np.int64)
+    for c in range(kmax):
+        # Paso c de Floyd para k[fila] elementos: j = n - k + c; se sortea
+        # t en [0, j] y, si ya salió en esta permutación, se toma j
+        activas = c < k
+        j = (n - k + c)[:, None]
+        t = rng.integers(0, j + 1, size=(len(k), permutaciones), dtype=np.int64)
+        repetido = np.zeros(t.shape, dtype=bool)
+        for d in range(c):
+            repetido |= sorteo[d] == t
+        sorteo[c] = np.where(repetido, j, t)
+        sorteo[c, ~activas] = -1
+    return sorteo
+
+
+def _extremos(columna, inicio, fin, permutaciones, semilla):
+    """
+    Para las manzanas ``inicio:fin``: cuántas sumas sorteadas quedan en la
+    cola más cercana a la observada (para el pseudo p-valor plegado)
+    """
+    z, cardinalidad, observada = _DATOS[columna]
+    rng = np.random.default_rng([semilla, inicio])
+    filas = np.arange(inicio, fin)
+    k = cardinalidad[filas]
+    kmax = int(k.max()) if len(k) else 0
+    if kmax == 0:
+        return np.zeros(len(filas), dtype=np.int64)
+    # k manzanas distintas entre las otras n-1 (se salta la propia)
+    sumas = np.zeros((len(filas), permutaciones))
+    for sorteo in _sortear_distintos(rng, len(z) - 1, k, permutaciones):
+        usados = sorteo >= 0
+        sorteo += sorteo >= filas[:, None]
+        sumas += np.where(usados, z[sorteo], 0.0)
+    mayores = (sumas >= observada[filas, None]).sum(axis=1)
+    menores = (sumas <= observada[filas, None]).sum(axis=1)
+    return np.minimum(mayores, menores)
+
+
+def _lotes(cardinalidad, permutaciones, memoria=MEMORIA_LOTE):
+    kmax = max(int(cardinalidad.max()) if len(cardinalidad) else 1, 1)
+    tam = max(1, memoria // (permutaciones * kmax * 16))
+    return [(i, min(i + tam, len(cardinalidad))) for i in range(0, len(cardinalidad), tam)]
+
+
+def autocorrelacion_local(columnas, pesos, permutaciones=PERMUTACIONES, semilla=0,
+                          alfa=ALFA, procesos=None):
+    """
+    I de Moran local, Gi* y pseudo p-valores de cada serie de ``columnas``
+    (dict nombre -> valores alineados con ``pesos``). Las manzanas sin dato
+    o sin vecinos quedan en NaN. Devuelve un DataFrame con las columnas
+    ``LISA_*``, ``LISA_Q_*``, ``GI_*`` y ``P_SIM_*``.
+    """
+    n = len(pesos)
+    resultado, datos, validas = {}, {}, {}
+    for nombre, valores in columnas.items():
+        x = pd.to_numeric(pd.Series(valores), errors='coerce').to_numpy(dtype='float64')
+        valida = np.isfinite(x)
+        w = pesos.subconjunto(valida)
+        x = x[valida]
+        z = x - x.mean()
+        cardinalidad = w.cardinalidad
+        suma = w.rezago(z)
+        datos[nombre] = (z, cardinalidad, suma)
+        validas[nombre] = (valida, x, w)
+
+    tareas = [(nombre, inicio, fin) for nombre, (_, cardinalidad, _) in datos.items()
+              for inicio, fin in _lotes(cardinalidad, permutaciones)]
+    procesos = procesos or os.cpu_count() or 1
+    if procesos > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar,
+                                 initargs=(datos,)) as pool:
+            extremos = list(pool.map(_extremos, *zip(*tareas),
+                                     [permutaciones] * len(tareas), [semilla] * len(tareas)))
+    else:
+        _iniciar(datos)
+        extremos = [_extremos(*t, permutaciones, semilla) for t in tareas]
+        _DATOS.clear()
+
+    for nombre in columnas:
+        valida, x, w = validas[nombre]
+        z, cardinalidad, suma = datos[nombre]
+        cuenta = np.concatenate([e for t, e in zip(tareas, extremos) if t[0] == nombre])
+        m = len(x)
+        con_vecinos = cardinalidad > 0
+
+        # Moran local con pesos estandarizados por fila
+        rezago = np.divide(suma, cardinalidad, out=np.full(m, np.nan), where=con_vecinos)
+        moran = (m - 1) * z * rezago / (z ** 2).sum() if m > 1 else np.full(m, np.nan)
+
+        # Gi* con pesos binarios incluyendo la propia manzana: la suma de x
+        # menos su esperanza es la suma de z de vecinos más la propia
+        peso = cardinalidad + 1.0
+        denominador = x.std() * np.sqrt(np.maximum(m * peso - peso ** 2, 0) / max(m - 1, 1))
+        gi = np.divide(suma + z, denominador, out=np.full(m, np.nan),
+                       where=con_vecinos & (denominador > 0))
+
+        p = np.where(con_vecinos, (cuenta + 1) / (permutaciones + 1), np.nan)
+        cuadrante = np.select([(z > 0) & (rezago > 0), (z <= 0) & (rezago > 0),
+                               (z <= 0) & (rezago <= 0), (z > 0) & (rezago <= 0)],
+                              [ALTO_ALTO, BAJO_ALTO, BAJO_BAJO, ALTO_BAJO])
+        cuadrante[~(p <= alfa)] = NO_SIGNIFICATIVO
+
+        for prefijo, valores in (('LISA_', moran), ('LISA_Q_', cuadrante),
+                                 ('GI_', gi), ('P_SIM_', p)):
+            completo = np.full(n, NO_SIGNIFICATIVO if prefijo == 'LISA_Q_' else np.nan)
+            completo[valida] = valores
+            resultado[prefijo + nombre] = completo
+        resultado['LISA_Q_' + nombre] = resultado['LISA_Q_' + nombre].astype(np.int8)
+    return pd.DataFrame(resultado)
+
+
+def etapa_autocorrelacion(capa, aristas, columnas=COLUMNAS, permutaciones=PERMUTACIONES,
+                          semilla=0, alfa=ALFA, procesos=None):
+    """
+    ``capa`` con las columnas de autocorrelación local de ``columnas``
+    (columnas de la capa o indicadores derivados del registro)
+    """
+    pesos = Pesos.desde_tabla(aristas, len(capa))
+    indicadores = Indicadores(capa)
+    resultado = autocorrelacion_local({c: indicadores[c] for c in columnas}, pesos,
+                                      permutaciones, semilla, alfa, procesos)
+    capa = capa.drop(columns=[c for c in resultado.columns if c in capa.columns])
+    resultado.index = capa.index
+    return pd.concat([capa, resultado], axis=1)
+
+
+def ejecutar_autocorrelacion(almacen, capa, columnas=COLUMNAS, tipo='distancia', k=K_VECINOS,
+                             tolerancia=TOLERANCIA, permutaciones=PERMUTACIONES, semilla=0,
+                             alfa=ALFA, procesos=None):
+    """
+    Etapas ``pesos`` y ``mnz_autocorrelacion`` sobre la etapa ``capa``
+    (normalmente ``mnz_clean``). Devuelve un dict nombre -> ``Etapa``.
+    """
+    etapas = {}
+    etapas['pesos'] = almacen.ejecutar(
+        'pesos', etapa_pesos, depende=[capa],
+        parametros={'tipo': tipo, 'k': k, 'tolerancia': tolerancia})
+    etapas['mnz_autocorrelacion'] = almacen.ejecutar(
+        'mnz_autocorrelacion', etapa_autocorrelacion, depende=[capa, etapas['pesos']],
+        parametros={'columnas': list(columnas), 'permutaciones': permutaciones,
+                    'semilla': semilla, 'alfa': alfa},
+        opciones={'procesos': procesos})
+    return etapas
+
+
+def informar(capa, columnas=COLUMNAS):
+    for col in columnas:
+        conteo = capa[f'LISA_Q_{col}'].value_counts()
+        resumen = ', '.join(f"{CUADRANTES[q]}: {conteo.get(q, 0):,}" for q in CUADRANTES)
+        calientes = int((capa[f'GI_{col}'] > 1.96).sum())
+        frias = int((capa[f'GI_{col}'] < -1.96).sum())
+        print(f"[{col}] {resumen} | Gi* calientes: {calientes:,}, frías: {frias:,}")
@@ -0,0 +1,235 @@
+"""
+Asignación espacial de casos geocodificados (SIVIGILA) a manzanas y municipios.
+
+Los casos de dengue, leishmaniasis y malaria llegan con coordenadas; aquí
+se asignan a la manzana (``mnz_*``) que los contiene con un ``STRtree`` de
+shapely, por lotes vectorizados, y se cuentan por manzana con un
+acumulador denso (``np.bincount``) como en ``ingesta.py``. Los puntos que
+no caen en ninguna manzana se asignan a la más cercana dentro de
+``distancia_max`` metros; el resto queda como no asignado y se reporta.
+
+El índice persiste como etapa del ``AlmacenEtapas``: GeoParquet con
+geometrías válidas, en CRS métrico y ordenadas por curva de Hilbert. Al
+cargarlo se reconstruye el árbol (shapely no serializa su estructura
+interna), lo que toma una fracción de lo que cuesta leer y reparar el
+shapefile.
+
+    from miv.casos import asignar_archivo, indice_desde_almacen
+    indice = indice_desde_almacen(almacen, 'mnz_66.shp')
+    conteos, reporte = asignar_archivo('sivigila.csv', indice)
+    capa = mnz_ris_miv_clean.merge(conteos, on='COD_DANE_A', how='left')
+
+Para casos rurales (fuera de toda manzana) el mismo índice sirve sobre la
+capa municipal: ``indice_desde_almacen(almacen, 'mun.shp', clave='MPIO_CDPMP')``.
+"""
+import numpy as np
+import pandas as pd
+import shapely
+
+from .esquema import CLAVE_GEO
+from .etapas import leer_parquet
+
+CRS_METRICO = 'EPSG:9377'    # MAGNA-SIRGAS / Origen-Nacional (metros)
+CRS_PUNTOS = 'EPSG:4326'
+TAM_LOTE = 1_000_000
+DISTANCIA_MAX = 50           # metros, para la manzana más cercana
+
+# Columnas del archivo de casos
+COL_X, COL_Y, COL_EVENTO = 'longitud', 'latitud', 'cod_eve'
+
+# Conteo -> códigos de evento SIVIGILA (columnas del dashboard)
+EVENTOS = {
+    'cas_den': (210, 220, 580),
+    'cas_lei': (420, 430, 440),
+    'cas_mal': (465, 470, 490, 495),
+}
+
+# Métodos de asignación de cada punto
+DENTRO, CERCANA, SIN_ASIGNAR = 0, 1, 2
+METODOS = {DENTRO: 'dentro', CERCANA: 'cercana', SIN_ASIGNAR: 'sin_asignar'}
+
+
+# ── Índice ───────────────────────────────────────────────────────────────────
+def etapa_indice(ruta_poligonos, clave=CLAVE_GEO, crs=CRS_METRICO):
+    """
+    Polígonos (solo ``clave`` y geometría) válidos, en ``crs`` y en orden
+    de Hilbert, listos para el ``STRtree``
+    """
+    import geopandas as gpd
+
+    gdf = gpd.read_file(ruta_poligonos, columns=[clave]).to_crs(crs)
+    gdf = gdf[~gdf.geometry.is_empty & gdf.geometry.notna()]
+    gdf['geometry'] = shapely.make_valid(gdf.geometry.values)
+    orden = gdf.geometry.hilbert_distance().argsort(kind='stable')
+    return gdf.iloc[orden].reset_index(drop=True)
+
+
+class IndicePoligonos:
+    """
+    ``STRtree`` sobre una capa de polígonos con su código por posición
+    """
+
+    def __init__(self, gdf, clave=CLAVE_GEO):
+        self.clave = clave
+        self.crs = gdf.crs
+        self.codigos = gdf[clave].astype(str).to_numpy()
+        self.geometrias = np.asarray(gdf.geometry.values)
+        shapely.prepare(self.geometrias)
+        self.arbol = shapely.STRtree(self.geometrias)
+
+    @classmethod
+    def desde_parquet(cls, ruta, clave=CLAVE_GEO):
+        return cls(leer_parquet(ruta), clave)
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def puntos(self, x, y, crs=CRS_PUNTOS):
+        """
+        Puntos en el CRS del índice (``None`` si la coordenada no es válida)
+        """
+        from pyproj import Transformer
+
+        x = np.asarray(x, dtype='float64')
+        y = np.asarray(y, dtype='float64')
+        if crs is not None and self.crs is not None:
+            x, y = Transformer.from_crs(crs, self.crs, always_xy=True).transform(x, y)
+        validos = np.isfinite(x) & np.isfinite(y)
+        puntos = np.full(len(x), None, dtype=object)
+        puntos[validos] = shapely.points(x[validos], y[validos])
+        return puntos
+
+    def asignar(self, puntos, distancia_max=DISTANCIA_MAX):
+        """
+        Posición del polígono de cada punto (-1 si ninguno), método
+        (``DENTRO``/``CERCANA``/``SIN_ASIGNAR``) y distancia en unidades del
+        CRS (0 si cae dentro).
+        """
+        n = len(puntos)
+        posicion = np.full(n, -1, dtype=np.int64)
+        metodo = np.full(n, SIN_ASIGNAR, dtype=np.int8)
+        distancia = np.full(n, np.nan)
+
+        # Punto en polígono (el borde cuenta); si toca dos, el primero
+        i_punto, i_poligono = self.arbol.query(puntos, predicate='intersects')
+        orden = np.lexsort((i_poligono, i_punto))
+        i_punto, i_poligono = i_punto[orden], i_poligono[orden]
+        primero = np.ones(len(i_punto), dtype=bool)
+        primero[1:] = i_punto[1:] != i_punto[:-1]
+        posicion[i_punto[primero]] = i_poligono[primero]
+        metodo[i_punto[primero]] = DENTRO
+        distancia[i_punto[primero]] = 0.0
+
+        # Respaldo: polígono más cercano dentro de distancia_max
+        faltan = np.flatnonzero((posicion < 0) & ~shapely.is_missing(puntos))
+        if len(faltan) and distancia_max:
+            (i_falta, i_cercano), d = self.arbol.query_nearest(
+                puntos[faltan], max_distance=distancia_max, return_distance=True,
+                all_matches=False)
+            posicion[faltan[i_falta]] = i_cercano
+            metodo[faltan[i_falta]] = CERCANA
+            distancia[faltan[i_falta]] = d
+        return posicion, metodo, distancia
+
+
+def indice_desde_almacen(almacen, ruta_poligonos, clave=CLAVE_GEO, crs=CRS_METRICO):
+    """
+    Índice de ``ruta_poligonos`` usando (o creando) su etapa en el almacén
+    """
+    etapa = almacen.ejecutar(f"indice_{clave.lower()}", etapa_indice,
+                             archivos=[ruta_poligonos],
+                             parametros={'clave': clave, 'crs': crs})
+    return IndicePoligonos(etapa.valor(), clave)
+
+
+# ── Asignación por lotes ─────────────────────────────────────────────────────
+def eventos_a_columnas(codigos_evento, eventos=EVENTOS):
+    """
+    Índice de columna de conteo de cada caso (-1 si el evento no interesa)
+    """
+    columna = np.full(len(codigos_evento), -1, dtype=np.int64)
+    codigos_evento = pd.to_numeric(pd.Series(codigos_evento), errors='coerce').to_numpy()
+    for j, codigos in enumerate(eventos.values()):
+        columna[np.isin(codigos_evento, codigos)] = j
+    return columna
+
+
+def asignar_lotes(lotes, indice, eventos=EVENTOS, crs=CRS_PUNTOS,
+                  distancia_max=DISTANCIA_MAX, col_x=COL_X, col_y=COL_Y,
+                  col_evento=COL_EVENTO, guardar_sin_asignar=True):
+    """
+    Asigna los lotes (DataFrames de casos) y devuelve (conteos, reporte).
+
+    ``conteos`` tiene una fila por polígono con algún caso (``clave`` y una
+    columna por evento); ``reporte`` resume cuántos puntos cayeron dentro,
+    en la manzana más cercana o sin asignar, y guarda las filas no
+    asignadas en ``reporte['sin_asignar_filas']``.
+    """
+    n_pol, n_ev = len(indice), len(eventos)
+    acumulado = np.zeros(n_pol * n_ev, dtype=np.int64)
+    resumen = np.zeros(len(METODOS), dtype=np.int64)
+    fuera_de_eventos = 0
+    distancias, sin_asignar = [], []
+
+    for lote in lotes:
+        columna = eventos_a_columnas(lote[col_evento], eventos)
+        utiles = columna >= 0
+        fuera_de_eventos += int((~utiles).sum())
+        lote, columna = lote[utiles], columna[utiles]
+
+        puntos = indice.puntos(lote[col_x].to_numpy(), lote[col_y].to_numpy(), crs)
+        posicion, metodo, distancia = indice.asignar(puntos, distancia_max)
+
+        resumen += np.bincount(metodo, minlength=len(METODOS))
+        asignado = posicion >= 0
+        acumulado += np.bincount(posicion[asignado] * n_ev + columna[asignado],
+                                 minlength=n_pol * n_ev)
+        distancias.append(distancia[metodo == CERCANA])
+        if guardar_sin_asignar:
+            sin_asignar.append(lote[~asignado])
+
+    matriz = acumulado.reshape(n_pol, n_ev)
+    con_casos = matriz.sum(axis=1) > 0
+    conteos = pd.DataFrame(matriz[con_casos], columns=list(eventos))
+    conteos.insert(0, indice.clave, indice.codigos[con_casos])
+    conteos = conteos.sort_values(indice.clave, kind='stable').reset_index(drop=True)
+
+    distancias = np.concatenate(distancias) if distancias else np.array([])
+    reporte = {METODOS[m]: int(c) for m, c in enumerate(resumen)}
+    reporte['fuera_de_eventos'] = fuera_de_eventos
+    reporte['distancia_cercana_max'] = float(distancias.max()) if len(distancias) else 0.0
+    if guardar_sin_asignar:
+        reporte['sin_asignar_filas'] = (pd.concat(sin_asignar, ignore_index=True)
+                                        if sin_asignar else pd.DataFrame())
+    return conteos, reporte
+
+
+def asignar_archivo(ruta, indice, tam_lote=TAM_LOTE, col_x=COL_X, col_y=COL_Y,
+                    col_evento=COL_EVENTO, **kwargs):
+    """
+    ``asignar_lotes`` sobre un CSV de casos leído en lotes de ``tam_lote``
+    """
+    lotes = pd.read_csv(ruta, usecols=[col_x, col_y, col_evento],
+                        dtype={col_x: 'float64', col_y: 'float64'},
+                        chunksize=tam_lote)
+    return asignar_lotes(lotes, indice, col_x=col_x, col_y=col_y,
+                         col_evento=col_evento, **kwargs)
+
+
+def conteos_por_municipio(conteos, clave=CLAVE_GEO, clave_mpio='MPIO_CDPMP'):
+    """
+    Suma los conteos por manzana al municipio (los 5 primeros dígitos del
+    código DANE de la manzana); columnas como las del dashboard.
+    """
+    por_mpio = conteos.drop(columns=clave).groupby(conteos[clave].str[:5]).sum()
+    return por_mpio.rename_axis(clave_mpio).reset_index()
+
+
+def informar(reporte):
+    total = sum(reporte[m] for m in METODOS.values())
+    print(f"Casos asignados: {total:,}")
+    for m in METODOS.values():
+        print(f"  {m:<12} {reporte[m]:>10,} ({reporte[m] / max(total, 1):.1%})")
+    print(f"  fuera de los eventos de interés: {reporte['fuera_de_eventos']:,}")
+    if reporte[METODOS[CERCANA]]:
+        print(f"  distancia máxima a la manzana cercana: {reporte['distancia_cercana_max']:.1f} m")
@@ -0,0 +1,247 @@
+"""
+Consultas SQL fuera de memoria (DuckDB) sobre los microdatos del CNPV.
+
+Los CSV de viviendas, hogares, personas y MGN se convierten una sola vez
+a Parquet (``convertir``) con los tipos de ``esquema`` y se consultan
+como vistas ``viv``, ``hog``, ``per`` y ``mgn``. DuckDB lee solo las
+columnas de cada consulta, usa todos los hilos y, si una agregación no
+cabe en ``memoria``, vuelca a disco (``<directorio>/_temporal``): el
+archivo de personas, el más grande del censo, nunca pasa por pandas.
+
+Las agregaciones por manzana se generan en SQL desde las mismas
+declaraciones que la ingesta por bloques (``TABLA_VIV``, ``TABLA_HOG``,
+``TABLA_PER`` y el ``REGISTRO`` de reclasificación) y dan el mismo
+resultado que ``ingesta.agregar_tabla``. Una variable nueva se agrega
+declarándola en ``reclasificacion.REGISTRO``; cualquier otra agregación
+se escribe directamente con ``consultar``.
+
+    with Consultas(rutas, '/datos/cnpv_parquet', memoria='4GB') as c:
+        personas = c.agregar('per')
+        edades = c.consultar('SELECT m.COD_DANE_ANM, avg(p.P_EDADR) ... GROUP BY 1')
+    capa = unir_manzanas(capa, personas)
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from .etapas import hash_parametros
+from .esquema import (
+    CLAVE_ENCUESTA, CLAVE_GEO, CLAVE_MANZANA, ESQUEMA_HOG, ESQUEMA_MANZANA, ESQUEMA_MGN,
+    ESQUEMA_PER, ESQUEMA_VIV, aplicar_esquema, tipos,
+)
+from .ingesta import TABLA_HOG, TABLA_PER, TABLA_VIV
+from .reclasificacion import informar_no_mapeados
+
+# Vista -> (esquema de la conversión a Parquet, declaración de la agregación)
+TABLAS = {
+    'viv': (ESQUEMA_VIV, TABLA_VIV),
+    'hog': (ESQUEMA_HOG, TABLA_HOG),
+    'per': (ESQUEMA_PER, TABLA_PER),
+    'mgn': (ESQUEMA_MGN, None),
+}
+
+TIPOS_SQL = {
+    'UInt8': 'UTINYINT',
+    'UInt32': 'UINTEGER',
+    'int64': 'BIGINT',
+    'float32': 'FLOAT',
+    'category': 'VARCHAR',
+    'string[pyarrow]': 'VARCHAR',
+}
+
+
+def _texto(valor):
+    """
+    Literal de texto SQL
+    """
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def conectar(memoria=None, hilos=None, temporal=None):
+    """
+    Conexión DuckDB en memoria con límite de memoria, hilos y directorio
+    de volcado a disco
+    """
+    import duckdb
+
+    con = duckdb.connect()
+    if memoria:
+        con.execute(f"SET memory_limit = {_texto(memoria)}")
+    if hilos:
+        con.execute(f"SET threads = {int(hilos)}")
+    if temporal:
+        Path(temporal).mkdir(parents=True, exist_ok=True)
+        con.execute(f"SET temp_directory = {_texto(temporal)}")
+    # Sin orden de inserción las agregaciones pueden volcar a disco
+    con.execute("SET preserve_insertion_order = false")
+    return con
+
+
+def convertir(con, ruta_csv, destino, esquema):
+    """
+    Convierte ``ruta_csv`` a Parquet (ZSTD) con los tipos de ``esquema``.
+    El nombre lleva la huella de las columnas y sus tipos
+    (``<destino>-<huella>.parquet``): la conversión se reutiliza si es más
+    reciente que el CSV y se rehace si cambia el esquema. Devuelve la ruta.
+    """
+    destino = Path(destino)
+    columnas = list(pd.read_csv(ruta_csv, nrows=0).columns)
+    tipos_sql = {c: TIPOS_SQL[t] for c, t in tipos(esquema, columnas).items()}
+    firma = hash_parametros({'columnas': columnas, 'tipos': tipos_sql})[:12]
+    previas = destino.parent.glob(f"{destino.stem}-*{destino.suffix}")
+    destino = destino.with_name(f"{destino.stem}-{firma}{destino.suffix}")
+    if destino.exists() and destino.stat().st_mtime >= Path(ruta_csv).stat().st_mtime:
+        return destino
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    # Conversiones del mismo CSV con otro esquema ya no se usan
+    for previa in previas:
+        if previa != destino:
+            previa.unlink(missing_ok=True)
+    declarados = ', '.join(f"{_texto(c)}: {_texto(t)}" for c, t in tipos_sql.items())
+    temporal = destino.with_name(destino.name + '.tmp')
+    con.execute(f"""
+        COPY (SELECT * FROM read_csv({_texto(ruta_csv)}, header = true, types = {{{declarados}}}))
+        TO {_texto(temporal)} (FORMAT parquet, COMPRESSION zstd)
+    """)
+    os.replace(temporal, destino)
+    return destino
+
+
+# ── SQL de las agregaciones ─────────────────────────────────────────────────
+def expresion(columna, entrada):
+    """
+    Reclasificación de ``columna`` según su entrada del registro: los
+    códigos sin mapeo y el sentinela quedan en NULL
+    """
+    if 'mapeo' in entrada:
+        clases = {}
+        for codigo, clase in entrada['mapeo'].items():
+            clases.setdefault(clase, []).append(str(codigo))
+        casos = ' '.join(f"WHEN {columna} IN ({', '.join(c)}) THEN {clase}"
+                         for clase, c in clases.items())
+        return f"CASE {casos} END"
+    if entrada.get('sentinela') is not None:
+        return f"NULLIF({columna}, {entrada['sentinela']})"
+    return columna
+
+
+def sql_agregado(tabla, vista, mgn='mgn'):
+    """
+    Consulta equivalente a ``ingesta.agregar_tabla``: registros con las
+    columnas ``no_nulas`` completas y manzana asignada, porcentajes sobre
+    todos los registros de la manzana, ``tabla['total']`` y las sumas
+    """
+    reclasificadas = ',\n               '.join(
+        f"{expresion('r.' + c, e)} AS {c}" for c, e in tabla['registro'].items())
+    filtro = ' AND '.join(f"r.{c} IS NOT NULL" for c in tabla['no_nulas'])
+    salidas = []
+    for columna, valores in tabla['variables'].items():
+        for valor, nombre in valores.items():
+            salidas.append(f"count(*) FILTER (WHERE {columna} = {valor}) / count(*) * 100 AS {nombre}")
+    salidas.append(f"count(*) AS {tabla['total']}")
+    for columna, nombre in tabla['sumas'].items():
+        salidas.append(f"coalesce(sum({columna}), 0) AS {nombre}")
+    salidas = ',\n           '.join(salidas)
+    return f"""
+    WITH registros AS (
+        SELECT m.{CLAVE_MANZANA},
+               {reclasificadas}
+        FROM {vista} AS r JOIN {mgn} AS m USING ({CLAVE_ENCUESTA})
+        WHERE {filtro} AND m.{CLAVE_MANZANA} IS NOT NULL
+    )
+    SELECT {CLAVE_MANZANA},
+           {salidas}
+    FROM registros
+    GROUP BY {CLAVE_MANZANA}
+    ORDER BY {CLAVE_MANZANA}
+    """
+
+
+def sql_no_mapeados(tabla, vista, columna):
+    """
+    Códigos de ``columna`` sin clase en el registro (ver ``reclasificar``)
+    """
+    entrada = tabla['registro'][columna]
+    conocidos = [*entrada['mapeo'], *([entrada['sentinela']] if 'sentinela' in entrada else [])]
+    filtro = ' AND '.join(f"{c} IS NOT NULL" for c in tabla['no_nulas'])
+    return f"""
+    SELECT {columna} AS codigo, count(*) AS cantidad FROM {vista}
+    WHERE {filtro} AND {columna} IS NOT NULL
+      AND {columna} NOT IN ({', '.join(map(str, conocidos))})
+    GROUP BY 1 ORDER BY 1
+    """
+
+
+class Consultas:
+    """
+    Vistas DuckDB sobre la conversión a Parquet de los CSV de ``rutas``
+    ({'viv' | 'hog' | 'per' | 'mgn': ruta CSV})
+    """
+
+    def __init__(self, rutas, directorio, memoria=None, hilos=None):
+        self.directorio = Path(directorio)
+        self.con = conectar(memoria, hilos, self.directorio / '_temporal')
+        self.vistas = []
+        for vista, ruta in rutas.items():
+            if vista not in TABLAS:
+                continue
+            parquet = convertir(self.con, ruta, self.directorio / f"{Path(ruta).stem}.parquet",
+                                TABLAS[vista][0])
+            self.con.execute(f"CREATE VIEW {vista} AS SELECT * FROM read_parquet({_texto(parquet)})")
+            self.vistas.append(vista)
+
+    def consultar(self, sql, esquema=ESQUEMA_MANZANA):
+        """
+        Resultado de ``sql`` como DataFrame con los tipos de ``esquema``
+        """
+        return aplicar_esquema(self.con.execute(sql).df(), esquema)
+
+    def agregar(self, vista, tabla=None, esquema=ESQUEMA_MANZANA):
+        """
+        Agregación por manzana de ``vista`` (por defecto su tabla de ``TABLAS``)
+        """
+        return self.consultar(sql_agregado(tabla or TABLAS[vista][1], vista), esquema)
+
+    def no_mapeados(self, vista, tabla=None):
+        """
+        Reporte {columna: {codigo: cantidad}} con el formato de ``reclasificar``
+        """
+        tabla = tabla or TABLAS[vista][1]
+        reporte = {}
+        for columna, entrada in tabla['registro'].items():
+            if 'mapeo' in entrada:
+                filas = self.con.execute(sql_no_mapeados(tabla, vista, columna)).fetchall()
+                reporte[columna] = {int(codigo): cantidad for codigo, cantidad in filas}
+        return reporte
+
+    def cerrar(self):
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *error):
+        self.cerrar()
+        return False
+
+
+def unir_manzanas(capa, agregados, clave=CLAVE_GEO):
+    """
+    Une ``agregados`` (por ``COD_DANE_ANM``) a la capa de manzanas; las
+    manzanas sin registros quedan con nulos
+    """
+    agregados = agregados.rename(columns={CLAVE_MANZANA: clave})
+    return capa.merge(agregados, on=clave, how='left')
+
+
+# ── Etapas ───────────────────────────────────────────────────────────────────
+def etapa_consulta(ruta, ruta_mgn, vista, tabla, esquema=ESQUEMA_MANZANA, directorio=None,
+                   memoria=None, hilos=None):
+    with Consultas({vista: ruta, 'mgn': ruta_mgn}, directorio, memoria, hilos) as consultas:
+        informar_no_mapeados(consultas.no_mapeados(vista, tabla), titulo=f"{Path(ruta).name} ")
+        return consultas.agregar(vista, tabla, esquema)
+
+
+def etapa_unir(capa, agregados):
+    return unir_manzanas(capa, agregados)
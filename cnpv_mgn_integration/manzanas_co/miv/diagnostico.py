@@ -0,0 +1,177 @@
+"""
+Diagnóstico de cobertura de las uniones del pipeline en una sola pasada.
+
+Reemplaza las celdas de ``isin``/``set`` del notebook: por cada tabla se
+construye una vez un ``IndiceClaves`` (claves únicas en la tabla hash de
+un ``pd.Index`` y cuántas filas tiene cada una) y cada unión se evalúa
+recorriendo una sola vez las claves del lado izquierdo, también por
+bloques. De cada unión se informa: claves y filas emparejadas, claves
+solo a la izquierda o solo a la derecha, claves duplicadas, nulas y
+ejemplos de huérfanas.
+
+``compuerta()`` compara esas métricas con umbrales y detiene el pipeline
+(``CoberturaInsuficiente``) si alguna unión no los cumple.
+"""
+import numpy as np
+import pandas as pd
+
+N_MUESTRAS = 10
+
+# Umbrales por unión: '<métrica>_min' / '<métrica>_max'
+UMBRALES = {
+    'viv_mgn': {'cobertura_izq_min': 0.99},
+    'hog_mgn': {'cobertura_izq_min': 0.99},
+    'viv_hog': {'cobertura_izq_min': 0.95, 'cobertura_der_min': 0.95,
+                'duplicadas_izq_max': 0, 'duplicadas_der_max': 0},
+    'mgn_manzanas': {'cobertura_der_min': 0.90},
+    'completo_manzanas': {'cobertura_izq_min': 0.90, 'cobertura_der_min': 0.80,
+                          'duplicadas_izq_max': 0, 'duplicadas_der_max': 0},
+}
+
+
+class CoberturaInsuficiente(ValueError):
+    pass
+
+
+class IndiceClaves:
+    """
+    Claves únicas de una tabla (índice hash) y número de filas de cada una
+    """
+
+    def __init__(self, claves, nombre=''):
+        codigos, unicas = pd.factorize(pd.Series(claves), use_na_sentinel=True)
+        validos = codigos >= 0
+        self.nombre = nombre
+        self.unicas = pd.Index(unicas)
+        self.repeticiones = np.bincount(codigos[validos], minlength=len(unicas))
+        self.filas = len(codigos)
+        self.nulas = int((~validos).sum())
+
+    def __len__(self):
+        return len(self.unicas)
+
+    def posiciones(self, claves):
+        """
+        Posición de cada clave entre las únicas (-1 si no está)
+        """
+        return self.unicas.get_indexer(claves)
+
+
+class Cobertura:
+    """
+    Cobertura de una unión izquierda -> ``derecha`` acumulada por bloques
+    """
+
+    def __init__(self, union, izquierda, derecha, n_muestras=N_MUESTRAS):
+        self.union = union
+        self.izquierda = izquierda
+        self.derecha = derecha
+        self.n_muestras = n_muestras
+        self.golpes = np.zeros(len(derecha), dtype=np.int64)   # filas izq por clave der
+        self.huerfanas = pd.Series(dtype='int64')               # clave izq -> filas
+        self.filas = 0
+        self.nulas = 0
+
+    def agregar(self, claves):
+        claves = pd.Series(claves)
+        nulas = claves.isna().to_numpy()
+        claves = claves[~nulas]
+        posiciones = self.derecha.posiciones(claves)
+        emparejadas = posiciones >= 0
+        self.golpes += np.bincount(posiciones[emparejadas], minlength=len(self.golpes))
+        if not emparejadas.all():
+            # Con claves categóricas ``value_counts`` trae también las
+            # categorías sin filas (conteo 0): solo cuentan las observadas
+            nuevas = claves[~emparejadas].value_counts()
+            nuevas = nuevas[nuevas > 0]
+            if isinstance(nuevas.index, pd.CategoricalIndex):
+                nuevas.index = nuevas.index.astype(object)
+            self.huerfanas = self.huerfanas.add(nuevas, fill_value=0).astype('int64')
+        self.filas += len(nulas)
+        self.nulas += int(nulas.sum())
+        return self
+
+    def resultado(self):
+        derecha = self.derecha
+        con_golpe = self.golpes > 0
+        filas_izq = self.filas - self.nulas
+        filas_emparejadas = int(self.golpes.sum())
+        solo_der = ~con_golpe
+        return {
+            'union': self.union,
+            'izquierda': self.izquierda,
+            'derecha': derecha.nombre,
+            'filas_izq': self.filas,
+            'filas_der': derecha.filas,
+            'nulas_izq': self.nulas,
+            'nulas_der': derecha.nulas,
+            'claves_izq': int(con_golpe.sum()) + len(self.huerfanas),
+            'claves_der': len(derecha),
+            'claves_comunes': int(con_golpe.sum()),
+            'solo_izq': len(self.huerfanas),
+            'solo_der': int(solo_der.sum()),
+            'filas_solo_izq': int(self.huerfanas.sum()),
+            'filas_solo_der': int(derecha.repeticiones[solo_der].sum()),
+            'duplicadas_izq': int((self.golpes > 1).sum() + (self.huerfanas > 1).sum()),
+            'duplicadas_der': int((derecha.repeticiones > 1).sum()),
+            'cobertura_izq': filas_emparejadas / filas_izq if filas_izq else 1.0,
+            'cobertura_der': con_golpe.mean() if len(derecha) else 1.0,
+            'muestras_izq': ', '.join(map(str, self.huerfanas.sort_index().index[:self.n_muestras])),
+            'muestras_der': ', '.join(map(str, derecha.unicas[solo_der][:self.n_muestras])),
+        }
+
+
+def comparar(union, izquierda, derecha, nombre_izq='', n_muestras=N_MUESTRAS):
+    """
+    Métricas de la unión de las claves ``izquierda`` contra ``derecha``
+    (``IndiceClaves`` o una serie de claves)
+    """
+    if not isinstance(derecha, IndiceClaves):
+        derecha = IndiceClaves(derecha)
+    return Cobertura(union, nombre_izq, derecha, n_muestras).agregar(izquierda).resultado()
+
+
+def verificar(resultado, umbrales):
+    """
+    Lista de incumplimientos de ``resultado`` frente a ``umbrales``
+    """
+    fallas = []
+    for regla, limite in umbrales.items():
+        metrica, tipo = regla.rsplit('_', 1)
+        valor = resultado[metrica]
+        if (tipo == 'min' and valor < limite) or (tipo == 'max' and valor > limite):
+            fallas.append(f"{resultado['union']}: {metrica}={valor:.4g} "
+                          f"({'<' if tipo == 'min' else '>'} {limite})")
+    return fallas
+
+
+def informar(diagnostico):
+    """
+    Imprime un resumen por unión (``diagnostico`` con una fila por unión)
+    """
+    for r in diagnostico.to_dict('records'):
+        print(f"[{r['union']}] {r['izquierda']} -> {r['derecha']}")
+        print(f"  claves: {r['claves_comunes']:,} comunes, {r['solo_izq']:,} solo izq., "
+              f"{r['solo_der']:,} solo der. | duplicadas: {r['duplicadas_izq']:,} izq., "
+              f"{r['duplicadas_der']:,} der.")
+        print(f"  cobertura: {r['cobertura_izq']:.2%} de filas izq., "
+              f"{r['cobertura_der']:.2%} de claves der.")
+        if r['muestras_izq']:
+            print(f"  huérfanas izq.: {r['muestras_izq']}")
+        if r['muestras_der']:
+            print(f"  huérfanas der.: {r['muestras_der']}")
+
+
+def compuerta(diagnostico, umbrales=UMBRALES, estricto=True):
+    """
+    Detiene el pipeline si alguna unión incumple sus umbrales; con
+    ``estricto=False`` solo imprime las fallas. Devuelve la lista de fallas.
+    """
+    fallas = []
+    for resultado in diagnostico.to_dict('records'):
+        fallas += verificar(resultado, umbrales.get(resultado['union'], {}))
+    if fallas and estricto:
+        raise CoberturaInsuficiente('Cobertura de uniones insuficiente:\n  ' + '\n  '.join(fallas))
+    for falla in fallas:
+        print(f"AVISO {falla}")
+    return fallas
@@ -0,0 +1,178 @@
+"""
+Esquema compacto de las tablas derivadas del CNPV.
+
+Cada tabla declara sus tipos como una lista de ``(patrón, tipo)``: cada
+columna toma el tipo del primer patrón que la cubre por completo y las
+columnas sin patrón (geometría, resultados de otros módulos) no cambian.
+
+- Variables codificadas del CNPV (menos de 100 códigos): ``UInt8``.
+- Claves DANE: ``category`` en las tablas por registro (cada manzana se
+  repite en cientos de viviendas) y texto Arrow (``string[pyarrow]``) en
+  las tablas por manzana. Nunca se leen como número: un float pierde
+  dígitos de un código de 22 y un entero los ceros a la izquierda.
+- Conteos por manzana: ``UInt32``, entero con nulos en lugar de float con NaN.
+- Porcentajes y razones: ``float32``.
+
+El esquema se aplica al leer (``leer_csv``, ``ingesta``) y a la salida de
+cada etapa del pipeline; Parquet conserva los tipos entre etapas.
+``reporte_memoria`` compara la memoria de cada tabla con la que ocuparía
+con los tipos por defecto de ``pd.read_csv`` (int64, float64, object).
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from .reclasificacion import COLUMNAS_HOG, COLUMNAS_PER, COLUMNAS_VIV
+
+# Claves de unión: registro del censo, manzana del MGN y polígono de manzana
+CLAVE_ENCUESTA = 'COD_ENCUESTAS'
+CLAVE_MANZANA = 'COD_DANE_ANM'
+CLAVE_GEO = 'COD_DANE_A'
+
+CODIGOS_DANE = 'DPTO_CCDGO|MPIO_CDPMP|CLAS_CCDGO|SETU_CCNCT|SECU_CCNCT|NMB_LC_CM|TP_LC_CM'
+
+# Tablas por registro (viviendas, hogares, personas y MGN)
+ESQUEMA_VIV = [
+    (CLAVE_ENCUESTA, 'int64'),
+    ('|'.join(COLUMNAS_VIV), 'UInt8'),
+    (CLAVE_MANZANA, 'category'),
+]
+
+ESQUEMA_HOG = [
+    (CLAVE_ENCUESTA, 'int64'),
+    ('|'.join(COLUMNAS_HOG), 'UInt8'),
+    (CLAVE_MANZANA, 'category'),
+]
+
+ESQUEMA_PER = [
+    (CLAVE_ENCUESTA, 'int64'),
+    ('|'.join(COLUMNAS_PER), 'UInt8'),
+    (CLAVE_MANZANA, 'category'),
+]
+
+ESQUEMA_MGN = [
+    (CLAVE_ENCUESTA, 'int64'),
+    (CLAVE_MANZANA, 'category'),
+]
+
+# Tablas por manzana (agregados viv/hog, shapefile de manzanas y capa final)
+ESQUEMA_MANZANA = [
+    (f'{CLAVE_GEO}|{CLAVE_MANZANA}', 'string[pyarrow]'),
+    (CODIGOS_DANE, 'category'),
+    (r'TVIVIENDA|TP\d+_\w+|N_VIV|N_HOG|N_PER|NCUA|NDOR', 'UInt32'),
+    (r'(PCT|PA|PI|IN|CO|AG|ED|DI|NE)_\w+|HACIN|DENSIDAD', 'float32'),
+]
+
+
+class EsquemaInvalido(ValueError):
+    pass
+
+
+def tipos(esquema, columnas):
+    """
+    {columna: tipo} de las ``columnas`` cubiertas por algún patrón de ``esquema``
+    """
+    patrones = [(re.compile(patron), tipo) for patron, tipo in esquema]
+    resultado = {}
+    for columna in columnas:
+        for patron, tipo in patrones:
+            if patron.fullmatch(columna):
+                resultado[columna] = tipo
+                break
+    return resultado
+
+
+def _validar(serie, destino):
+    """
+    Error si ``serie`` no cabe en ``destino`` sin perder información
+    """
+    numerica = pd.api.types.is_numeric_dtype(serie.dtype)
+    if destino.kind in 'OU' or isinstance(destino, (pd.CategoricalDtype, pd.StringDtype)):
+        if numerica:
+            raise EsquemaInvalido(
+                f"{serie.name}: código leído como número ({serie.dtype}); "
+                f"se pierden dígitos o ceros a la izquierda, leer como texto")
+    elif destino.kind in 'iu' and numerica:
+        limites = np.iinfo(getattr(destino, 'numpy_dtype', destino))
+        minimo, maximo = serie.min(), serie.max()
+        if (pd.notna(minimo) and minimo < limites.min) or (pd.notna(maximo) and maximo > limites.max):
+            raise EsquemaInvalido(f"{serie.name}: valores [{minimo}, {maximo}] fuera de {destino}")
+
+
+def aplicar_esquema(df, esquema):
+    """
+    ``df`` con los tipos de ``esquema`` (``EsquemaInvalido`` si un valor no
+    cabe en su tipo). Devuelve ``df`` si ya los tiene.
+    """
+    conversiones = {}
+    for columna, tipo in tipos(esquema, df.columns).items():
+        destino = pd.api.types.pandas_dtype(tipo)
+        if df[columna].dtype != destino:
+            _validar(df[columna], destino)
+            conversiones[columna] = destino
+    if not conversiones:
+        return df
+    try:
+        return df.astype(conversiones)
+    except (TypeError, ValueError) as error:
+        raise EsquemaInvalido(str(error)) from error
+
+
+def leer_csv(ruta, esquema, **kwargs):
+    """
+    ``pd.read_csv`` con los tipos de ``esquema`` desde la lectura
+    """
+    columnas = kwargs.get('usecols') or pd.read_csv(ruta, nrows=0).columns
+    df = pd.read_csv(ruta, dtype=tipos(esquema, columnas), **kwargs)
+    return aplicar_esquema(df, esquema)
+
+
+# ── Memoria ──────────────────────────────────────────────────────────────────
+def _ancha(serie):
+    """
+    ``serie`` con los tipos por defecto de ``pd.read_csv``
+    """
+    tipo = serie.dtype
+    if isinstance(tipo, pd.CategoricalDtype) or pd.api.types.is_string_dtype(tipo):
+        return serie.astype(object)
+    if pd.api.types.is_integer_dtype(tipo):
+        return serie.astype('float64' if serie.hasnans else 'int64')
+    if pd.api.types.is_float_dtype(tipo):
+        return serie.astype('float64')
+    return serie
+
+
+def memoria_mb(df, ancha=False):
+    """
+    Memoria de ``df`` en MB, incluidos los objetos de texto. Con ``ancha``,
+    la que ocuparía con los tipos por defecto (columna por columna).
+    """
+    total = df.index.memory_usage(deep=True)
+    for columna in df.columns:
+        serie = _ancha(df[columna]) if ancha else df[columna]
+        total += serie.memory_usage(deep=True, index=False)
+    return total / 1024 ** 2
+
+
+def reporte_memoria(tablas):
+    """
+    Memoria antes (tipos por defecto) y después (esquema) de cada tabla
+    de ``tablas`` ({nombre: DataFrame})
+    """
+    filas = []
+    for nombre, df in tablas.items():
+        antes, despues = memoria_mb(df, ancha=True), memoria_mb(df)
+        filas.append({'tabla': nombre, 'filas': len(df), 'antes_mb': round(antes, 2),
+                      'despues_mb': round(despues, 2),
+                      'factor': round(antes / despues, 2) if despues else None})
+    return pd.DataFrame(filas)
+
+
+def informar_memoria(reporte):
+    for r in reporte.itertuples():
+        print(f"{r.tabla:<28} {r.filas:>11,} filas {r.antes_mb:>10.1f} -> "
+              f"{r.despues_mb:>9.1f} MB (x{r.factor})")
+    antes, despues = reporte['antes_mb'].sum(), reporte['despues_mb'].sum()
+    if despues:
+        print(f"{'total':<28} {'':>17} {antes:>10.1f} -> {despues:>9.1f} MB (x{antes / despues:.2f})")
@@ -0,0 +1,188 @@
+"""
+Almacén de etapas en Parquet/GeoParquet con claves por contenido.
+
+Cada etapa se identifica por un hash de su nombre, el código fuente de
+su función, sus parámetros (listas de columnas, diccionarios
+``mapeo_*``...), la huella de los
+archivos de origen y las claves de las etapas de las que depende. Si ya
+existe un resultado con esa clave se reutiliza; si cambia cualquiera de
+sus entradas se recalcula solo esa etapa y las que dependen de ella.
+
+Los resultados de etapas previas se leen de disco solo cuando una etapa
+posterior realmente tiene que ejecutarse.
+"""
+import hashlib
+import inspect
+import json
+import os
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .medicion import filas, medir
+
+# Extensiones que acompañan a un shapefile y forman parte de su contenido
+EXTENSIONES_SHAPEFILE = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+
+
+def hash_parametros(valor):
+    """
+    Hash estable de un objeto serializable (dicts, listas, números, texto)
+    """
+    texto = json.dumps(valor, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def hash_codigo(funcion):
+    """
+    Hash del código fuente de ``funcion`` (o de su bytecode si no hay fuente):
+    editar la función de una etapa invalida sus resultados guardados
+    """
+    try:
+        codigo = inspect.getsource(funcion).encode('utf-8')
+    except (OSError, TypeError):
+        codigo = funcion.__code__.co_code
+    return hashlib.sha256(codigo).hexdigest()
+
+
+def _hash_archivo(ruta, tam=1 << 20):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        while bloque := f.read(tam):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class Etapa:
+    """
+    Resultado (perezoso) de una etapa: su clave y cómo leerlo de disco
+    """
+
+    def __init__(self, nombre, clave, ruta):
+        self.nombre = nombre
+        self.clave = clave
+        self.ruta = ruta
+        self._valor = None
+
+    def valor(self):
+        if self._valor is None:
+            self._valor = leer_parquet(self.ruta)
+        return self._valor
+
+    def __repr__(self):
+        return f"Etapa({self.nombre!r}, {self.clave[:12]})"
+
+
+def leer_parquet(ruta, columnas=None):
+    """
+    Lee un Parquet como GeoDataFrame si tiene metadatos GeoParquet
+    """
+    if b'geo' in (pq.read_schema(ruta).metadata or {}):
+        return gpd.read_parquet(ruta, columns=columnas)
+    return pd.read_parquet(ruta, columns=columnas)
+
+
+def escribir_parquet(df, ruta):
+    """
+    Escribe ``df`` (GeoParquet si es GeoDataFrame) de forma atómica
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    df.to_parquet(temporal, index=False)
+    os.replace(temporal, ruta)
+
+
+class AlmacenEtapas:
+    """
+    Directorio con los resultados de cada etapa: ``<directorio>/<nombre>/<clave>.parquet``
+    """
+
+    def __init__(self, directorio, verbose=True):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.verbose = verbose
+        self._ruta_huellas = self.directorio / '_huellas.json'
+        self._huellas = (json.loads(self._ruta_huellas.read_text())
+                         if self._ruta_huellas.exists() else {})
+
+    def huella(self, ruta):
+        """
+        Hash del contenido de un archivo de origen (o de todos los archivos
+        de un shapefile). Se memoriza por ruta, tamaño y fecha de
+        modificación para no releer archivos grandes que no han cambiado.
+        """
+        ruta = Path(ruta).resolve()
+        if ruta.suffix.lower() == '.shp':
+            partes = [p for p in (ruta.with_suffix(e) for e in EXTENSIONES_SHAPEFILE)
+                      if p.exists()]
+        else:
+            partes = [ruta]
+
+        hashes = []
+        for parte in partes:
+            estado = parte.stat()
+            firma = [estado.st_size, estado.st_mtime_ns]
+            guardada = self._huellas.get(str(parte))
+            if guardada is None or guardada['firma'] != firma:
+                guardada = {'firma': firma, 'sha256': _hash_archivo(parte)}
+                self._huellas[str(parte)] = guardada
+                self._ruta_huellas.write_text(json.dumps(self._huellas, indent=1))
+            hashes.append(guardada['sha256'])
+        return hash_parametros(hashes)
+
+    def ejecutar(self, nombre, funcion, depende=(), archivos=(), parametros=None,
+                 opciones=None):
+        """
+        Ejecuta ``funcion(*valores_depende, *archivos, **parametros, **opciones)``
+        o reutiliza su resultado guardado.
+
+        ``depende`` son objetos ``Etapa`` previos, ``archivos`` rutas de
+        origen y ``parametros`` un dict serializable que forma parte de la
+        clave, como el código de ``funcion`` (no el de las funciones que
+        llama). ``opciones`` (p. ej. el tamaño de bloque) no cambian el
+        resultado y no entran en la clave. Devuelve la ``Etapa`` resultante.
+        Cada llamada queda medida (``medicion``) con ``estado`` en caché o
+        calculada.
+        """
+        parametros = parametros or {}
+        opciones = opciones or {}
+        clave = hash_parametros({
+            'etapa': nombre,
+            'funcion': f"{funcion.__module__}.{funcion.__qualname__}",
+            'codigo': hash_codigo(funcion),
+            'depende': [e.clave for e in depende],
+            'archivos': [self.huella(a) for a in archivos],
+            'parametros': parametros,
+        })
+        ruta = self.directorio / nombre / f"{clave}.parquet"
+        etapa = Etapa(nombre, clave, ruta)
+
+        if ruta.exists():
+            if self.verbose:
+                print(f"[{nombre}] en caché ({clave[:12]})")
+            with medir(nombre, estado='cache', clave=clave[:12]):
+                pass
+            return etapa
+
+        if self.verbose:
+            print(f"[{nombre}] calculando ({clave[:12]})")
+        with medir(nombre, estado='calculada', clave=clave[:12]) as m:
+            valores = [e.valor() for e in depende]
+            m.filas_entrada = sum(filas(v) or 0 for v in valores) if valores else None
+            resultado = funcion(*valores, *archivos, **parametros, **opciones)
+            m.filas_salida = filas(resultado)
+            escribir_parquet(resultado, ruta)
+        etapa._valor = resultado
+        return etapa
+
+    def limpiar(self, conservar):
+        """
+        Elimina los resultados que no pertenecen a las etapas ``conservar``
+        """
+        vigentes = {e.ruta for e in conservar}
+        for ruta in self.directorio.glob('*/*.parquet'):
+            if ruta not in vigentes:
+                ruta.unlink()
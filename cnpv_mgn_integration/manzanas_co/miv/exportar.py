@@ -0,0 +1,149 @@
+"""
+Exportación y lectura selectiva de la capa final de manzanas.
+
+La salida principal es GeoParquet: nombres de columna completos, sin el
+límite de 2 GB del shapefile, filas ordenadas por curva de Hilbert y una
+columna ``bbox`` por fila (covering) para que los lectores descarten
+grupos de filas fuera de una ventana. Opcionalmente se escribe también
+FlatGeobuf con índice espacial para herramientas SIG.
+
+    leer_capa('mnz_ris_miv_clean.parquet', columnas=['HACIN'], bbox=(...))
+    leer_atributos('mnz_ris_miv_clean.parquet', ['HACIN'], mpio='66001')
+
+Los indicadores derivados (``PCT_*``, ``HACIN``; ``miv.indicadores``) se
+escriben solo si se piden (``indicadores``); al leer, un indicador que no
+está en el archivo se calcula desde sus columnas base.
+"""
+import os
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+from .indicadores import columnas_base, con_indicadores
+
+# Filas por grupo de filas del Parquet: unidad mínima de lectura por bbox
+FILAS_POR_GRUPO = 20_000
+
+# Clave de partición del dataset nacional (``miv.nacional``)
+CLAVE_PARTICION = 'DPTO_CCDGO'
+
+
+def exportar_geoparquet(gdf, ruta, filas_por_grupo=FILAS_POR_GRUPO):
+    """
+    Escribe ``gdf`` como GeoParquet ordenado espacialmente y con bbox por fila
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    if len(gdf):
+        orden = gdf.geometry.hilbert_distance().argsort(kind='stable')
+        gdf = gdf.iloc[orden]
+    # Categorías como texto (Parquet igual lo codifica por diccionario): cada
+    # partición del dataset nacional tendría índices de otro ancho
+    categoricas = gdf.select_dtypes('category').columns
+    if len(categoricas):
+        gdf = gdf.astype({c: 'string[pyarrow]' for c in categoricas})
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    gdf.to_parquet(temporal, index=False, write_covering_bbox=True,
+                   row_group_size=filas_por_grupo)
+    os.replace(temporal, ruta)
+    return ruta
+
+
+def exportar_flatgeobuf(gdf, ruta):
+    """
+    Escribe ``gdf`` como FlatGeobuf con índice espacial (R-tree empaquetado)
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    gdf.to_file(ruta, driver='FlatGeobuf', SPATIAL_INDEX='YES')
+    return ruta
+
+
+def exportar_capa(gdf, ruta_base, flatgeobuf=False, indicadores=()):
+    """
+    Exporta ``<ruta_base>.parquet`` y, si se pide, ``<ruta_base>.fgb``, con
+    los ``indicadores`` derivados como columnas
+    """
+    ruta_base = Path(ruta_base)
+    gdf = con_indicadores(gdf, indicadores)
+    rutas = [exportar_geoparquet(gdf, ruta_base.with_suffix('.parquet'))]
+    if flatgeobuf:
+        rutas.append(exportar_flatgeobuf(gdf, ruta_base.with_suffix('.fgb')))
+    return rutas
+
+
+def particiones(ruta):
+    """
+    Opciones de lectura de ``ruta``: en un dataset particionado la clave de
+    partición se lee como texto (inferida sería entera y perdería el cero
+    inicial: '05' -> 5)
+    """
+    if not Path(ruta).is_dir():
+        return {}
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    esquema = pa.schema([(CLAVE_PARTICION, pa.string())])
+    return {'partitioning': ds.partitioning(esquema, flavor='hive')}
+
+
+def columnas_archivo(ruta):
+    """
+    Columnas de atributos de un GeoParquet (archivo o dataset) o
+    FlatGeobuf, sin leer filas
+    """
+    ruta = Path(ruta)
+    if ruta.suffix.lower() == '.fgb':
+        import pyogrio
+
+        return list(pyogrio.read_info(ruta)['fields'])
+    import pyarrow.parquet as pq
+
+    esquema = pq.ParquetDataset(ruta, **particiones(ruta)).schema
+    return [c for c in esquema.names if c != 'geometry']
+
+
+def _indicadores(datos, columnas, leidas):
+    """
+    ``datos`` con ``columnas`` en su orden, calculando las que no se leyeron
+    """
+    datos = con_indicadores(datos, [c for c in columnas if c not in leidas])
+    return datos[columnas + (['geometry'] if 'geometry' in datos.columns else [])]
+
+
+def leer_capa(ruta, columnas=None, bbox=None):
+    """
+    Lee solo ``columnas`` (más la geometría) y, si se da ``bbox``
+    (xmin, ymin, xmax, ymax), solo las manzanas que lo intersecan.
+    """
+    ruta = Path(ruta)
+    if columnas is None:
+        leer = None
+    else:
+        columnas = [c for c in columnas if c != 'geometry']
+        leer = columnas_base(columnas, columnas_archivo(ruta))
+    if ruta.suffix.lower() == '.fgb':
+        capa = gpd.read_file(ruta, columns=leer, bbox=bbox)
+    else:
+        capa = gpd.read_parquet(ruta, columns=None if leer is None else leer + ['geometry'],
+                                bbox=bbox, **particiones(ruta))
+    if columnas is None:
+        return capa
+    return _indicadores(capa, columnas, leer)
+
+
+def leer_atributos(ruta, columnas, mpio=None, dpto=None):
+    """
+    Atributos sin geometría desde GeoParquet, filtrando por municipio
+    (``MPIO_CDPMP``) o departamento (``DPTO_CCDGO``) en la lectura.
+    """
+    columnas = ['COD_DANE_A', *columnas]
+    leer = columnas_base(columnas, columnas_archivo(ruta))
+    filtros = []
+    if mpio is not None:
+        filtros.append(('MPIO_CDPMP', '==', str(mpio)))
+    if dpto is not None:
+        filtros.append((CLAVE_PARTICION, '==', str(dpto)))
+    datos = pd.read_parquet(ruta, columns=leer, filters=filtros or None, **particiones(ruta))
+    return _indicadores(datos, columnas, leer)
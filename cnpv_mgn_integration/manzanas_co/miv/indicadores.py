@@ -0,0 +1,179 @@
+"""
+Registro de indicadores derivados por manzana (``PCT_*``, ``HACIN``...).
+
+Cada indicador es una razón ``numerador / denominador * escala`` sobre
+columnas base (conteos) de la capa. La capa guarda solo las columnas base;
+los indicadores se calculan al pedirlos, vectorizados, solo los pedidos y
+una sola vez por tabla (``Indicadores``). Como numerador y denominador son
+conteos sumables, la misma definición vale por manzana y en cualquier
+nivel de agregación (``miv.agregados`` suma las bases y evalúa el registro
+en cada nivel). Un denominador 0 o nulo da NaN, no infinito.
+
+Los porcentajes de la ingesta (``PA_*``, ``ED_*``...) se calculan al
+agregar los registros y se guardan en la capa: figuran con numerador
+``None`` y su denominador, para poder rehacerlos por nivel.
+
+    indicadores = Indicadores(capa)
+    indicadores['HACIN']                                # Serie, calculada una vez
+    capa = con_indicadores(capa, ['PCT_GAS', 'HACIN'])  # como columnas de la capa
+"""
+import numpy as np
+import pandas as pd
+
+from .esquema import ESQUEMA_MANZANA, aplicar_esquema
+from .ingesta import TABLA_HOG, TABLA_PER, TABLA_VIV
+
+DECIMALES = 2
+
+# Porcentajes de servicios públicos: indicador -> numerador (sobre TVIVIENDA)
+SERVICIOS = {
+    'PCT_ENERGIA': 'TP19_EE_1',
+    'PCT_ACUEDUCTO': 'TP19_ACU_1',
+    'PCT_ALCANTARILLADO': 'TP19_ALC_1',
+    'PCT_GAS': 'TP19_GAS_1',
+    'PCT_BASURAS': 'TP19_RECB1',
+}
+
+
+class Razon:
+    """
+    ``numerador / denominador * escala`` redondeada a ``decimales``.
+    ``numerador`` es una columna, una lista de columnas (se suman) o
+    ``None`` si el indicador solo existe ya calculado en la capa.
+    """
+
+    def __init__(self, numerador, denominador, escala=100, decimales=DECIMALES):
+        if isinstance(numerador, str):
+            numerador = [numerador]
+        self.numerador = None if numerador is None else list(numerador)
+        self.denominador = denominador
+        self.escala = escala
+        self.decimales = decimales
+
+    def __repr__(self):
+        return f"Razon({self.numerador}, {self.denominador!r}, escala={self.escala})"
+
+    @property
+    def base(self):
+        """
+        Columnas necesarias para calcularla (vacío si no tiene numerador)
+        """
+        if self.numerador is None:
+            return []
+        return [*self.numerador, self.denominador]
+
+    def evaluar(self, numerador, denominador):
+        """
+        Razón de dos arreglos float; NaN donde el denominador es 0 o nulo
+        """
+        razon = np.divide(numerador, denominador, out=np.full(len(denominador), np.nan),
+                          where=denominador > 0)
+        return (razon * self.escala).round(self.decimales)
+
+
+def _registro():
+    registro = {nombre: Razon(numerador, 'TVIVIENDA') for nombre, numerador in SERVICIOS.items()}
+    # Hacinamiento: personas por dormitorio
+    registro['HACIN'] = Razon('TP27_PERSO', 'NDOR', escala=1)
+    for tabla in (TABLA_VIV, TABLA_HOG, TABLA_PER):
+        for valores in tabla['variables'].values():
+            for nombre in valores.values():
+                registro[nombre] = Razon(None, tabla['total'])
+    return registro
+
+
+INDICADORES = _registro()
+
+# Indicadores que se calculan desde columnas base (no se guardan en la capa)
+DERIVADOS = [nombre for nombre, razon in INDICADORES.items() if razon.numerador is not None]
+
+
+def registrar(nombre, numerador, denominador, escala=100, decimales=DECIMALES,
+              registro=INDICADORES):
+    """
+    Agrega (o reemplaza) un indicador del registro
+    """
+    registro[nombre] = Razon(numerador, denominador, escala, decimales)
+    return registro[nombre]
+
+
+def columnas_base(nombres, disponibles=None, registro=INDICADORES):
+    """
+    Columnas a leer para obtener ``nombres``: la base de cada indicador
+    derivado y el resto tal cual. Con ``disponibles`` (columnas de la
+    fuente), un indicador que no tenga toda su base en la fuente pero sí
+    esté guardado se lee guardado.
+    """
+    columnas = []
+    for nombre in nombres:
+        base = registro[nombre].base if nombre in registro else []
+        if not base or (disponibles is not None
+                        and not set(base) <= set(disponibles) and nombre in disponibles):
+            base = [nombre]
+        columnas.extend(c for c in base if c not in columnas)
+    return columnas
+
+
+class Indicadores:
+    """
+    Vista perezosa de los indicadores del registro sobre ``datos`` (capa
+    de manzanas o tabla de cualquier nivel): cada indicador se calcula al
+    pedirlo y queda en memoria para los siguientes consumidores.
+    """
+
+    def __init__(self, datos, registro=INDICADORES):
+        self.datos = datos
+        self.registro = registro
+        self._calculados = {}
+
+    def calculable(self, nombre):
+        """
+        ``True`` si la base de ``nombre`` está en ``datos``
+        """
+        razon = self.registro.get(nombre)
+        return (razon is not None and razon.numerador is not None
+                and all(c in self.datos.columns for c in razon.base))
+
+    def disponibles(self):
+        """
+        Indicadores del registro calculables o ya guardados en ``datos``
+        """
+        return [n for n in self.registro if self.calculable(n) or n in self.datos.columns]
+
+    def __contains__(self, nombre):
+        return self.calculable(nombre) or nombre in self.datos.columns
+
+    def __getitem__(self, nombre):
+        if nombre not in self._calculados:
+            self._calculados[nombre] = self._calcular(nombre)
+        return self._calculados[nombre]
+
+    def _valores(self, columna):
+        return self.datos[columna].to_numpy(dtype='float64', na_value=np.nan)
+
+    def _calcular(self, nombre):
+        if not self.calculable(nombre):
+            if nombre in self.datos.columns:
+                return self.datos[nombre]
+            raise KeyError(f"{nombre}: no está en la tabla ni se puede calcular con sus columnas")
+        razon = self.registro[nombre]
+        numerador = sum(self._valores(c) for c in razon.numerador)
+        valores = razon.evaluar(numerador, self._valores(razon.denominador))
+        return pd.Series(valores, index=self.datos.index, name=nombre)
+
+    def tabla(self, nombres):
+        """
+        DataFrame con los indicadores ``nombres``, alineado con ``datos``
+        """
+        return pd.DataFrame({n: self[n] for n in nombres}, index=self.datos.index)
+
+
+def con_indicadores(datos, nombres, registro=INDICADORES, esquema=ESQUEMA_MANZANA):
+    """
+    ``datos`` con los indicadores ``nombres`` como columnas (tipos de ``esquema``)
+    """
+    nombres = list(nombres)
+    if not nombres:
+        return datos
+    indicadores = Indicadores(datos, registro)
+    return aplicar_esquema(datos.assign(**{n: indicadores[n] for n in nombres}), esquema)
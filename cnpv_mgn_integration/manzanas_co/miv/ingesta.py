@@ -0,0 +1,180 @@
+"""
+Lectura por bloques de los CSV de viviendas, hogares, personas y MGN del CNPV.
+
+Cada archivo se lee solo con las columnas necesarias y los tipos compactos
+de ``esquema``, en bloques de ``tam_bloque`` filas. Cada bloque se asigna
+a su manzana (``COD_ENCUESTAS`` -> ``COD_DANE_ANM``), se filtra, se
+reclasifica y se reduce a conteos por manzana que se suman en un
+acumulador denso indexado por el código de la manzana. La memoria máxima
+depende del número de manzanas y del tamaño de bloque, no del tamaño del
+archivo. ``miv.consultas`` hace las mismas agregaciones en SQL (DuckDB).
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .esquema import (
+    CLAVE_ENCUESTA, CLAVE_MANZANA, ESQUEMA_HOG, ESQUEMA_MANZANA, ESQUEMA_MGN, ESQUEMA_PER,
+    ESQUEMA_VIV, aplicar_esquema, tipos,
+)
+from .porcentajes import (
+    COL_TOTAL, VARIABLES_HOG, VARIABLES_PER, VARIABLES_VIV,
+    conteos_por_codigo, porcentajes_desde_conteos,
+)
+from .reclasificacion import (
+    COLUMNAS_HOG, COLUMNAS_PER, COLUMNAS_VIV, REGISTRO_HOG, REGISTRO_PER, REGISTRO_VIV,
+    reclasificar,
+)
+
+TAM_BLOQUE = 500_000
+
+DTYPES_MGN = tipos(ESQUEMA_MGN, [CLAVE_ENCUESTA, CLAVE_MANZANA])
+
+TABLA_VIV = {
+    'dtypes': tipos(ESQUEMA_VIV, [CLAVE_ENCUESTA, *COLUMNAS_VIV]),
+    'no_nulas': COLUMNAS_VIV,
+    'registro': REGISTRO_VIV,
+    'variables': VARIABLES_VIV,
+    'sumas': {},
+    'total': 'N_VIV',
+}
+
+TABLA_HOG = {
+    'dtypes': tipos(ESQUEMA_HOG, [CLAVE_ENCUESTA, *COLUMNAS_HOG]),
+    'no_nulas': COLUMNAS_HOG,
+    'registro': REGISTRO_HOG,
+    'variables': VARIABLES_HOG,
+    'sumas': {'H_NRO_CUARTOS': 'NCUA', 'H_NRO_DORMIT': 'NDOR'},
+    'total': 'N_HOG',
+}
+
+TABLA_PER = {
+    'dtypes': tipos(ESQUEMA_PER, [CLAVE_ENCUESTA, *COLUMNAS_PER]),
+    'no_nulas': ['P_EDADR'],
+    'registro': REGISTRO_PER,
+    'variables': VARIABLES_PER,
+    'sumas': {},
+    'total': 'N_PER',
+}
+
+
+def leer_por_bloques(ruta, dtypes, tam_bloque=TAM_BLOQUE):
+    """
+    Itera sobre ``ruta`` en bloques, leyendo solo las columnas de ``dtypes``
+    """
+    return pd.read_csv(ruta, usecols=list(dtypes), dtype=dtypes,
+                       chunksize=tam_bloque)
+
+
+def leer_mgn(ruta, tam_bloque=TAM_BLOQUE):
+    """
+    Mapeo ``COD_ENCUESTAS`` -> ``COD_DANE_ANM`` del archivo MGN.
+
+    Devuelve una Series categórica indexada por ``COD_ENCUESTAS``: cada
+    código de manzana se guarda una sola vez y los códigos de la
+    categoría sirven de índice del acumulador de conteos.
+    """
+    encuestas, manzanas = [], []
+    for bloque in leer_por_bloques(ruta, DTYPES_MGN, tam_bloque):
+        encuestas.append(bloque[CLAVE_ENCUESTA].to_numpy())
+        manzanas.append(pd.Categorical(bloque[CLAVE_MANZANA]))
+    return pd.Series(union_categoricals(manzanas),
+                     index=pd.Index(np.concatenate(encuestas), name=CLAVE_ENCUESTA),
+                     name=CLAVE_MANZANA)
+
+
+def preparar_bloque(bloque, mapeo, tabla, reporte=None):
+    """
+    Asigna la manzana, elimina filas con NaN y reclasifica un bloque
+    """
+    bloque = bloque.dropna(subset=tabla['no_nulas']).copy()
+    bloque[CLAVE_MANZANA] = bloque[CLAVE_ENCUESTA].map(mapeo)
+    return reclasificar(bloque, tabla['registro'], reporte)
+
+
+def conteos_de_bloque(bloque, n, tabla):
+    """
+    Conteos (``N_REG``, categorías y sumas) de un bloque ya preparado, como
+    arreglos de largo ``n`` indexados por el código de la manzana
+    """
+    codigos = bloque[CLAVE_MANZANA].cat.codes.to_numpy()
+    parcial = conteos_por_codigo(codigos, n, bloque, tabla['variables'])
+    validos = codigos >= 0
+    for columna, nombre in tabla['sumas'].items():
+        pesos = bloque[columna].to_numpy(dtype='float64', na_value=0)
+        parcial[nombre] = np.bincount(codigos[validos], weights=pesos[validos],
+                                      minlength=n)
+    return parcial
+
+
+def tabla_de_conteos(acumulado, manzanas):
+    """
+    DataFrame de conteos por manzana (solo manzanas con registros)
+    """
+    conteos = pd.DataFrame({CLAVE_MANZANA: np.asarray(manzanas), **acumulado})
+    conteos = conteos[conteos[COL_TOTAL] > 0]
+    return conteos.sort_values(CLAVE_MANZANA).reset_index(drop=True)
+
+
+def conteos_por_bloques(ruta, mapeo, tabla, tam_bloque=TAM_BLOQUE, reporte=None):
+    """
+    Conteos por manzana (``N_REG``, categorías y sumas) de un archivo
+    completo, acumulados bloque a bloque. Los códigos no mapeados se
+    acumulan en ``reporte`` (ver ``reclasificar``).
+    """
+    manzanas = mapeo.cat.categories
+    n = len(manzanas)
+    acumulado = {}
+
+    for bloque in leer_por_bloques(ruta, tabla['dtypes'], tam_bloque):
+        bloque = preparar_bloque(bloque, mapeo, tabla, reporte)
+        for nombre, valores in conteos_de_bloque(bloque, n, tabla).items():
+            if nombre in acumulado:
+                acumulado[nombre] += valores
+            else:
+                acumulado[nombre] = valores.copy()
+
+    return tabla_de_conteos(acumulado, manzanas)
+
+
+def porcentajes_de_conteos(conteos, tabla, esquema=ESQUEMA_MANZANA):
+    """
+    Porcentajes por manzana, sumas y número de registros (denominador de
+    los porcentajes, ``tabla['total']``) a partir de los conteos, con los
+    tipos de ``esquema``
+    """
+    resultado = porcentajes_desde_conteos(conteos, tabla['variables'])
+    resultado[tabla['total']] = conteos[COL_TOTAL].to_numpy()
+    for nombre in tabla['sumas'].values():
+        resultado[nombre] = conteos[nombre].to_numpy()
+    return aplicar_esquema(resultado, esquema)
+
+
+def agregar_tabla(ruta, mapeo, tabla, tam_bloque=TAM_BLOQUE, reporte=None,
+                  esquema=ESQUEMA_MANZANA):
+    """
+    Porcentajes por manzana (y sumas) de un archivo según ``tabla``
+    """
+    conteos = conteos_por_bloques(ruta, mapeo, tabla, tam_bloque, reporte)
+    return porcentajes_de_conteos(conteos, tabla, esquema)
+
+
+def agregar_viviendas(ruta, mapeo, tam_bloque=TAM_BLOQUE, reporte=None):
+    """
+    Equivalente por bloques de ``df_viv_mzn_nan_reclas_agg``
+    """
+    return agregar_tabla(ruta, mapeo, TABLA_VIV, tam_bloque, reporte)
+
+
+def agregar_hogares(ruta, mapeo, tam_bloque=TAM_BLOQUE, reporte=None):
+    """
+    Equivalente por bloques de ``df_hog_mzn_nan_reclas_agg``
+    """
+    return agregar_tabla(ruta, mapeo, TABLA_HOG, tam_bloque, reporte)
+
+
+def agregar_personas(ruta, mapeo, tam_bloque=TAM_BLOQUE, reporte=None):
+    """
+    Grupos de edad, discapacidad y nivel educativo por manzana
+    """
+    return agregar_tabla(ruta, mapeo, TABLA_PER, tam_bloque, reporte)
@@ -0,0 +1,179 @@
+"""
+Medición liviana por etapa: tiempo real, CPU, memoria y filas.
+
+``medir('etapa')`` sirve como decorador o como ``with``; ``AlmacenEtapas``
+mide cada etapa (calculada o en caché) y ``ejecutar_pipeline`` abre una
+ejecución nueva por corrida. Cada medición produce un registro JSON en el
+logger ``miv.medicion`` (una línea por etapa; ``MIV_MEDICION_LOG=ruta`` lo
+escribe a archivo) y queda en un buffer en memoria con las últimas
+mediciones (``registros(ejecucion)``).
+
+La memoria sale de ``getrusage`` y ``/proc/self/statm`` (dos llamadas al
+sistema, sin ``tracemalloc``): ``rss_mb`` es la memoria residente al
+terminar la etapa y ``pico_mb`` el máximo del proceso hasta ese momento;
+``pico_delta_mb`` > 0 indica que la etapa subió ese máximo. Con
+``MEDICION=0`` no se mide nada.
+
+Este módulo tiene una copia en ``dashboard_cordoba/medicion.py``: el
+dashboard se despliega solo, con su propio ``requirements.txt`` y sin el
+paquete ``miv``, y ``miv`` no depende del dashboard, así que ninguno puede
+importar al otro. Las dos copias difieren únicamente en el estilo de
+comillas de cada proyecto, ``LOGGER`` y ``VARIABLE_LOG``; un cambio en una
+se replica igual en la otra.
+"""
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from collections import deque
+
+# Lo único propio de esta copia
+LOGGER = 'miv.medicion'
+VARIABLE_LOG = 'MIV_MEDICION_LOG'
+
+ACTIVA = os.environ.get('MEDICION', '1') != '0'
+MAX_REGISTROS = 1000
+
+logger = logging.getLogger(LOGGER)
+_registros = deque(maxlen=MAX_REGISTROS)
+_ejecucion = contextvars.ContextVar('ejecucion', default=None)
+_nivel = contextvars.ContextVar('nivel', default=0)
+_contador = itertools.count(1)
+
+# ru_maxrss está en KB en Linux y en bytes en macOS
+_ESCALA_MAXRSS = 1 / 1024 if sys.platform != 'darwin' else 1 / 1024 ** 2
+_PAGINA_MB = os.sysconf('SC_PAGE_SIZE') / 1024 ** 2 if hasattr(os, 'sysconf') else 0
+
+
+def _pico_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _ESCALA_MAXRSS
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGINA_MB
+    except OSError:
+        return _pico_mb()
+
+
+def memoria():
+    """
+    Memoria residente actual y pico del proceso, en MB
+    """
+    return {'rss_mb': round(_rss_mb(), 1), 'pico_mb': round(_pico_mb(), 1)}
+
+
+def filas(valor):
+    """
+    Filas de un resultado (DataFrame, arreglo o el primero de una tupla)
+    """
+    if isinstance(valor, tuple) and valor:
+        return filas(valor[0])
+    if hasattr(valor, 'shape') and getattr(valor, 'ndim', 0) >= 1:
+        return int(valor.shape[0])
+    return None
+
+
+def configurar_log(ruta=os.environ.get(VARIABLE_LOG)):
+    """
+    Escribe los registros JSON en ``ruta`` (una línea por etapa)
+    """
+    if ruta and not any(getattr(h, '_medicion', False) for h in logger.handlers):
+        manejador = logging.FileHandler(ruta, encoding='utf-8')
+        manejador.setFormatter(logging.Formatter('%(message)s'))
+        manejador._medicion = True
+        logger.addHandler(manejador)
+        logger.setLevel(logging.INFO)
+
+
+def nueva_ejecucion():
+    """
+    Marca el inicio de un rerun: las mediciones siguientes llevan su id
+    """
+    ejecucion = next(_contador)
+    _ejecucion.set(ejecucion)
+    return ejecucion
+
+
+def registros(ejecucion=None):
+    """
+    Mediciones en memoria (todas, o solo las de ``ejecucion``)
+    """
+    return [r for r in list(_registros) if ejecucion is None or r['ejecucion'] == ejecucion]
+
+
+def ultima_ejecucion():
+    return _ejecucion.get()
+
+
+class Medicion:
+    """
+    Mide una etapa; como decorador, las filas de salida se toman del
+    resultado. Dentro de ``with`` se pueden fijar ``filas_entrada`` y
+    ``filas_salida``.
+    """
+
+    def __init__(self, etapa, **contexto):
+        self.etapa = etapa
+        self.contexto = contexto
+        self.filas_entrada = None
+        self.filas_salida = None
+
+    def __call__(self, funcion):
+        @functools.wraps(funcion)
+        def envuelta(*args, **kwargs):
+            with Medicion(self.etapa, **self.contexto) as m:
+                resultado = funcion(*args, **kwargs)
+                m.filas_salida = filas(resultado)
+                return resultado
+        return envuelta
+
+    def __enter__(self):
+        if ACTIVA:
+            self._token = _nivel.set(_nivel.get() + 1)
+            self._pico = _pico_mb()
+            self._cpu = time.process_time()
+            self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, error, traza):
+        if not ACTIVA:
+            return False
+        segundos = time.perf_counter() - self._inicio
+        cpu = time.process_time() - self._cpu
+        pico = _pico_mb()
+        _nivel.reset(self._token)
+        registro = {
+            'etapa': self.etapa,
+            'ejecucion': _ejecucion.get(),
+            'nivel': _nivel.get(),
+            'segundos': round(segundos, 6),
+            'cpu_s': round(cpu, 6),
+            'rss_mb': round(_rss_mb(), 1),
+            'pico_mb': round(pico, 1),
+            'pico_delta_mb': round(pico - self._pico, 1),
+            'filas_entrada': self.filas_entrada,
+            'filas_salida': self.filas_salida,
+            'error': tipo.__name__ if tipo else None,
+            **self.contexto,
+        }
+        _registros.append(registro)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(registro, ensure_ascii=False))
+        return False
+
+
+def medir(etapa, **contexto):
+    """
+    ``@medir('etapa')`` o ``with medir('etapa') as m:``
+    """
+    return Medicion(etapa, **contexto)
+
+
+configurar_log()
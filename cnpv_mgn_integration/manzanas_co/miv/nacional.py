@@ -0,0 +1,216 @@
+"""
+Ejecución nacional: un proceso por departamento sobre un pool.
+
+Descubre los archivos CNPV (``CNPV2018_1VIV_A2_<dpto>.CSV``,
+``CNPV2018_2HOG_A2_<dpto>.CSV``, ``CNPV2018_MGN_A2_<dpto>.CSV`` y, si
+está, ``CNPV2018_5PER_A2_<dpto>.CSV``) y el
+shapefile de manzanas de cada departamento, ejecuta el pipeline completo
+en un proceso por departamento y escribe un dataset GeoParquet
+particionado (``<salida>/DPTO_CCDGO=<dpto>/part-0.parquet``) junto con
+``_resumen.jsonl`` (tiempos, filas y medición por etapa de cada
+departamento, ver ``medicion``). Los departamentos
+con partición y resumen ``ok`` se omiten al reanudar.
+
+Uso (desde cnpv_mgn_integration/manzanas_co):
+
+    python -m miv.nacional --cnpv /datos/cnpv2018 --manzanas /datos/mgn \\
+        --salida /datos/miv_nacional --procesos 4 --memoria-mb 6000
+"""
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from . import medicion
+from .exportar import CLAVE_PARTICION, exportar_geoparquet
+from .indicadores import con_indicadores
+from .ingesta import TAM_BLOQUE
+from .pipeline import capa_final, ejecutar_pipeline
+
+PATRON_CNPV = re.compile(r'CNPV2018_(1VIV|2HOG|5PER|MGN)_A2_(\d{2})\.CSV$', re.IGNORECASE)
+TIPOS_CNPV = {'1VIV': 'viv', '2HOG': 'hog', '5PER': 'per', 'MGN': 'mgn'}
+
+# Patrón del shapefile de manzanas por departamento
+PATRON_MANZANAS = 'mnz_{dpto}.shp'
+
+ARCHIVO_RESUMEN = '_resumen.jsonl'
+
+
+def descubrir_departamentos(dir_cnpv, dir_manzanas, patron_manzanas=PATRON_MANZANAS):
+    """
+    Rutas por departamento: {dpto: {'viv', 'hog', 'mgn', 'manzanas'[, 'per']}}.
+
+    Solo se devuelven departamentos con los cuatro archivos obligatorios
+    (personas es opcional); los incompletos se informan por pantalla.
+    """
+    encontrados = {}
+    for ruta in sorted(Path(dir_cnpv).rglob('*')):
+        coincide = PATRON_CNPV.search(ruta.name)
+        if coincide:
+            tipo, dpto = coincide.groups()
+            encontrados.setdefault(dpto, {})[TIPOS_CNPV[tipo.upper()]] = str(ruta)
+
+    for dpto, rutas in encontrados.items():
+        shp = Path(dir_manzanas) / patron_manzanas.format(dpto=dpto)
+        if shp.exists():
+            rutas['manzanas'] = str(shp)
+
+    completos = {}
+    for dpto, rutas in sorted(encontrados.items()):
+        faltan = {'viv', 'hog', 'mgn', 'manzanas'} - set(rutas)
+        if faltan:
+            print(f"[{dpto}] omitido, faltan: {', '.join(sorted(faltan))}")
+        else:
+            completos[dpto] = rutas
+    return completos
+
+
+def leer_resumen(dir_salida):
+    """
+    Última entrada del resumen por departamento
+    """
+    ruta = Path(dir_salida) / ARCHIVO_RESUMEN
+    resumen = {}
+    if ruta.exists():
+        for linea in ruta.read_text(encoding='utf-8').splitlines():
+            if linea.strip():
+                entrada = json.loads(linea)
+                resumen[entrada['dpto']] = entrada
+    return resumen
+
+
+def ruta_particion(dir_salida, dpto):
+    return Path(dir_salida) / f"{CLAVE_PARTICION}={dpto}" / 'part-0.parquet'
+
+
+def _limitar_memoria(memoria_mb):
+    """
+    Inicializador de cada proceso: límite de memoria virtual (solo Unix)
+    """
+    if not memoria_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limite = int(memoria_mb) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+
+def procesar_departamento(dpto, rutas, dir_cache, dir_salida, tam_bloque=TAM_BLOQUE,
+                          columnas_autocorrelacion=(), motor='pandas', consultas=None,
+                          indicadores=()):
+    """
+    Pipeline completo de un departamento; devuelve su entrada de resumen.
+    ``indicadores`` derivados se escriben como columnas de la partición.
+    """
+    inicio = time.perf_counter()
+    # Un proceso por departamento: las permutaciones no abren otro pool
+    etapas = ejecutar_pipeline(rutas, Path(dir_cache) / dpto, tam_bloque=tam_bloque,
+                               columnas_autocorrelacion=columnas_autocorrelacion, procesos=1,
+                               motor=motor, personas='per' in rutas, consultas=consultas)
+    capa = con_indicadores(capa_final(etapas).valor(), indicadores)
+    with medicion.medir('exportar') as m:
+        m.filas_salida = len(capa)
+        exportar_geoparquet(capa.drop(columns=CLAVE_PARTICION, errors='ignore'),
+                            ruta_particion(dir_salida, dpto))
+    registros = medicion.registros(medicion.ultima_ejecucion())
+    return {
+        'dpto': dpto,
+        'estado': 'ok',
+        'segundos': round(time.perf_counter() - inicio, 2),
+        'filas': {
+            'mgn': len(etapas['mgn'].valor()),
+            'viv_agg': len(etapas['viv_agg'].valor()),
+            'hog_agg': len(etapas['hog_agg'].valor()),
+            'manzanas': len(etapas['manzanas'].valor()),
+            **({'per_agg': len(etapas['per_agg'].valor())} if 'per_agg' in etapas else {}),
+            'mnz_clean': len(capa),
+        },
+        'pico_mb': max((r['pico_mb'] for r in registros), default=None),
+        'etapas': [{c: r.get(c) for c in ('etapa', 'estado', 'segundos', 'cpu_s', 'pico_mb')}
+                   for r in registros],
+    }
+
+
+def ejecutar_nacional(departamentos, dir_cache, dir_salida, procesos=None,
+                      memoria_mb=None, tam_bloque=TAM_BLOQUE, reanudar=True,
+                      columnas_autocorrelacion=(), motor='pandas', memoria_sql=None,
+                      indicadores=()):
+    """
+    Procesa ``departamentos`` ({dpto: rutas}) en paralelo y devuelve el resumen.
+    Las consultas DuckDB de cada proceso se reparten los núcleos.
+    """
+    procesos = procesos or os.cpu_count()
+    consultas = {'hilos': max(1, (os.cpu_count() or 1) // procesos), 'memoria': memoria_sql}
+    dir_salida = Path(dir_salida)
+    dir_salida.mkdir(parents=True, exist_ok=True)
+    resumen = leer_resumen(dir_salida)
+
+    pendientes = {
+        dpto: rutas for dpto, rutas in departamentos.items()
+        if not (reanudar and resumen.get(dpto, {}).get('estado') == 'ok'
+                and ruta_particion(dir_salida, dpto).exists())
+    }
+    for dpto in sorted(set(departamentos) - set(pendientes)):
+        print(f"[{dpto}] ya procesado")
+
+    # Un proceso nuevo por departamento: la memoria se libera al terminar
+    with ProcessPoolExecutor(max_workers=procesos, max_tasks_per_child=1,
+                             initializer=_limitar_memoria,
+                             initargs=(memoria_mb,)) as pool, \
+            open(dir_salida / ARCHIVO_RESUMEN, 'a', encoding='utf-8') as f:
+        futuros = {
+            pool.submit(procesar_departamento, dpto, rutas, dir_cache, dir_salida,
+                        tam_bloque, columnas_autocorrelacion, motor, consultas,
+                        list(indicadores)): dpto
+            for dpto, rutas in pendientes.items()
+        }
+        for futuro in as_completed(futuros):
+            dpto = futuros[futuro]
+            try:
+                entrada = futuro.result()
+            except Exception as error:  # se registra y se reintenta al reanudar
+                entrada = {'dpto': dpto, 'estado': 'error',
+                           'mensaje': f"{type(error).__name__}: {error}"}
+            print(f"[{dpto}] {entrada['estado']} {entrada.get('segundos', '')}")
+            f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+            f.flush()
+            resumen[dpto] = entrada
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Capa MIV de manzanas para todos los departamentos')
+    parser.add_argument('--cnpv', required=True, help='directorio con los CSV del CNPV')
+    parser.add_argument('--manzanas', required=True, help='directorio con los shapefiles de manzanas')
+    parser.add_argument('--patron-manzanas', default=PATRON_MANZANAS)
+    parser.add_argument('--salida', required=True, help='directorio del dataset GeoParquet')
+    parser.add_argument('--cache', help='directorio de etapas (por defecto <salida>/_cache)')
+    parser.add_argument('--procesos', type=int, default=None)
+    parser.add_argument('--memoria-mb', type=int, default=None,
+                        help='límite de memoria por proceso')
+    parser.add_argument('--tam-bloque', type=int, default=TAM_BLOQUE)
+    parser.add_argument('--no-reanudar', action='store_true')
+    parser.add_argument('--autocorrelacion', nargs='*', default=[], metavar='COLUMNA',
+                        help='indicadores con LISA y Gi* (p. ej. HACIN PCT_ACUEDUCTO)')
+    parser.add_argument('--motor', choices=['pandas', 'duckdb'], default='pandas',
+                        help='agregación de viviendas y hogares')
+    parser.add_argument('--memoria-sql', help="límite de DuckDB por proceso (p. ej. '2GB')")
+    parser.add_argument('--indicadores', nargs='*', default=[], metavar='INDICADOR',
+                        help='indicadores derivados a escribir (p. ej. HACIN PCT_ACUEDUCTO)')
+    args = parser.parse_args()
+
+    departamentos = descubrir_departamentos(args.cnpv, args.manzanas, args.patron_manzanas)
+    ejecutar_nacional(departamentos, args.cache or Path(args.salida) / '_cache',
+                      args.salida, procesos=args.procesos, memoria_mb=args.memoria_mb,
+                      tam_bloque=args.tam_bloque, reanudar=not args.no_reanudar,
+                      columnas_autocorrelacion=args.autocorrelacion, motor=args.motor,
+                      memoria_sql=args.memoria_sql, indicadores=args.indicadores)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Pipeline CNPV + MGN -> capa de manzanas con indicadores MIV.
+
+Cada paso del notebook es una etapa con nombre del ``AlmacenEtapas``; los
+CSV y shapefiles intermedios (``df_viv_mzn*.csv``, ``mnz_ris_miv*.shp``...)
+se sustituyen por Parquet/GeoParquet con clave por contenido. Las tablas
+por manzana llevan los tipos de ``esquema.ESQUEMA_MANZANA``, que Parquet
+conserva de una etapa a la siguiente. Los indicadores derivados (``PCT_*``,
+``HACIN``) no se guardan: se calculan desde sus conteos al consultarlos
+(``miv.indicadores``).
+
+    from miv.pipeline import ejecutar_pipeline
+    etapas = ejecutar_pipeline(rutas, 'cache_miv')
+    mnz_ris_miv_clean = etapas['mnz_clean'].valor()
+
+Con ``motor='duckdb'`` las agregaciones de viviendas y hogares se hacen en
+SQL sobre Parquet (``miv.consultas``); con ``personas=True`` se agregan
+también los indicadores por persona (``rutas['per']``) a la capa:
+``etapas['mnz_personas']``. Con ``columnas_autocorrelacion`` se agregan las
+etapas de vecindad y puntos calientes (``miv.autocorrelacion``):
+``etapas['mnz_autocorrelacion']``. ``capa_final(etapas)`` es la última.
+"""
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+from .diagnostico import UMBRALES, Cobertura, IndiceClaves, compuerta, informar
+from . import medicion
+from .autocorrelacion import ejecutar_autocorrelacion
+from .consultas import etapa_consulta, etapa_unir
+from .esquema import CLAVE_GEO, CLAVE_MANZANA, ESQUEMA_MANZANA, aplicar_esquema
+from .etapas import AlmacenEtapas
+from .ingesta import (
+    CLAVE_ENCUESTA, TABLA_HOG, TABLA_PER, TABLA_VIV, TAM_BLOQUE, agregar_tabla, leer_mgn,
+    leer_por_bloques,
+)
+from .reclasificacion import informar_no_mapeados
+
+
+# Columnas mzn-MIV del shapefile de manzanas
+COLUMNAS_MANZANAS = [
+    'COD_DANE_A', 'DPTO_CCDGO', 'MPIO_CDPMP', 'CLAS_CCDGO', 'DENSIDAD',
+    'TP9_1_USO', 'TP9_2_USO', 'TP9_3_USO', 'TP9_4_USO', 'TVIVIENDA',
+    'TP14_1_TIP', 'TP14_2_TIP', 'TP16_HOG',
+    'TP19_EE_1', 'TP19_EE_2', 'TP19_ACU_1', 'TP19_ACU_2',
+    'TP19_ALC_1', 'TP19_ALC_2', 'TP19_GAS_1', 'TP19_GAS_2',
+    'TP19_RECB1', 'TP19_RECB2', 'TP27_PERSO',
+    'TP34_1_EDA', 'TP34_2_EDA', 'TP34_3_EDA', 'TP34_4_EDA', 'TP34_5_EDA',
+    'TP34_6_EDA', 'TP34_7_EDA', 'TP34_8_EDA', 'TP34_9_EDA',
+    'NMB_LC_CM', 'TP_LC_CM',
+]
+
+# Columnas de la capa final: conteos base de los indicadores derivados
+# (``PCT_*``, ``HACIN``), que se calculan al pedirlos (``miv.indicadores``)
+COLUMNAS_CONSERVAR = [
+    'COD_DANE_A', 'DPTO_CCDGO', 'MPIO_CDPMP', 'CLAS_CCDGO', 'DENSIDAD',
+    'TP9_1_USO', 'TP9_2_USO', 'TP9_3_USO', 'TP9_4_USO', 'TVIVIENDA',
+    'TP14_1_TIP', 'TP14_2_TIP', 'TP16_HOG', 'TP19_EE_1', 'TP19_ACU_1',
+    'TP19_ALC_1', 'TP19_GAS_1', 'TP19_RECB1', 'PA_1FIR', 'PA_2MBU',
+    'PA_3MVE', 'PA_4BRR', 'PA_5MRE', 'PA_6NOP', 'PI_1FIR', 'PI_2MBU',
+    'PI_3DES', 'IN_1CON', 'IN_2NOC', 'IN_3DES', 'IN_4NOI', 'CO_1EXC',
+    'CO_2COM', 'CO_3PER', 'CO_4NOC', 'AG_1ENO', 'AG_2ACU', 'AG_3POZ',
+    'AG_4COM', 'AG_5HID', 'AG_6LLU', 'N_VIV', 'N_HOG', 'NCUA', 'NDOR', 'TP27_PERSO',
+    'TP34_1_EDA', 'TP34_2_EDA', 'TP34_3_EDA', 'TP34_4_EDA', 'TP34_5_EDA',
+    'TP34_6_EDA', 'TP34_7_EDA', 'TP34_8_EDA', 'TP34_9_EDA', 'NMB_LC_CM',
+    'TP_LC_CM', 'geometry'
+]
+
+# ── Etapas ───────────────────────────────────────────────────────────────────
+def etapa_mgn(ruta_mgn, tam_bloque=TAM_BLOQUE):
+    return leer_mgn(ruta_mgn, tam_bloque).reset_index()
+
+
+def etapa_agregado(df_mgn, ruta, tabla, esquema=ESQUEMA_MANZANA, tam_bloque=TAM_BLOQUE):
+    mapeo = df_mgn.set_index(CLAVE_ENCUESTA)[CLAVE_MANZANA]
+    reporte = {}
+    resultado = agregar_tabla(ruta, mapeo, tabla, tam_bloque, reporte, esquema)
+    informar_no_mapeados(reporte, titulo=f"{Path(ruta).name} ")
+    return resultado
+
+
+def etapa_mzn_completo(df_viv_agg, df_hog_agg):
+    return df_viv_agg.merge(df_hog_agg, on=CLAVE_MANZANA, how='inner')
+
+
+def etapa_manzanas(ruta_manzanas, columnas, esquema=ESQUEMA_MANZANA):
+    manzanas = gpd.read_file(ruta_manzanas, columns=[c for c in columnas if c != 'geometry'])
+    return aplicar_esquema(manzanas, esquema)
+
+
+def etapa_diagnostico(df_mgn, df_viv_agg, df_hog_agg, df_mzn_completo, manzanas,
+                      ruta_viv, ruta_hog, tam_bloque=TAM_BLOQUE):
+    """
+    Cobertura de cada unión del pipeline (una fila por unión). Cada tabla
+    se indexa una vez; de los CSV solo se lee ``COD_ENCUESTAS`` por bloques.
+    """
+    encuestas_mgn = IndiceClaves(df_mgn[CLAVE_ENCUESTA], 'mgn')
+    geo = IndiceClaves(manzanas[CLAVE_GEO], 'manzanas')
+
+    resultados = []
+    for union, ruta in (('viv_mgn', ruta_viv), ('hog_mgn', ruta_hog)):
+        cobertura = Cobertura(union, Path(ruta).name, encuestas_mgn)
+        for bloque in leer_por_bloques(ruta, {CLAVE_ENCUESTA: 'int64'}, tam_bloque):
+            cobertura.agregar(bloque[CLAVE_ENCUESTA])
+        resultados.append(cobertura.resultado())
+
+    for union, nombre, claves, derecha in (
+        ('viv_hog', 'viv_agg', df_viv_agg[CLAVE_MANZANA],
+         IndiceClaves(df_hog_agg[CLAVE_MANZANA], 'hog_agg')),
+        ('mgn_manzanas', 'mgn', df_mgn[CLAVE_MANZANA], geo),
+        ('completo_manzanas', 'mzn_completo', df_mzn_completo[CLAVE_MANZANA], geo),
+    ):
+        resultados.append(Cobertura(union, nombre, derecha).agregar(claves).resultado())
+    return pd.DataFrame(resultados)
+
+
+def etapa_join(manzanas, df_mzn_completo):
+    return manzanas.merge(df_mzn_completo, left_on=CLAVE_GEO,
+                          right_on=CLAVE_MANZANA, how='inner')
+
+
+def etapa_clean(mnz_join, columnas, esquema=ESQUEMA_MANZANA):
+    return aplicar_esquema(mnz_join[[c for c in columnas if c in mnz_join.columns]], esquema)
+
+
+# ── Orquestación ─────────────────────────────────────────────────────────────
+def ejecutar_pipeline(rutas, directorio_cache, tabla_viv=TABLA_VIV,
+                      tabla_hog=TABLA_HOG, columnas_manzanas=COLUMNAS_MANZANAS,
+                      columnas_conservar=COLUMNAS_CONSERVAR, tam_bloque=TAM_BLOQUE,
+                      almacen=None, umbrales=UMBRALES, estricto=True,
+                      columnas_autocorrelacion=(), procesos=None, esquema=ESQUEMA_MANZANA,
+                      motor='pandas', personas=False, consultas=None):
+    """
+    Ejecuta (o reutiliza) todas las etapas.
+
+    ``rutas`` es un dict con las claves ``'manzanas'`` (shapefile), ``'viv'``,
+    ``'hog'``, ``'mgn'`` y, con ``personas``, ``'per'`` (CSV del CNPV). Antes de unir con la geometría se
+    verifica la cobertura de las uniones contra ``umbrales`` (ver
+    ``diagnostico.compuerta``). ``columnas_autocorrelacion`` agrega LISA y
+    Gi* de esos indicadores (con ``procesos`` para las permutaciones).
+    ``esquema`` fija los tipos de las tablas por manzana. ``motor`` es
+    ``'pandas'`` (ingesta por bloques) o ``'duckdb'``; ``consultas`` son las
+    opciones de DuckDB (``memoria``, ``hilos``, ``directorio`` de los
+    Parquet, por defecto ``<cache>/_parquet``).
+    Devuelve un dict nombre -> ``Etapa``.
+    """
+    almacen = almacen or AlmacenEtapas(directorio_cache)
+    medicion.nueva_ejecucion()
+    opciones = {'tam_bloque': tam_bloque}
+    opciones_sql = {'directorio': almacen.directorio / '_parquet', **(consultas or {})}
+    etapas = {}
+
+    etapas['mgn'] = almacen.ejecutar(
+        'mgn', etapa_mgn, archivos=[rutas['mgn']], opciones=opciones)
+    for vista, tabla in (('viv', tabla_viv), ('hog', tabla_hog)):
+        if motor == 'duckdb':
+            etapas[f'{vista}_agg'] = almacen.ejecutar(
+                f'{vista}_agg', etapa_consulta, archivos=[rutas[vista], rutas['mgn']],
+                parametros={'vista': vista, 'tabla': tabla, 'esquema': esquema},
+                opciones=opciones_sql)
+        else:
+            etapas[f'{vista}_agg'] = almacen.ejecutar(
+                f'{vista}_agg', etapa_agregado, depende=[etapas['mgn']], archivos=[rutas[vista]],
+                parametros={'tabla': tabla, 'esquema': esquema}, opciones=opciones)
+    etapas['mzn_completo'] = almacen.ejecutar(
+        'mzn_completo', etapa_mzn_completo,
+        depende=[etapas['viv_agg'], etapas['hog_agg']])
+    etapas['manzanas'] = almacen.ejecutar(
+        'manzanas', etapa_manzanas, archivos=[rutas['manzanas']],
+        parametros={'columnas': columnas_manzanas, 'esquema': esquema})
+    etapas['diagnostico'] = almacen.ejecutar(
+        'diagnostico', etapa_diagnostico,
+        depende=[etapas['mgn'], etapas['viv_agg'], etapas['hog_agg'],
+                 etapas['mzn_completo'], etapas['manzanas']],
+        archivos=[rutas['viv'], rutas['hog']], opciones=opciones)
+    if almacen.verbose:
+        informar(etapas['diagnostico'].valor())
+    compuerta(etapas['diagnostico'].valor(), umbrales, estricto)
+
+    etapas['mnz_join'] = almacen.ejecutar(
+        'mnz_join', etapa_join, depende=[etapas['manzanas'], etapas['mzn_completo']])
+    etapas['mnz_clean'] = almacen.ejecutar(
+        'mnz_clean', etapa_clean, depende=[etapas['mnz_join']],
+        parametros={'columnas': columnas_conservar, 'esquema': esquema})
+    if personas:
+        etapas['per_agg'] = almacen.ejecutar(
+            'per_agg', etapa_consulta, archivos=[rutas['per'], rutas['mgn']],
+            parametros={'vista': 'per', 'tabla': TABLA_PER, 'esquema': esquema},
+            opciones=opciones_sql)
+        etapas['mnz_personas'] = almacen.ejecutar(
+            'mnz_personas', etapa_unir, depende=[etapas['mnz_clean'], etapas['per_agg']])
+    if columnas_autocorrelacion:
+        etapas.update(ejecutar_autocorrelacion(almacen, capa_final(etapas),
+                                               columnas_autocorrelacion, procesos=procesos))
+    return etapas
+
+
+def capa_final(etapas):
+    """
+    Última capa de manzanas de ``etapas`` (con autocorrelación, con
+    personas o ``mnz_clean``)
+    """
+    for nombre in ('mnz_autocorrelacion', 'mnz_personas', 'mnz_clean'):
+        if nombre in etapas:
+            return etapas[nombre]
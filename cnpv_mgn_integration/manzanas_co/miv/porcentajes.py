@@ -0,0 +1,125 @@
+"""
+Conteos y porcentajes por manzana de las variables reclasificadas del CNPV.
+
+Reemplaza el ``groupby('COD_DANE_ANM').apply(calcular_porcentajes)`` del
+notebook: las manzanas se codifican como enteros una sola vez y cada
+variable se cuenta con un único ``np.bincount`` sobre el par
+(manzana, categoría), en lugar de recorrer cada grupo en Python.
+"""
+import numpy as np
+import pandas as pd
+
+from .esquema import CLAVE_MANZANA
+from .reclasificacion import (  # noqa: F401 (etiquetas reexportadas para el notebook)
+    REGISTRO_HOG, REGISTRO_PER, REGISTRO_VIV, valores_agua, valores_cocina, valores_pared,
+    valores_piso, valores_sersa, variables_de,
+)
+
+# Etiquetas de salida (valores_*) declaradas en el registro de reclasificación
+VARIABLES_VIV = variables_de(REGISTRO_VIV)
+VARIABLES_HOG = variables_de(REGISTRO_HOG)
+VARIABLES_PER = variables_de(REGISTRO_PER)
+
+# Columna con el número de registros (viviendas u hogares) de cada manzana
+COL_TOTAL = 'N_REG'
+
+
+def _posiciones(valores, claves):
+    """
+    Posición de cada valor dentro de ``claves`` (ordenadas); -1 si no está
+    """
+    pos = np.searchsorted(claves, valores)
+    pos = np.clip(pos, 0, len(claves) - 1)
+    return np.where(claves[pos] == valores, pos, -1)
+
+
+def conteos_por_codigo(codigos, n, df, variables):
+    """
+    Núcleo de conteo: ``codigos`` son enteros 0..n-1 por registro (-1 = sin
+    manzana). Devuelve un dict {COL_TOTAL | nombre_col: array de largo n}.
+    """
+    codigos = np.asarray(codigos)
+    validos = codigos >= 0
+    tablas = {COL_TOTAL: np.bincount(codigos[validos], minlength=n)}
+
+    for columna, valores_map in variables.items():
+        claves = np.array(sorted(valores_map), dtype='float64')
+        k = len(claves)
+        valores = df[columna].to_numpy(dtype='float64', na_value=np.nan)
+        pos = _posiciones(valores, claves)
+        ok = validos & (pos >= 0)
+        tabla = np.bincount(codigos[ok] * k + pos[ok], minlength=n * k).reshape(n, k)
+        for j, valor in enumerate(claves):
+            tablas[valores_map[valor]] = tabla[:, j]
+    return tablas
+
+
+def conteos_por_manzana(df, variables, clave=CLAVE_MANZANA):
+    """
+    Cuenta, por manzana, los registros de cada categoría de cada variable.
+
+    ``variables`` es un dict {columna: {valor: nombre_col}}. Devuelve un
+    DataFrame con la clave, ``N_REG`` (registros de la manzana, incluidos
+    los NaN de cada variable) y una columna entera por categoría. Los
+    registros sin clave se descartan, igual que en ``groupby``.
+    """
+    codigos, manzanas = pd.factorize(df[clave], sort=True)
+    tablas = conteos_por_codigo(codigos, len(manzanas), df, variables)
+
+    orden = [COL_TOTAL] + [c for v in variables.values() for c in v.values()]
+    return pd.DataFrame({clave: manzanas, **{c: tablas[c] for c in orden}})
+
+
+def porcentajes_desde_conteos(conteos, variables, clave=CLAVE_MANZANA):
+    """
+    Convierte la salida de ``conteos_por_manzana`` en porcentajes (0-100)
+    """
+    total = conteos[COL_TOTAL].to_numpy(dtype='float64')
+    salida = {clave: conteos[clave].to_numpy()}
+    for valores_map in variables.values():
+        for nombre_col in valores_map.values():
+            cuenta = conteos[nombre_col].to_numpy(dtype='float64')
+            with np.errstate(divide='ignore', invalid='ignore'):
+                salida[nombre_col] = np.where(total > 0, cuenta / total * 100, 0.0)
+    return pd.DataFrame(salida)
+
+
+def porcentajes_por_manzana(df, variables, clave=CLAVE_MANZANA):
+    """
+    Porcentaje de cada categoría de cada variable por manzana, en una pasada.
+
+    Equivale a combinar los ``groupby(clave).apply(calcular_porcentajes)``
+    de cada variable: mismas columnas ``PA_*``, ``PI_*``, ``IN_*``, ``CO_*``
+    y ``AG_*`` y mismo denominador (todos los registros de la manzana).
+    """
+    return porcentajes_desde_conteos(conteos_por_manzana(df, variables, clave),
+                                     variables, clave)
+
+
+# ── Versión original (referencia para el benchmark) ─────────────────────────
+def calcular_porcentajes(grupo, columna, valores_map):
+    """
+    Calcula el porcentaje de cada valor en la columna para el grupo
+    """
+    total = len(grupo)
+    porcentajes = {}
+
+    for valor, nombre_col in valores_map.items():
+        count = (grupo[columna] == valor).sum()
+        porcentajes[nombre_col] = (count / total * 100) if total > 0 else 0
+
+    return pd.Series(porcentajes)
+
+
+def porcentajes_por_manzana_apply(df, variables, clave=CLAVE_MANZANA):
+    """
+    Implementación del notebook: un ``groupby.apply`` por variable
+    """
+    resultado = None
+    for columna, valores_map in variables.items():
+        parcial = df.groupby(clave).apply(
+            lambda x: calcular_porcentajes(x, columna, valores_map),
+            include_groups=False
+        ).reset_index()
+        resultado = parcial if resultado is None else resultado.merge(parcial, on=clave)
+    return resultado
@@ -0,0 +1,239 @@
+"""
+Reclasificación de los códigos CNPV de viviendas, hogares y personas.
+
+``REGISTRO`` declara, por variable, el mapeo de códigos originales a
+clases (``mapeo_*``), las etiquetas de salida de cada clase (``valores_*``)
+y el código "no sabe / no informa" que se trata como NaN. Cada mapeo se
+compila en un arreglo denso de búsqueda y se aplica con una sola
+indexación vectorizada sobre enteros pequeños. Los códigos que no están
+en el mapeo pasan a NaN y se cuentan en un reporte, en lugar de
+conservarse sin reclasificar.
+"""
+import numpy as np
+import pandas as pd
+
+# Diccionarios de mapeo para cada columna
+mapeo_pared = {
+    1: 1, 2: 1, 3: 1,
+    6: 2,
+    4: 3, 7: 3,
+    5: 4,
+    8: 5,
+    9: 6
+}
+
+mapeo_piso = {
+    1: 1, 2: 1, 3: 1, 4: 1,
+    5: 2,
+    6: 3
+}
+
+mapeo_sersa = {
+    1: 1, 2: 1,
+    3: 2, 4: 2,
+    5: 3,
+    6: 4
+}
+
+mapeo_cocina = {
+    1: 1,
+    2: 2, 3: 2, 4: 2,
+    5: 3,
+    6: 4
+}
+
+mapeo_agua = {
+    11: 1, 12: 1,
+    1: 2, 2: 2, 3: 2,
+    4: 3, 5: 3,
+    8: 4, 9: 4, 10: 4,
+    7: 5,
+    6: 6
+}
+
+# Personas: grupos de edad quinquenales (P_EDADR), dificultades para
+# actividades diarias (CONDICION_FISICA) y nivel educativo (P_NIVEL_ANOSR)
+mapeo_edad = {
+    1: 1,
+    2: 2, 3: 2,
+    4: 3, 5: 3, 6: 3,
+    7: 4, 8: 4, 9: 4, 10: 4, 11: 4, 12: 4,
+    13: 5, 14: 5, 15: 5, 16: 5, 17: 5, 18: 5, 19: 5, 20: 5, 21: 5
+}
+
+mapeo_discapacidad = {
+    1: 1,
+    2: 2
+}
+
+mapeo_nivel = {
+    10: 1, 1: 1,
+    2: 2,
+    3: 3, 4: 3, 5: 3, 6: 3,
+    7: 4, 8: 4, 9: 4
+}
+
+# Mapeos de valores reclasificados a nombres de columnas
+valores_pared = {
+    1: 'PA_1FIR',
+    2: 'PA_2MBU',
+    3: 'PA_3MVE',
+    4: 'PA_4BRR',
+    5: 'PA_5MRE',
+    6: 'PA_6NOP'
+}
+
+valores_piso = {
+    1: 'PI_1FIR',
+    2: 'PI_2MBU',
+    3: 'PI_3DES'
+}
+
+valores_sersa = {
+    1: 'IN_1CON',
+    2: 'IN_2NOC',
+    3: 'IN_3DES',
+    4: 'IN_4NOI'
+}
+
+valores_cocina = {
+    1: 'CO_1EXC',
+    2: 'CO_2COM',
+    3: 'CO_3PER',
+    4: 'CO_4NOC'
+}
+
+valores_agua = {
+    1: 'AG_1ENO',
+    2: 'AG_2ACU',
+    3: 'AG_3POZ',
+    4: 'AG_4COM',
+    5: 'AG_5HID',
+    6: 'AG_6LLU'
+}
+
+valores_edad = {
+    1: 'ED_1M05',
+    2: 'ED_2N14',
+    3: 'ED_3J29',
+    4: 'ED_4A59',
+    5: 'ED_5M60'
+}
+
+valores_discapacidad = {
+    1: 'DI_1CON',
+    2: 'DI_2SIN'
+}
+
+valores_nivel = {
+    1: 'NE_1NIN',
+    2: 'NE_2PRI',
+    3: 'NE_3SEC',
+    4: 'NE_4SUP'
+}
+
+# Registro: variable -> {'mapeo', 'valores', 'sentinela'} (todas opcionales)
+REGISTRO = {
+    'V_MAT_PARED': {'mapeo': mapeo_pared, 'valores': valores_pared},
+    'V_MAT_PISO': {'mapeo': mapeo_piso, 'valores': valores_piso},
+    'V_TIPO_SERSA': {'mapeo': mapeo_sersa, 'valores': valores_sersa},
+    'H_NRO_CUARTOS': {'sentinela': 99},
+    'H_NRO_DORMIT': {'sentinela': 99},
+    'H_DONDE_PREPALIM': {'mapeo': mapeo_cocina, 'valores': valores_cocina, 'sentinela': 9},
+    'H_AGUA_COCIN': {'mapeo': mapeo_agua, 'valores': valores_agua, 'sentinela': 99},
+    'P_EDADR': {'mapeo': mapeo_edad, 'valores': valores_edad},
+    'CONDICION_FISICA': {'mapeo': mapeo_discapacidad, 'valores': valores_discapacidad,
+                         'sentinela': 9},
+    'P_NIVEL_ANOSR': {'mapeo': mapeo_nivel, 'valores': valores_nivel, 'sentinela': 99},
+}
+
+COLUMNAS_VIV = ['V_MAT_PARED', 'V_MAT_PISO', 'V_TIPO_SERSA']
+COLUMNAS_HOG = ['H_NRO_CUARTOS', 'H_NRO_DORMIT', 'H_DONDE_PREPALIM', 'H_AGUA_COCIN']
+COLUMNAS_PER = ['P_EDADR', 'CONDICION_FISICA', 'P_NIVEL_ANOSR']
+
+REGISTRO_VIV = {c: REGISTRO[c] for c in COLUMNAS_VIV}
+REGISTRO_HOG = {c: REGISTRO[c] for c in COLUMNAS_HOG}
+REGISTRO_PER = {c: REGISTRO[c] for c in COLUMNAS_PER}
+
+# Valores de la tabla de búsqueda que no son clases
+_NAN = -1
+_NO_MAPEADO = -2
+
+
+def variables_de(registro):
+    """
+    {columna: valores_*} de las entradas del registro que tienen etiquetas
+    """
+    return {c: e['valores'] for c, e in registro.items() if 'valores' in e}
+
+
+def compilar(entrada):
+    """
+    Tabla de búsqueda densa (int16) código original -> clase.
+
+    Las posiciones sin mapeo valen ``_NO_MAPEADO`` y la del sentinela ``_NAN``.
+    """
+    mapeo = entrada['mapeo']
+    sentinela = entrada.get('sentinela')
+    tamano = max(list(mapeo) + [sentinela or 0]) + 1
+    tabla = np.full(tamano, _NO_MAPEADO, dtype='int16')
+    tabla[list(mapeo)] = list(mapeo.values())
+    if sentinela is not None:
+        tabla[sentinela] = _NAN
+    return tabla
+
+
+def reclasificar_serie(serie, entrada):
+    """
+    Reclasifica una Series de códigos enteros según una entrada del registro.
+
+    Devuelve ``(Series UInt8 con NaN, {codigo_no_mapeado: cantidad})``.
+    """
+    if 'mapeo' not in entrada:
+        sentinela = entrada.get('sentinela')
+        if sentinela is not None:
+            serie = serie.mask(serie == sentinela)
+        return serie, {}
+
+    codigos = serie.to_numpy(dtype='int32', na_value=_NAN)
+    tabla = compilar(entrada)
+    fuera = codigos >= len(tabla)
+    clases = tabla[np.where(fuera, 0, np.maximum(codigos, 0))]
+    clases[codigos < 0] = _NAN
+    clases[fuera] = _NO_MAPEADO
+
+    no_mapeados = clases == _NO_MAPEADO
+    reporte = {}
+    if no_mapeados.any():
+        valores, cantidades = np.unique(codigos[no_mapeados], return_counts=True)
+        reporte = dict(zip(valores.tolist(), cantidades.tolist()))
+
+    nulos = clases < 0
+    datos = pd.arrays.IntegerArray(np.where(nulos, 0, clases).astype('uint8'), nulos)
+    return pd.Series(datos, index=serie.index, name=serie.name), reporte
+
+
+def reclasificar(df, registro, reporte=None):
+    """
+    Aplica el ``registro`` a las columnas de ``df`` (modifica y devuelve ``df``).
+
+    Si se pasa ``reporte`` (dict), se acumulan en él los códigos no mapeados
+    por columna: {columna: {codigo: cantidad}}.
+    """
+    for columna, entrada in registro.items():
+        df[columna], no_mapeados = reclasificar_serie(df[columna], entrada)
+        if reporte is not None:
+            acumulado = reporte.setdefault(columna, {})
+            for codigo, cantidad in no_mapeados.items():
+                acumulado[codigo] = acumulado.get(codigo, 0) + cantidad
+    return df
+
+
+def informar_no_mapeados(reporte, titulo=''):
+    """
+    Imprime los códigos no mapeados de un reporte de ``reclasificar``
+    """
+    for columna, codigos in reporte.items():
+        if codigos:
+            total = sum(codigos.values())
+            print(f"{titulo}{columna}: {total} registros con códigos no mapeados {codigos}")
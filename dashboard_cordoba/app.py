@@ -1,17 +1,25 @@
-import json
+import os
 import warnings
-from pathlib import Path
-import geopandas as gpd
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 
+import medicion
+
+from compartidos import compartidos
+from cubo import TODOS, Cubo
+from datos import COLUMNAS_NUMERICAS
+from geometria import ZOOM_MAPA
+from historico import aplicar_rango, leer_rango, periodos
+from mapa_colores import mapa_colores, preparado
+from mapa_teselas import mapa_teselas, preparado as teselas_preparado
+from medicion import medir
+from servidor_teselas import iniciar as iniciar_servidor_teselas
+from teselas import PREFIJO_GI, leer_metadatos
+
 warnings.filterwarnings("ignore")
+medicion.nueva_ejecucion()
 
-BASE_DIR   = Path(__file__).parent
-DATA_PATH  = BASE_DIR / "data_cor.csv"
-SHAPE_PATH = BASE_DIR / "mun_cor.shp"
 # ── CONFIG DE PÁGINA ────────────────────────────────────────────────────────
 st.set_page_config(
     page_title="Dashboard ETV y Zoonosis – Córdoba",
@@ -40,16 +48,16 @@ st.markdown(
 )
 
 # ── CONSTANTES ───────────────────────────────────────────────────────────────
-DATA_PATH   = BASE_DIR / "data_cor.csv"
-SHAPE_PATH  = BASE_DIR / "mun_cor.shp"
-COL_NOMBRE  = "mpio_cnmbr"   # ajusta si tu shapefile usa otro campo
+# Mapa con geometría fija en el navegador (mapa_colores.py) si está preparado;
+# MAPA_LIGERO=0 fuerza px.choropleth_mapbox
+MAPA_LIGERO = os.environ.get("MAPA_LIGERO", "1") != "0" and preparado(ZOOM_MAPA)
 
-COLUMNAS_NUMERICAS = [
-    "int_loc", "int_aloj", "int_aloviv", "int_larv", "int_iec",
-    "int_fum", "int_tild", "int_vac", "int_per", "int_tot",
-    "pob_alo", "pob_viv", "pob_imp", "pob_ben", "pob_tot",
-    "cas_den", "cas_lei", "cas_mal",
-]
+# Mapa de manzanas (teselas vectoriales locales) si se construyeron con build.py
+META_TESELAS = leer_metadatos() if teselas_preparado() else None
+
+# Panel oculto con la medición del último rerun: ?medicion=1 o PANEL_MEDICION=1
+PANEL_MEDICION = (os.environ.get("PANEL_MEDICION") == "1"
+                  or st.query_params.get("medicion") == "1")
 
 OPCIONES_INTERVENCION = {
     "Total intervenciones":                  "int_tot",
@@ -64,6 +72,15 @@ OPCIONES_INTERVENCION = {
     "Personal técnico":                      "int_per",
 }
 
+# Contexto censal (CNPV 2018) junto a las intervenciones: etiqueta -> (columna, formato)
+CONTEXTO_CENSAL = {
+    "Personas":                ("TP27_PERSO",         "{:,.0f}"),
+    "Viviendas":               ("TVIVIENDA",          "{:,.0f}"),
+    "Con acueducto":           ("PCT_ACUEDUCTO",      "{:.1f} %"),
+    "Con alcantarillado":      ("PCT_ALCANTARILLADO", "{:.1f} %"),
+    "Personas por dormitorio": ("HACIN",              "{:.2f}"),
+}
+
 OPCIONES_POBLACION = {
     "Población total intervenida":                    "pob_tot",
     "Población impactada (viviendas+alojamientos)":   "pob_imp",
@@ -73,65 +90,74 @@ OPCIONES_POBLACION = {
 }
 
 
-# ── CARGA Y PROCESAMIENTO DE DATOS (cacheado) ────────────────────────────────
-@st.cache_data(show_spinner="Cargando datos…")
+# ── CARGA Y PROCESAMIENTO DE DATOS (compartidos) ─────────────────────────────
+# Una sola instantánea por proceso para todas las sesiones (compartidos.py),
+# renovada en segundo plano cuando cambian data_cor.csv, mun_cor.shp...
+@medir("cargar_datos")
 def cargar_datos():
-    # CSV
-    df = pd.read_csv(DATA_PATH, sep=";", encoding="latin-1")
-    df["divipola"] = df["divipola"].astype(str).str.zfill(5)
-    df = df.fillna(0)
-
-    for col in COLUMNAS_NUMERICAS:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
-    df["int_tot"] = df[["int_aloj", "int_aloviv", "int_larv",
-                         "int_iec", "int_fum", "int_tild", "int_vac"]].sum(axis=1)
-    df["pob_imp"] = df[["pob_alo", "pob_viv"]].sum(axis=1)
-    df["pob_tot"] = df[["pob_imp", "pob_ben"]].sum(axis=1)
-
-    # Shapefile
-    mun_cor = gpd.read_file(SHAPE_PATH).to_crs(epsg=4326)
-    mun_cor["mpio_cdpmp"] = mun_cor["mpio_cdpmp"].astype(str).str.zfill(5)
-
-    # Detectar columna de nombre si no existe
-    col_nom = COL_NOMBRE
-    if col_nom not in mun_cor.columns:
-        candidatas = [c for c in mun_cor.columns
-                      if any(k in c.lower() for k in ("nmbr", "nombre", "name"))]
-        col_nom = candidatas[0] if candidatas else mun_cor.columns[1]
-
-    # JOIN
-    df_agg = df.groupby("divipola")[COLUMNAS_NUMERICAS].sum().reset_index()
-    gdf = mun_cor.merge(df_agg, left_on="mpio_cdpmp", right_on="divipola", how="left")
-    gdf[COLUMNAS_NUMERICAS] = gdf[COLUMNAS_NUMERICAS].fillna(0)
-
-    geojson = json.loads(gdf.to_json())
-    centro  = {"lat": gdf.geometry.centroid.y.mean(),
-               "lon": gdf.geometry.centroid.x.mean()}
-
-    return gdf, col_nom, geojson, centro
-
+    with st.spinner("Cargando datos…"):
+        return compartidos().actual()
+
+
+@medir("datos_periodo")
+@st.cache_data(show_spinner="Sumando periodos…")
+def datos_periodo(desde, hasta, version):
+    # Agregados por periodo ya consolidados (historico.py), sin releer crudos;
+    # la versión de los datos es parte de la clave
+    instantanea = cargar_datos()
+    tabla = aplicar_rango(instantanea.tabla, leer_rango(desde, hasta))
+    return tabla, Cubo.desde_tabla(tabla, instantanea.col_nombre, COLUMNAS_NUMERICAS)
+
+
+instantanea = cargar_datos()
+gdf, col_nombre, geojson, centro, cubo = (instantanea.tabla, instantanea.col_nombre,
+                                          instantanea.geojson, instantanea.centro,
+                                          instantanea.cubo)
+# Agregados de manzanas (miv.agregados); None si no se han generado
+censo = instantanea.censo
+
+# Filtro por rango de periodos si hay histórico ingerido
+periodos_disponibles = periodos()
+if periodos_disponibles:
+    desde, hasta = st.select_slider(
+        "📅 Periodo",
+        options=periodos_disponibles,
+        value=(periodos_disponibles[0], periodos_disponibles[-1]),
+    )
+    gdf, cubo = datos_periodo(desde, hasta, instantanea.version)
 
-gdf, col_nombre, geojson, centro = cargar_datos()
 lista_municipios = sorted(
     gdf[gdf["int_tot"] > 0][col_nombre].dropna().unique().tolist()
 )
 
 
+@st.cache_resource
+def servidor_teselas():
+    # Un solo servidor local de teselas por proceso
+    return iniciar_servidor_teselas()
+
+
 # ── FUNCIONES DE GRÁFICOS ────────────────────────────────────────────────────
+def nombre_variable(variable):
+    return next(k for k, v in {**OPCIONES_INTERVENCION,
+                               **OPCIONES_POBLACION}.items() if v == variable)
+
+
+@medir("fig_mapa")
 def fig_mapa(variable, escala, titulo_barra):
-    nombre_var = next(k for k, v in {**OPCIONES_INTERVENCION,
-                                      **OPCIONES_POBLACION}.items() if v == variable)
+    import plotly.express as px  # solo en la ruta sin mapa_colores
+
+    nombre_var = nombre_variable(variable)
     fig = px.choropleth_mapbox(
         gdf,
         geojson=geojson,
-        locations=gdf.index,
+        locations="mpio_cdpmp",
         color=variable,
         hover_name=col_nombre,
         hover_data={variable: ":,.0f"},
         color_continuous_scale=escala,
         mapbox_style="open-street-map",
-        zoom=7,
+        zoom=ZOOM_MAPA,
         center=centro,
         opacity=0.7,
         labels={variable: nombre_var},
@@ -145,8 +171,28 @@ def fig_mapa(variable, escala, titulo_barra):
     return fig
 
 
+@medir("mostrar_mapa")
+def mostrar_mapa(variable, escala, titulo_barra, key):
+    if not MAPA_LIGERO:
+        st.plotly_chart(fig_mapa(variable, escala, titulo_barra), use_container_width=True)
+        return
+    nombre_var = nombre_variable(variable)
+    mapa_colores(
+        key,
+        ubicaciones=gdf["mpio_cdpmp"],
+        valores=gdf[variable],
+        nombres=gdf[col_nombre],
+        escala=escala,
+        etiqueta=nombre_var,
+        titulo=f"Mapa: {nombre_var} por Municipio",
+        titulo_barra=titulo_barra,
+        centro=centro,
+        zoom=ZOOM_MAPA,
+    )
+
+
+@medir("fig_pie")
 def fig_pie(municipio):
-    datos = gdf if municipio == "Todos" else gdf[gdf[col_nombre] == municipio]
     variables_pie = {
         "Localidades": "int_loc",
         "Alojamientos": "int_aloj",
@@ -157,9 +203,9 @@ def fig_pie(municipio):
         "TILD": "int_tild",
         "Vacunación": "int_vac",
     }
+    totales = cubo.fila(municipio, list(variables_pie.values()))
     vals, labs = [], []
-    for nombre, col in variables_pie.items():
-        t = datos[col].sum()
+    for nombre, t in zip(variables_pie, totales):
         if t > 0:
             vals.append(t)
             labs.append(nombre)
@@ -185,12 +231,28 @@ def fig_pie(municipio):
     return fig
 
 
+def mostrar_censo(municipio):
+    # Departamento si se eligió "Todos"
+    if municipio == TODOS:
+        codigo = gdf["mpio_cdpmp"].iloc[0][:2]
+    else:
+        codigo = gdf.loc[gdf[col_nombre] == municipio, "mpio_cdpmp"].iloc[0]
+    if codigo not in censo.index:
+        return
+    fila = censo.loc[codigo]
+    st.caption("Contexto censal (CNPV 2018)")
+    for columna, (etiqueta, (variable, formato)) in zip(
+        st.columns(len(CONTEXTO_CENSAL)), CONTEXTO_CENSAL.items()
+    ):
+        valor = fila.get(variable)
+        columna.metric(etiqueta, formato.format(valor) if pd.notna(valor) else "s/d")
+
+
+@medir("fig_etv")
 def fig_etv():
-    datos = gdf[(gdf["cas_den"] > 0) | (gdf["cas_lei"] > 0) | (gdf["cas_mal"] > 0)].copy()
+    datos = cubo.ranking(["cas_den", "cas_lei", "cas_mal"])
     if datos.empty:
         return None
-    datos["total_casos"] = datos[["cas_den","cas_lei","cas_mal"]].sum(axis=1)
-    datos = datos.sort_values("total_casos", ascending=True)
     fig = go.Figure()
     for col_, color_, label_ in [
         ("cas_den", "#d62728", "Dengue"),
@@ -198,7 +260,7 @@ def fig_etv():
         ("cas_mal", "#2ca02c", "Malaria"),
     ]:
         fig.add_trace(go.Bar(
-            name=label_, y=datos[col_nombre], x=datos[col_],
+            name=label_, y=datos["nombre"], x=datos[col_],
             orientation="h",
             marker=dict(color=color_, line=dict(color="white", width=1)),
             hovertemplate=f"<b>%{{y}}</b><br>{label_}: %{{x}}<extra></extra>",
@@ -224,7 +286,7 @@ st.subheader("📊 Distribución de Tipos de Intervención")
 
 municipio_sel = st.selectbox(
     "🏘️ Municipio",
-    options=["Todos"] + lista_municipios,
+    options=[TODOS] + lista_municipios,
     index=0,
 )
 
@@ -234,6 +296,9 @@ if pie:
 else:
     st.info("No hay datos de intervenciones para este municipio.")
 
+if censo is not None:
+    mostrar_censo(municipio_sel)
+
 st.markdown("---")
 
 # ── SECCIÓN 2: MAPA INTERVENCIONES ───────────────────────────────────────────
@@ -247,14 +312,11 @@ intervencion_sel = st.selectbox(
 var_int = OPCIONES_INTERVENCION[intervencion_sel]
 
 # Métrica
-total_int = int(gdf[var_int].sum())
+total_int = int(cubo.valor(TODOS, var_int))
 st.metric(label=f"Total: {intervencion_sel}", value=f"{total_int:,}")
 
 # Mapa
-st.plotly_chart(
-    fig_mapa(var_int, "Blues", "Cantidad"),
-    use_container_width=True,
-)
+mostrar_mapa(var_int, "Blues", "Cantidad", key="mapa_intervenciones")
 
 st.markdown("---")
 
@@ -269,14 +331,11 @@ poblacion_sel = st.selectbox(
 var_pob = OPCIONES_POBLACION[poblacion_sel]
 
 # Métrica
-total_pob = int(gdf[var_pob].sum())
+total_pob = int(cubo.valor(TODOS, var_pob))
 st.metric(label=f"Total: {poblacion_sel}", value=f"{total_pob:,}")
 
 # Mapa
-st.plotly_chart(
-    fig_mapa(var_pob, "YlOrRd", "Personas"),
-    use_container_width=True,
-)
+mostrar_mapa(var_pob, "YlOrRd", "Personas", key="mapa_poblacion")
 
 st.markdown("---")
 
@@ -284,12 +343,46 @@ st.markdown("---")
 st.subheader("🦟 Casos de ETV Identificados")
 
 c1, c2, c3 = st.columns(3)
-c1.metric("🦟 Dengue",         f"{int(gdf['cas_den'].sum()):,}")
-c2.metric("🦟 Leishmaniasis",  f"{int(gdf['cas_lei'].sum()):,}")
-c3.metric("🦟 Malaria",        f"{int(gdf['cas_mal'].sum()):,}")
+c1.metric("🦟 Dengue",         f"{int(cubo.valor(TODOS, 'cas_den')):,}")
+c2.metric("🦟 Leishmaniasis",  f"{int(cubo.valor(TODOS, 'cas_lei')):,}")
+c3.metric("🦟 Malaria",        f"{int(cubo.valor(TODOS, 'cas_mal')):,}")
 
 etv = fig_etv()
 if etv:
     st.plotly_chart(etv, use_container_width=True)
 else:
     st.info("No hay casos de ETV registrados.")
+
+# ── SECCIÓN 5: MANZANAS (teselas vectoriales) ────────────────────────────────
+if META_TESELAS and META_TESELAS["columnas"]:
+    st.markdown("---")
+    st.subheader("🏠 Indicadores por Manzana")
+
+    servidor_teselas()
+    indicador_sel = st.selectbox(
+        "🏠 Indicador",
+        options=META_TESELAS["columnas"],
+        index=0,
+    )
+    # Gi* (puntos calientes): escala divergente centrada en cero
+    es_gi = indicador_sel.startswith(PREFIJO_GI)
+    mapa_teselas(
+        "mapa_manzanas",
+        metadatos=META_TESELAS,
+        variable=indicador_sel,
+        etiqueta=f"{indicador_sel} (z)" if es_gi else indicador_sel,
+        escala="RdBu_r" if es_gi else "YlOrRd",
+        titulo=f"Mapa: {indicador_sel} por Manzana",
+    )
+
+# ── MEDICIÓN (oculta) ────────────────────────────────────────────────────────
+if PANEL_MEDICION:
+    st.markdown("---")
+    with st.expander("⏱️ Medición del último rerun", expanded=True):
+        st.dataframe(
+            pd.DataFrame(medicion.registros(medicion.ultima_ejecucion())),
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.caption("Memoria de este worker y datos compartidos")
+        st.dataframe(pd.DataFrame([compartidos().reporte()]), hide_index=True)
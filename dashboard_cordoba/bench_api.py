@@ -0,0 +1,136 @@
+"""
+Prueba de carga: peticiones por segundo de ``servidor_datos.py`` frente a
+la página de Streamlit.
+
+La API se levanta en un proceso aparte y se consulta con ``clientes``
+hilos concurrentes (conexiones persistentes, mezcla de rutas y formatos).
+Para Streamlit, cada consulta a la página es un rerun completo de
+``app.py`` (con los datos compartidos ya cargados); se mide con ``AppTest``,
+que no incluye websocket ni render en el navegador, así que es una cota
+superior de lo que sostiene la página.
+
+Uso:
+
+    python dashboard_cordoba/bench_api.py [--segundos 5] [--clientes 1 8 32]
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+DIR = Path(__file__).parent
+APP = str(DIR / "app.py")
+
+CONSULTAS = [
+    "/municipios",
+    "/municipios?formato=arrow",
+    "/etv",
+    "/etv?formato=arrow",
+    "/geometria",
+]
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def levantar_api(puerto, hilos):
+    proceso = subprocess.Popen(
+        [sys.executable, str(DIR / "servidor_datos.py"), "--puerto", str(puerto),
+         "--hilos", str(hilos)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", puerto), timeout=0.1).close()
+            return proceso
+        except OSError:
+            time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("la API no arrancó")
+
+
+def cliente(puerto, fin, latencias, errores, desfase):
+    conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+    i = desfase
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        try:
+            conexion.request("GET", CONSULTAS[i % len(CONSULTAS)])
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            if respuesta.status != 200:
+                errores.append(respuesta.status)
+        except (OSError, http.client.HTTPException):
+            errores.append("conexión")
+            conexion.close()
+            conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+        latencias.append(time.perf_counter() - inicio)
+        i += 1
+    conexion.close()
+
+
+def medir_api(puerto, clientes, segundos):
+    # Calentamiento: una pasada por cada consulta (llena la caché)
+    cliente(puerto, time.perf_counter() + 0.5, [], [], 0)
+    latencias, errores = [], []
+    fin = time.perf_counter() + segundos
+    hilos = [threading.Thread(target=cliente, args=(puerto, fin, latencias, errores, k))
+             for k in range(clientes)]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    total = time.perf_counter() - inicio
+    return len(latencias) / total, np.percentile(latencias, [50, 95]) * 1000, len(errores)
+
+
+def medir_streamlit(segundos):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=120).run()
+    latencias = []
+    fin = time.perf_counter() + segundos
+    inicio = time.perf_counter()
+    while time.perf_counter() < fin:
+        t = time.perf_counter()
+        at.run()
+        latencias.append(time.perf_counter() - t)
+    total = time.perf_counter() - inicio
+    return len(latencias) / total, np.percentile(latencias, [50, 95]) * 1000, 0
+
+
+def informar(nombre, resultado):
+    rps, (p50, p95), errores = resultado
+    print(f"{nombre:28s} {rps:9.1f} req/s   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms"
+          + (f"   errores {errores}" if errores else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga de la API de datos frente a Streamlit")
+    parser.add_argument("--segundos", type=float, default=5)
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--hilos", type=int, default=4, help="hilos de cálculo de la API")
+    parser.add_argument("--sin-streamlit", action="store_true")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MEDICION", "0")
+    puerto = puerto_libre()
+    api = levantar_api(puerto, args.hilos)
+    try:
+        for clientes in args.clientes:
+            informar(f"API, {clientes} clientes", medir_api(puerto, clientes, args.segundos))
+    finally:
+        api.terminate()
+        api.wait()
+    if not args.sin_streamlit:
+        informar("Streamlit (rerun de app.py)", medir_streamlit(args.segundos))
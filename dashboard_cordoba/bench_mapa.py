@@ -0,0 +1,47 @@
+"""
+Latencia de rerun y bytes enviados al cambiar la variable de los mapas.
+
+Compara ``px.choropleth_mapbox`` (MAPA_LIGERO=0) con el componente
+``mapa_colores`` (requiere haber ejecutado ``geometria.py``).
+
+Uso:
+
+    python dashboard_cordoba/bench_mapa.py
+"""
+import os
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+APP = str(Path(__file__).parent / "app.py")
+
+
+def bytes_mapas(at):
+    """
+    Bytes de los dos mapas en el último rerun (spec de plotly o args del componente)
+    """
+    componentes = at.get("component_instance")
+    if componentes:
+        return sum(len(c.proto.json_args) for c in componentes)
+    graficos = at.get("plotly_chart")
+    return sum(len(g.proto.spec) for g in graficos[1:3])
+
+
+def medir(ligero):
+    os.environ["MAPA_LIGERO"] = "1" if ligero else "0"
+    at = AppTest.from_file(APP, default_timeout=120).run()
+    selector = at.selectbox[1]   # Tipo de Intervención
+    tiempos, tamanos = [], []
+    for i in range(1, len(selector.options)):
+        inicio = time.perf_counter()
+        at.selectbox[1].select_index(i).run()
+        tiempos.append(time.perf_counter() - inicio)
+        tamanos.append(bytes_mapas(at))
+    return sum(tiempos) / len(tiempos), sum(tamanos) / len(tamanos)
+
+
+if __name__ == "__main__":
+    for ligero, nombre in ((False, "px.choropleth_mapbox"), (True, "mapa_colores")):
+        t, b = medir(ligero)
+        print(f"{nombre:22s} rerun medio {t * 1000:7.1f} ms   mapas {b / 1024:8.1f} KB por cambio")
@@ -0,0 +1,29 @@
+"""
+Precalcula todo lo que el dashboard necesita para arrancar en frío.
+
+1. Geometría simplificada por nivel de zoom (geometria.py)
+2. Directorio del componente mapa_colores (HTML, plotly.js y GeoJSON)
+3. Artefacto de datos unido y reproyectado (datos.py)
+4. Teselas vectoriales de manzanas, si existe ``MANZANAS_PATH`` (teselas.py),
+   y el directorio del componente mapa_teselas
+
+Uso:
+
+    python dashboard_cordoba/build.py
+"""
+import datos
+import geometria
+import mapa_colores
+import mapa_teselas
+import teselas
+
+if __name__ == "__main__":
+    geometria.informar(geometria.construir())
+    mapa_colores.preparar(geometria.ZOOM_MAPA)
+
+    ruta = datos.construir()
+    print(f"Artefacto: {ruta} ({ruta.stat().st_size / 1024:,.0f} KB)")
+
+    if teselas.MANZANAS_PATH.exists():
+        teselas.informar(teselas.construir())
+        mapa_teselas.preparar()
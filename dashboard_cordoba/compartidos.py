@@ -0,0 +1,204 @@
+"""
+Datos del dashboard compartidos por todas las sesiones de un proceso.
+
+``st.cache_data`` serializa el resultado de ``cargar_datos`` y entrega una
+copia a cada sesión: con muchos usuarios la tabla, el GeoJSON y el cubo se
+repiten en memoria. Además no se entera si ``data_cor.csv`` o
+``mun_cor.shp`` se reemplazan en disco. ``DatosCompartidos`` guarda una
+sola ``Instantanea`` de solo lectura por proceso (la misma para todas las
+sesiones y para ``servidor_datos.py``) y la renueva cuando cambian las
+fuentes:
+
+* cada ``REVISION_S`` se comparan tamaño y mtime de las fuentes; si
+  cambiaron, se calcula el sha256 de su contenido y solo si difiere se
+  recarga (copiar el mismo archivo encima no recarga);
+* la recarga corre en un hilo de fondo: mientras tanto las sesiones siguen
+  viendo la instantánea anterior, que se reemplaza de una vez cuando la
+  nueva está lista. Si la recarga falla se sigue sirviendo la anterior.
+
+Quien la use no debe modificarla: la instantánea es la misma para todas
+las sesiones. ``reporte()`` informa la memoria del proceso (cada worker
+tiene su propia instantánea) y la que ocupa la instantánea.
+
+    datos = compartidos()      # el mismo objeto en todo el proceso
+    inst = datos.actual()      # tabla, col_nombre, geojson, centro, cubo, censo
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import medicion
+from cubo import Cubo
+from datos import ARTEFACTO, CENSO_PATH, COLUMNAS_NUMERICAS, cargar, fuentes, leer_censo
+from historico import HISTORICO_DIR
+
+REVISION_S = float(os.environ.get("DATOS_REVISION_S", 2.0))
+TAM_LECTURA = 1 << 20
+
+
+def archivos_fuente():
+    """
+    Archivos cuyo cambio renueva la instantánea
+    """
+    rutas = fuentes() + [ARTEFACTO, CENSO_PATH, HISTORICO_DIR / "_ingestados.json"]
+    return [r for r in rutas if r.exists()]
+
+
+def firma(rutas):
+    """
+    (ruta, tamaño, mtime) de cada archivo: barata, se revisa a menudo
+    """
+    resultado = []
+    for ruta in rutas:
+        try:
+            e = ruta.stat()
+        except OSError:
+            continue
+        resultado.append((str(ruta), e.st_size, e.st_mtime_ns))
+    return tuple(resultado)
+
+
+def huella(rutas):
+    """
+    sha256 del contenido de los archivos (versión de los datos)
+    """
+    h = hashlib.sha256()
+    for ruta in rutas:
+        h.update(str(ruta.name).encode("utf-8"))
+        with open(ruta, "rb") as f:
+            while bloque := f.read(TAM_LECTURA):
+                h.update(bloque)
+    return h.hexdigest()[:16]
+
+
+class Instantanea:
+    """
+    Datos cargados de una versión de las fuentes (solo lectura)
+    """
+
+    def __init__(self, version):
+        self.version = version
+        self.tabla, self.col_nombre, self.geojson, self.centro = cargar()
+        self.cubo = Cubo.desde_tabla(self.tabla, self.col_nombre, COLUMNAS_NUMERICAS)
+        self.cubo.valores.flags.writeable = False
+        self.censo = leer_censo()
+        self.cargada = time.time()
+        # El GeoJSON se mide una vez, como texto (el dict ocupa algo más)
+        self.bytes_geojson = len(json.dumps(self.geojson, separators=(",", ":")))
+
+    def memoria_mb(self):
+        total = self.tabla.memory_usage(deep=True).sum() + self.cubo.valores.nbytes
+        if self.censo is not None:
+            total += self.censo.memory_usage(deep=True).sum()
+        return (total + self.bytes_geojson) / 1024 ** 2
+
+
+class DatosCompartidos:
+    """
+    Instantánea vigente del proceso con recarga en segundo plano
+    """
+
+    def __init__(self, archivos=archivos_fuente, revision_s=REVISION_S):
+        self._archivos = archivos
+        self.revision_s = revision_s
+        self._candado = threading.Lock()
+        self._instantanea = None
+        self._firma = None
+        self._revisado = 0.0
+        self._hilo = None
+        self.recargas = 0
+        self.error = None
+
+    def lista(self):
+        """
+        ``True`` si ya hay una instantánea (``actual()`` no bloquea)
+        """
+        return self._instantanea is not None
+
+    def actual(self):
+        """
+        Instantánea vigente; la primera vez se carga aquí mismo
+        """
+        with self._candado:
+            if self._instantanea is None:
+                rutas = self._archivos()
+                self._firma = firma(rutas)
+                self._instantanea = Instantanea(huella(rutas))
+                self._revisado = time.monotonic()
+            else:
+                self._revisar()
+            return self._instantanea
+
+    def _revisar(self):
+        ahora = time.monotonic()
+        if ahora - self._revisado < self.revision_s:
+            return
+        self._revisado = ahora
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        rutas = self._archivos()
+        nueva = firma(rutas)
+        if nueva != self._firma:
+            self._hilo = threading.Thread(target=self._recargar, args=(rutas, nueva),
+                                          daemon=True, name="recarga_datos")
+            self._hilo.start()
+
+    def _recargar(self, rutas, nueva):
+        try:
+            version = huella(rutas)
+            instantanea = None
+            if version != self._instantanea.version:
+                instantanea = Instantanea(version)
+        except Exception as error:  # se sigue sirviendo la anterior
+            self.error = f"{type(error).__name__}: {error}"
+            with self._candado:
+                self._firma = nueva
+            return
+        with self._candado:
+            self._firma = nueva
+            self.error = None
+            if instantanea is not None:
+                self._instantanea = instantanea
+                self.recargas += 1
+
+    def esperar(self, timeout=None):
+        """
+        Espera a que termine la recarga en curso (si hay)
+        """
+        hilo = self._hilo
+        if hilo is not None:
+            hilo.join(timeout)
+
+    def reporte(self):
+        """
+        Memoria del proceso y estado de la instantánea
+        """
+        instantanea = self._instantanea
+        return {
+            "pid": os.getpid(),
+            **medicion.memoria(),
+            "instantanea_mb": round(instantanea.memoria_mb(), 2) if instantanea else None,
+            "version": instantanea.version if instantanea else None,
+            "cargada": (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(instantanea.cargada))
+                        if instantanea else None),
+            "recargas": self.recargas,
+            "recargando": self._hilo is not None and self._hilo.is_alive(),
+            "error": self.error,
+        }
+
+
+_compartidos = None
+_candado_global = threading.Lock()
+
+
+def compartidos():
+    """
+    ``DatosCompartidos`` único del proceso
+    """
+    global _compartidos
+    with _candado_global:
+        if _compartidos is None:
+            _compartidos = DatosCompartidos()
+        return _compartidos
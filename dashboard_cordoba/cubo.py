@@ -0,0 +1,63 @@
+"""
+Cubo municipio x indicador precalculado para métricas y gráficos.
+
+Los totales del dashboard (torta por municipio, ``st.metric`` y barras de
+ETV) son estáticos entre cargas de datos. ``Cubo`` los guarda en un
+arreglo NumPy denso (una fila por municipio más la fila "Todos") y los
+sirve por índice, sin volver a filtrar ni sumar la tabla en cada rerun.
+"""
+import numpy as np
+import pandas as pd
+
+TODOS = "Todos"
+
+
+class Cubo:
+    def __init__(self, codigos, nombres, indicadores, valores):
+        self.codigos     = list(codigos)
+        self.nombres     = list(nombres)
+        self.indicadores = list(indicadores)
+        # Última fila: total departamental ("Todos")
+        self.valores     = np.vstack([valores, valores.sum(axis=0)])
+
+        self._col = {ind: j for j, ind in enumerate(self.indicadores)}
+        self._fila = {TODOS: [len(self.codigos)]}
+        for i, (codigo, nombre) in enumerate(zip(self.codigos, self.nombres)):
+            self._fila.setdefault(codigo, []).append(i)
+            if nombre != codigo:
+                self._fila.setdefault(nombre, []).append(i)
+        self._rankings = {}
+
+    @classmethod
+    def desde_tabla(cls, tabla, col_nombre, indicadores, col_codigo="mpio_cdpmp"):
+        valores = tabla[indicadores].to_numpy(dtype="float64")
+        return cls(tabla[col_codigo].astype(str), tabla[col_nombre].astype(str),
+                   indicadores, valores)
+
+    def fila(self, clave, indicadores=None):
+        """
+        Valores de ``clave`` (código, nombre o "Todos"); si un nombre se
+        repite en varios municipios se suman sus filas.
+        """
+        filas = self._fila.get(clave, [])
+        cols = slice(None) if indicadores is None else [self._col[i] for i in indicadores]
+        return self.valores[filas][:, cols].sum(axis=0)
+
+    def valor(self, clave, indicador):
+        return float(self.fila(clave, [indicador])[0])
+
+    def ranking(self, indicadores):
+        """
+        Municipios con algún valor > 0 en ``indicadores``, ordenados de
+        menor a mayor total, con la columna ``total`` (memoizado).
+        """
+        clave = tuple(indicadores)
+        if clave not in self._rankings:
+            cols = [self._col[i] for i in indicadores]
+            sub = self.valores[:-1, cols]
+            mascara = (sub > 0).any(axis=1)
+            tabla = pd.DataFrame(sub[mascara], columns=indicadores)
+            tabla.insert(0, "nombre", np.asarray(self.nombres, dtype=object)[mascara])
+            tabla["total"] = sub[mascara].sum(axis=1)
+            self._rankings[clave] = tabla.sort_values("total", kind="stable").reset_index(drop=True)
+        return self._rankings[clave]
@@ -0,0 +1,163 @@
+"""
+Carga de datos del dashboard y artefacto precalculado para arranque en frío.
+
+``procesar()`` es la ruta completa: lee ``data_cor.csv`` y ``mun_cor.shp``,
+reproyecta, une, calcula el centro del mapa y el GeoJSON. ``construir()``
+guarda ese resultado en un único Parquet (``build/datos_cor.parquet``):
+la tabla unida sin geometría y, en los metadatos, la columna de nombre,
+el centro y el GeoJSON. ``cargar()`` usa el artefacto si existe y es más
+reciente que sus fuentes; si no, vuelve a ``procesar()``. geopandas solo
+se importa en la ruta completa.
+
+``leer_censo()`` lee el contexto censal por municipio y departamento
+(CNPV 2018), agregado desde las manzanas con ``python -m miv.agregados``.
+
+Uso:
+
+    python dashboard_cordoba/datos.py
+"""
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from geometria import BUILD_DIR, ZOOM_MAPA, cargar_nivel
+
+BASE_DIR   = Path(__file__).parent
+DATA_PATH  = BASE_DIR / "data_cor.csv"
+SHAPE_PATH = BASE_DIR / "mun_cor.shp"
+COL_NOMBRE = "mpio_cnmbr"   # ajusta si tu shapefile usa otro campo
+ARTEFACTO  = BUILD_DIR / "datos_cor.parquet"
+CENSO_PATH = Path(os.environ.get("CENSO_PATH", BASE_DIR / "censo_cor.parquet"))
+
+COLUMNAS_NUMERICAS = [
+    "int_loc", "int_aloj", "int_aloviv", "int_larv", "int_iec",
+    "int_fum", "int_tild", "int_vac", "int_per", "int_tot",
+    "pob_alo", "pob_viv", "pob_imp", "pob_ben", "pob_tot",
+    "cas_den", "cas_lei", "cas_mal",
+]
+
+_CLAVE_META = b"dashboard_cordoba"
+
+
+def fuentes():
+    """
+    Archivos de los que depende el artefacto (CSV, shapefile y geometría)
+    """
+    rutas = [DATA_PATH] + sorted(SHAPE_PATH.parent.glob(SHAPE_PATH.stem + ".*"))
+    rutas += sorted(BUILD_DIR.glob("mun_cor_z*.geojson"))
+    return [r for r in rutas if r.exists()]
+
+
+def artefacto_vigente(ruta=ARTEFACTO):
+    if not ruta.exists():
+        return False
+    modificado = ruta.stat().st_mtime
+    return all(f.stat().st_mtime <= modificado for f in fuentes())
+
+
+def leer_reporte(ruta):
+    """
+    Lee un reporte con el formato de ``data_cor.csv`` y recalcula los totales
+    """
+    df = pd.read_csv(ruta, sep=";", encoding="latin-1")
+    df["divipola"] = df["divipola"].astype(str).str.zfill(5)
+    df = df.fillna(0)
+
+    for col in COLUMNAS_NUMERICAS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+
+    df["int_tot"] = df[["int_aloj", "int_aloviv", "int_larv",
+                         "int_iec", "int_fum", "int_tild", "int_vac"]].sum(axis=1)
+    df["pob_imp"] = df[["pob_alo", "pob_viv"]].sum(axis=1)
+    df["pob_tot"] = df[["pob_imp", "pob_ben"]].sum(axis=1)
+    return df
+
+
+def leer_censo(ruta=CENSO_PATH):
+    """
+    Agregados censales indexados por código (municipio o departamento);
+    ``None`` si no se han generado
+    """
+    if not Path(ruta).exists():
+        return None
+    censo = pd.read_parquet(ruta)
+    censo["CODIGO"] = censo["CODIGO"].astype(str)
+    return censo.set_index("CODIGO")
+
+
+def procesar():
+    """
+    Ruta completa: devuelve (tabla, col_nombre, geojson, centro)
+    """
+    import geopandas as gpd
+
+    # CSV
+    df = leer_reporte(DATA_PATH)
+
+    # Shapefile
+    mun_cor = gpd.read_file(SHAPE_PATH).to_crs(epsg=4326)
+    mun_cor["mpio_cdpmp"] = mun_cor["mpio_cdpmp"].astype(str).str.zfill(5)
+
+    # Detectar columna de nombre si no existe
+    col_nom = COL_NOMBRE
+    if col_nom not in mun_cor.columns:
+        candidatas = [c for c in mun_cor.columns
+                      if any(k in c.lower() for k in ("nmbr", "nombre", "name"))]
+        col_nom = candidatas[0] if candidatas else mun_cor.columns[1]
+
+    # JOIN
+    df_agg = df.groupby("divipola")[COLUMNAS_NUMERICAS].sum().reset_index()
+    gdf = mun_cor.merge(df_agg, left_on="mpio_cdpmp", right_on="divipola", how="left")
+    gdf[COLUMNAS_NUMERICAS] = gdf[COLUMNAS_NUMERICAS].fillna(0)
+
+    # Geometría simplificada precalculada (geometria.py); si no existe, la completa
+    geojson = cargar_nivel(ZOOM_MAPA)
+    if geojson is None:
+        geojson = json.loads(gdf[["mpio_cdpmp", "geometry"]]
+                             .set_index("mpio_cdpmp").to_json())
+    centro  = {"lat": gdf.geometry.centroid.y.mean(),
+               "lon": gdf.geometry.centroid.x.mean()}
+
+    tabla = pd.DataFrame(gdf.drop(columns="geometry"))
+    return tabla, col_nom, geojson, centro
+
+
+def construir(ruta=ARTEFACTO):
+    """
+    Ejecuta ``procesar()`` y guarda el resultado en un único Parquet
+    """
+    tabla, col_nom, geojson, centro = procesar()
+    meta = {"col_nombre": col_nom, "centro": centro, "geojson": geojson}
+    esquema = pa.Schema.from_pandas(tabla, preserve_index=False)
+    esquema = esquema.with_metadata({**(esquema.metadata or {}),
+                                     _CLAVE_META: json.dumps(meta, separators=(",", ":"))})
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    pq.write_table(pa.Table.from_pandas(tabla, schema=esquema, preserve_index=False),
+                   temporal, compression="zstd")
+    temporal.replace(ruta)
+    return ruta
+
+
+def leer_artefacto(ruta=ARTEFACTO):
+    tabla = pq.read_table(ruta)
+    meta = json.loads(tabla.schema.metadata[_CLAVE_META])
+    return tabla.to_pandas(), meta["col_nombre"], meta["geojson"], meta["centro"]
+
+
+def cargar():
+    """
+    (tabla, col_nombre, geojson, centro) desde el artefacto si está vigente
+    """
+    if artefacto_vigente():
+        return leer_artefacto()
+    return procesar()
+
+
+if __name__ == "__main__":
+    ruta = construir()
+    print(f"Artefacto: {ruta} ({ruta.stat().st_size / 1024:,.0f} KB)")
@@ -0,0 +1,128 @@
+"""
+Geometría municipal simplificada y cuantizada para los mapas del dashboard.
+
+Genera, a partir de ``mun_cor.shp``, un GeoJSON por nivel de zoom en
+``build/``: la cobertura municipal se simplifica conservando los bordes
+compartidos entre municipios (sin huecos ni solapes) y las coordenadas se
+redondean a una grilla acorde con el tamaño de píxel del nivel. Las
+features solo llevan ``id`` = código DIVIPOLA, sin propiedades.
+
+Uso:
+
+    python dashboard_cordoba/geometria.py
+"""
+import json
+from pathlib import Path
+
+import shapely
+
+BASE_DIR   = Path(__file__).parent
+SHAPE_PATH = BASE_DIR / "mun_cor.shp"
+BUILD_DIR  = BASE_DIR / "build"
+COL_CODIGO = "mpio_cdpmp"
+ZOOM_MAPA  = 7   # zoom inicial de los mapas del dashboard
+
+# Zoom de mapbox -> (tolerancia de simplificación, grilla de cuantización) en grados.
+# A zoom z un píxel mide ~360 / (256 * 2**z) grados; la tolerancia es ~medio píxel.
+NIVELES = {
+    6:  (0.0100, 0.001),
+    7:  (0.0050, 0.0005),
+    9:  (0.0010, 0.0001),
+    11: (0.0002, 0.00002),
+}
+
+
+def ruta_nivel(zoom, build_dir=BUILD_DIR):
+    return Path(build_dir) / f"mun_cor_z{zoom}.geojson"
+
+
+def nivel_para_zoom(zoom, niveles=NIVELES):
+    """
+    Nivel más liviano que sigue viéndose correcto a ese zoom
+    (el primer nivel cuyo zoom es >= al pedido).
+    """
+    candidatos = [z for z in sorted(niveles) if z >= zoom]
+    return candidatos[0] if candidatos else max(niveles)
+
+
+def simplificar(geometrias, tolerancia):
+    """
+    Simplifica una cobertura poligonal conservando los bordes compartidos
+    """
+    if hasattr(shapely, "coverage_simplify"):
+        return shapely.coverage_simplify(geometrias, tolerancia)
+    return shapely.simplify(geometrias, tolerancia, preserve_topology=True)
+
+
+def _redondear(valor, decimales):
+    if isinstance(valor, float):
+        return round(valor, decimales)
+    if isinstance(valor, (list, tuple)):
+        return [_redondear(v, decimales) for v in valor]
+    if isinstance(valor, dict):
+        return {k: _redondear(v, decimales) for k, v in valor.items()}
+    return valor
+
+
+def geojson_minimo(gdf, geometrias, decimales):
+    """
+    FeatureCollection (texto) con ``id`` = código municipal, sin propiedades
+    y con las coordenadas escritas con ``decimales`` cifras.
+    """
+    features = [
+        {"type": "Feature", "id": codigo, "properties": {},
+         "geometry": _redondear(shapely.geometry.mapping(geom), decimales)}
+        for codigo, geom in zip(gdf[COL_CODIGO], geometrias)
+    ]
+    return json.dumps({"type": "FeatureCollection", "features": features},
+                      separators=(",", ":"))
+
+
+def construir(shape_path=SHAPE_PATH, build_dir=BUILD_DIR, niveles=NIVELES):
+    """
+    Escribe un GeoJSON por nivel y devuelve {nivel: bytes}, con el tamaño
+    del GeoJSON original (``gdf.to_json()``) en la clave ``"original"``.
+    """
+    import geopandas as gpd
+
+    build_dir = Path(build_dir)
+    build_dir.mkdir(parents=True, exist_ok=True)
+
+    gdf = gpd.read_file(shape_path).to_crs(epsg=4326)
+    gdf[COL_CODIGO] = gdf[COL_CODIGO].astype(str).str.zfill(5)
+
+    tamanos = {"original": len(gdf.to_json().encode("utf-8"))}
+    for zoom, (tolerancia, grilla) in sorted(niveles.items()):
+        geometrias = simplificar(gdf.geometry.values, tolerancia)
+        geometrias = shapely.set_precision(geometrias, grilla)
+        decimales = max(0, -int(f"{grilla:e}".split("e")[1]))
+        texto = geojson_minimo(gdf, geometrias, decimales)
+        ruta_nivel(zoom, build_dir).write_text(texto, encoding="utf-8")
+        tamanos[zoom] = len(texto.encode("utf-8"))
+    return tamanos
+
+
+def cargar_nivel(zoom, build_dir=BUILD_DIR):
+    """
+    GeoJSON precalculado para ``zoom`` o ``None`` si no se ha construido
+    """
+    ruta = ruta_nivel(nivel_para_zoom(zoom), build_dir)
+    if not ruta.exists():
+        return None
+    return json.loads(ruta.read_text(encoding="utf-8"))
+
+
+def informar(tamanos):
+    """
+    Imprime el tamaño de cada nivel frente al GeoJSON original
+    """
+    tamanos = dict(tamanos)
+    original = tamanos.pop("original")
+    print(f"GeoJSON original: {original / 1024:,.0f} KB")
+    for zoom, bytes_ in tamanos.items():
+        print(f"  zoom {zoom:>2}: {bytes_ / 1024:,.0f} KB "
+              f"({bytes_ / original:.1%} del original)")
+
+
+if __name__ == "__main__":
+    informar(construir())
@@ -0,0 +1,173 @@
+"""
+Histórico de reportes periódicos con agregación incremental por periodo.
+
+Cada reporte (mismo formato que ``data_cor.csv``) trae un periodo
+semanal (``2026-W14``) o epidemiológico (``2026-P03``), tomado del nombre
+del archivo o indicado al ingerirlo. Un histórico tiene un solo tipo de
+periodo: semanas y periodos epidemiológicos no se intercalan en un orden
+cronológico, así que ``ingestar`` rechaza un reporte del otro tipo.
+
+    historico/crudo/periodo=<p>/<sha256>.parquet   filas de cada reporte
+    historico/agregado/periodo=<p>.parquet         sumas por divipola
+    historico/_ingestados.json                     sha256 -> periodo, archivo
+
+Los reportes de un periodo con distinto nombre de archivo (una fuente cada
+uno) se suman. Un reporte con el mismo nombre que otro ya ingerido en su
+periodo es una corrección: reemplaza al anterior en vez de sumarse.
+Reingerir el mismo contenido no hace nada. Ingerir solo reescribe el
+agregado de su periodo; el dashboard lee únicamente los agregados de los
+periodos del rango pedido.
+
+Uso:
+
+    python dashboard_cordoba/historico.py reporte_2026-W14.csv [--periodo 2026-W14]
+"""
+import argparse
+import hashlib
+import json
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from datos import COLUMNAS_NUMERICAS, leer_reporte
+
+HISTORICO_DIR = Path(__file__).parent / "historico"
+PATRON_PERIODO = re.compile(r"(\d{4})[-_]?([WP])(\d{2})", re.IGNORECASE)
+
+
+def normalizar_periodo(texto):
+    """
+    ``2026w3`` / ``2026_P03`` / ``2026-W03`` -> ``2026-W03``
+    """
+    coincide = PATRON_PERIODO.search(str(texto))
+    if not coincide:
+        raise ValueError(f"Periodo no reconocido: {texto!r} (se espera AAAA-Wnn o AAAA-Pnn)")
+    anio, tipo, numero = coincide.groups()
+    return f"{anio}-{tipo.upper()}{int(numero):02d}"
+
+
+def clave_periodo(periodo):
+    """
+    ``2026-W03`` -> ``(2026, 'W', 3)``: orden cronológico dentro de un tipo
+    """
+    anio, tipo, numero = PATRON_PERIODO.search(periodo).groups()
+    return int(anio), tipo.upper(), int(numero)
+
+
+def _verificar_tipo(periodo, existentes):
+    """
+    ``ValueError`` si ``periodo`` no es del mismo tipo que ``existentes``
+    """
+    tipos = {clave_periodo(p)[1] for p in existentes}
+    if tipos and clave_periodo(periodo)[1] not in tipos:
+        raise ValueError(f"Periodo {periodo}: el histórico es de periodos "
+                         f"{'/'.join(sorted(tipos))}, no se mezclan tipos")
+
+
+def _ruta_manifiesto(base):
+    return Path(base) / "_ingestados.json"
+
+
+def _leer_manifiesto(base):
+    ruta = _ruta_manifiesto(base)
+    return json.loads(ruta.read_text(encoding="utf-8")) if ruta.exists() else {}
+
+
+def _escribir(df, ruta):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    df.to_parquet(temporal, index=False)
+    temporal.replace(ruta)
+
+
+def reagregar_periodo(periodo, base=HISTORICO_DIR):
+    """
+    Recalcula el agregado (divipola x indicadores) de un solo periodo
+    """
+    base = Path(base)
+    crudos = sorted((base / "crudo" / f"periodo={periodo}").glob("*.parquet"))
+    df = pd.concat([pd.read_parquet(r) for r in crudos], ignore_index=True)
+    agregado = df.groupby("divipola")[COLUMNAS_NUMERICAS].sum().reset_index()
+    agregado.insert(1, "periodo", periodo)
+    _escribir(agregado, base / "agregado" / f"periodo={periodo}.parquet")
+    return agregado
+
+
+def ingestar(ruta, periodo=None, base=HISTORICO_DIR):
+    """
+    Añade un reporte al histórico y actualiza solo el agregado de su periodo.
+    Si en el periodo ya hay un reporte con el mismo nombre de archivo, el
+    nuevo lo reemplaza.
+
+    Devuelve el periodo, o ``None`` si el archivo ya estaba ingerido.
+    """
+    base = Path(base)
+    ruta = Path(ruta)
+    periodo = normalizar_periodo(periodo or ruta.stem)
+    _verificar_tipo(periodo, periodos(base))
+    sha = hashlib.sha256(ruta.read_bytes()).hexdigest()
+
+    manifiesto = _leer_manifiesto(base)
+    if sha in manifiesto:
+        return None
+
+    crudos = base / "crudo" / f"periodo={periodo}"
+    df = leer_reporte(ruta)[["divipola"] + COLUMNAS_NUMERICAS]
+    _escribir(df, crudos / f"{sha}.parquet")
+    reemplazados = [s for s, e in manifiesto.items()
+                    if e["periodo"] == periodo and e["archivo"] == ruta.name]
+    for anterior in reemplazados:
+        (crudos / f"{anterior}.parquet").unlink(missing_ok=True)
+        del manifiesto[anterior]
+    reagregar_periodo(periodo, base)
+
+    manifiesto[sha] = {"periodo": periodo, "archivo": ruta.name}
+    _ruta_manifiesto(base).write_text(json.dumps(manifiesto, indent=1), encoding="utf-8")
+    return periodo
+
+
+def periodos(base=HISTORICO_DIR):
+    """
+    Periodos con agregado disponible, en orden cronológico
+    """
+    rutas = (Path(base) / "agregado").glob("periodo=*.parquet")
+    return sorted((r.stem.split("=", 1)[1] for r in rutas), key=clave_periodo)
+
+
+def leer_rango(desde, hasta, base=HISTORICO_DIR):
+    """
+    Suma por divipola de los agregados de los periodos en [desde, hasta]
+    (del mismo tipo que el histórico; si no, ``ValueError``)
+    """
+    disponibles = periodos(base)
+    _verificar_tipo(desde, disponibles)
+    _verificar_tipo(hasta, disponibles)
+    desde, hasta = clave_periodo(desde), clave_periodo(hasta)
+    elegidos = [p for p in disponibles if desde <= clave_periodo(p) <= hasta]
+    if not elegidos:
+        return pd.DataFrame(columns=["divipola"] + COLUMNAS_NUMERICAS)
+    partes = [pd.read_parquet(Path(base) / "agregado" / f"periodo={p}.parquet")
+              for p in elegidos]
+    return (pd.concat(partes, ignore_index=True)
+              .groupby("divipola")[COLUMNAS_NUMERICAS].sum().reset_index())
+
+
+def aplicar_rango(tabla, agregado):
+    """
+    Reemplaza los indicadores de ``tabla`` por los del rango (0 si no hay datos)
+    """
+    tabla = tabla.drop(columns=COLUMNAS_NUMERICAS + ["divipola"], errors="ignore")
+    tabla = tabla.merge(agregado, left_on="mpio_cdpmp", right_on="divipola", how="left")
+    tabla[COLUMNAS_NUMERICAS] = tabla[COLUMNAS_NUMERICAS].fillna(0)
+    return tabla
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingiere reportes periódicos al histórico")
+    parser.add_argument("archivos", nargs="+")
+    parser.add_argument("--periodo", help="AAAA-Wnn o AAAA-Pnn (por defecto, del nombre)")
+    args = parser.parse_args()
+    for archivo in args.archivos:
+        resultado = ingestar(archivo, args.periodo)
+        print(f"{archivo}: {'ya ingerido' if resultado is None else resultado}")
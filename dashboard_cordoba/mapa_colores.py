@@ -0,0 +1,91 @@
+"""
+Coropleta con geometría fija en el navegador (componente de Streamlit).
+
+``px.choropleth_mapbox`` reenvía el GeoJSON completo y todo el
+GeoDataFrame en cada rerun. Este componente sirve la geometría como
+archivo estático (se descarga una vez y queda en caché del navegador) y
+en cada cambio de variable solo recibe los valores, la escala de colores
+y los textos, que aplica con ``Plotly.update`` sin redibujar el mapa.
+
+``preparar()`` copia al directorio del componente la plantilla HTML,
+``plotly.min.js`` (del paquete plotly de Python, sin CDN) y el GeoJSON
+del nivel de zoom elegido; lo ejecuta ``build.py``.
+"""
+import json
+import shutil
+from pathlib import Path
+
+import plotly
+from plotly.colors import sequential
+import streamlit.components.v1 as components
+
+from geometria import BUILD_DIR, nivel_para_zoom, ruta_nivel
+
+COMPONENTE_DIR = BUILD_DIR / "mapa_colores"
+PLANTILLA      = Path(__file__).parent / "mapa_colores.html"
+PLOTLY_JS      = Path(plotly.__file__).parent / "package_data" / "plotly.min.js"
+
+_componente = components.declare_component("mapa_colores", path=str(COMPONENTE_DIR))
+
+
+def nombre_geojson(zoom):
+    return ruta_nivel(nivel_para_zoom(zoom)).name
+
+
+def preparar(zoom):
+    """
+    Copia HTML, plotly.js y el GeoJSON del nivel de ``zoom`` al componente
+    """
+    COMPONENTE_DIR.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(PLANTILLA, COMPONENTE_DIR / "index.html")
+    shutil.copyfile(PLOTLY_JS, COMPONENTE_DIR / "plotly.min.js")
+    origen = ruta_nivel(nivel_para_zoom(zoom))
+    shutil.copyfile(origen, COMPONENTE_DIR / origen.name)
+
+
+def preparado(zoom):
+    return all((COMPONENTE_DIR / f).exists()
+               for f in ("index.html", "plotly.min.js", nombre_geojson(zoom)))
+
+
+def escala_plotly(nombre):
+    """
+    Escala continua de plotly express como lista [[posición, color], ...]
+    """
+    colores = getattr(sequential, nombre)
+    n = len(colores) - 1
+    return [[i / n, c] for i, c in enumerate(colores)]
+
+
+def argumentos(ubicaciones, valores, nombres, escala, etiqueta, titulo,
+               titulo_barra, centro, zoom, altura=500):
+    """
+    Lo que viaja al navegador en cada rerun (sin geometría)
+    """
+    return {
+        "geojson":      nombre_geojson(zoom),
+        "ubicaciones":  list(ubicaciones),
+        "valores":      [float(v) for v in valores],
+        "nombres":      [str(n) for n in nombres],
+        "escala":       escala_plotly(escala),
+        "etiqueta":     etiqueta,
+        "titulo":       titulo,
+        "titulo_barra": titulo_barra,
+        "centro":       {"lat": float(centro["lat"]), "lon": float(centro["lon"])},
+        "zoom":         zoom,
+        "altura":       altura,
+    }
+
+
+def tamano_argumentos(args):
+    """
+    Bytes (JSON) enviados por rerun
+    """
+    return len(json.dumps(args, separators=(",", ":")).encode("utf-8"))
+
+
+def mapa_colores(key, **kwargs):
+    """
+    Dibuja (o actualiza) el mapa ``key`` con los argumentos de ``argumentos``
+    """
+    return _componente(key=key, default=None, **argumentos(**kwargs))
@@ -0,0 +1,62 @@
+"""
+Mapa de manzanas desde teselas vectoriales locales (componente de Streamlit).
+
+El navegador pide al servidor local (``servidor_teselas.py``) solo las
+teselas ``.pbf`` visibles; en cada rerun este componente recibe únicamente
+el indicador, sus cortes y la escala de colores. ``preparar()`` copia al
+directorio del componente la plantilla HTML y ``plotly.min.js``; lo
+ejecuta ``build.py``.
+"""
+import os
+import shutil
+from pathlib import Path
+
+import streamlit.components.v1 as components
+
+from geometria import BUILD_DIR
+from mapa_colores import PLOTLY_JS, escala_plotly
+from servidor_teselas import PUERTO
+
+COMPONENTE_DIR = BUILD_DIR / "mapa_teselas"
+PLANTILLA      = Path(__file__).parent / "mapa_teselas.html"
+# Dirección de las teselas vista desde el navegador
+TESELAS_URL    = os.environ.get("TESELAS_URL", f"http://localhost:{PUERTO}")
+
+_componente = components.declare_component("mapa_teselas", path=str(COMPONENTE_DIR))
+
+
+def preparar():
+    COMPONENTE_DIR.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(PLANTILLA, COMPONENTE_DIR / "index.html")
+    shutil.copyfile(PLOTLY_JS, COMPONENTE_DIR / "plotly.min.js")
+
+
+def preparado():
+    return all((COMPONENTE_DIR / f).exists() for f in ("index.html", "plotly.min.js"))
+
+
+def argumentos(metadatos, variable, etiqueta, escala, titulo, altura=550, url=TESELAS_URL):
+    """
+    Lo que viaja al navegador en cada rerun (sin geometría). La URL de las
+    teselas lleva la huella de la construcción (``?v=``): tras reconstruir,
+    el navegador no reutiliza las teselas anteriores de su caché.
+    """
+    version = metadatos["huella"][:16]
+    return {
+        "url":      f"{url}/{metadatos['capa']}/{{z}}/{{x}}/{{y}}.pbf?v={version}",
+        "capa":     metadatos["capa"],
+        "codigo":   metadatos["codigo"],
+        "zmin":     metadatos["zmin"],
+        "zmax":     metadatos["zmax"],
+        "centro":   metadatos["centro"],
+        "variable": variable,
+        "cortes":   metadatos["cortes"][variable],
+        "escala":   escala_plotly(escala),
+        "etiqueta": etiqueta,
+        "titulo":   titulo,
+        "altura":   altura,
+    }
+
+
+def mapa_teselas(key, **kwargs):
+    return _componente(key=key, default=None, **argumentos(**kwargs))
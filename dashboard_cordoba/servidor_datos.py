@@ -0,0 +1,411 @@
+"""
+API HTTP de solo lectura sobre los datos del dashboard (JSON o Arrow IPC).
+
+Los datos de ``cargar_datos`` solo se veían a través de la página de
+Streamlit, y cada consulta a la página vuelve a ejecutar todo ``app.py``.
+Este servidor local los entrega directamente:
+
+    GET /municipios[?desde=2026-W01&hasta=2026-W10]   agregados por municipio
+    GET /etv[?desde=...&hasta=...]                    casos de ETV por municipio
+    GET /geometria[?zoom=7]                           geometría simplificada (geometria.py)
+    GET /                                             rutas, versión de los datos y caché
+
+Cada ruta responde JSON (por defecto) o Arrow IPC (``?formato=arrow`` o
+``Accept: application/vnd.apache.arrow.stream``) con ``ETag`` (hash del
+cuerpo; ``If-None-Match`` responde 304) y queda en una caché LRU en
+memoria. Los datos son la instantánea compartida del proceso
+(``compartidos.py``), que se renueva en segundo plano cuando cambian las
+fuentes; la clave de la caché incluye su versión, así que reemplazar un
+archivo invalida las respuestas sin reiniciar el servidor.
+
+El servidor usa ``asyncio`` de la biblioteca estándar con conexiones
+persistentes: los aciertos de caché se responden en el bucle y los fallos
+se calculan en un pool de hilos, una sola vez por clave aunque varios
+clientes la pidan a la vez. Las peticiones con cuerpo y los errores del
+cliente (4xx) cierran la conexión después de responder; también se
+cierra si el cliente pasa ``INACTIVIDAD_S`` sin enviar una línea o excede
+los límites de cabeceras (``MAX_LINEA``, ``MAX_CABECERAS``).
+
+``iniciar()`` lo levanta en un hilo de fondo; también se puede ejecutar aparte:
+
+    python dashboard_cordoba/servidor_datos.py [--puerto 8766] [--hilos 4]
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+from compartidos import compartidos
+from datos import COLUMNAS_NUMERICAS
+from geometria import ZOOM_MAPA, cargar_nivel
+from historico import aplicar_rango, leer_rango, normalizar_periodo, periodos
+
+PUERTO          = int(os.environ.get("DATOS_PUERTO", 8766))
+HILOS           = 4
+MAX_RESPUESTAS  = 256              # entradas de la caché LRU
+MAX_BYTES_CACHE = 64 * 2 ** 20     # bytes de cuerpos en la caché LRU
+MAX_EDAD        = 60               # Cache-Control max-age (s)
+MAX_LINEA       = 8 * 2 ** 10      # bytes por línea de la petición o cabecera
+MAX_CABECERAS   = 100              # cabeceras por petición
+MAX_BYTES_CAB   = 32 * 2 ** 10     # bytes de cabeceras por petición
+# Espera máxima por cada línea de una conexión (s)
+INACTIVIDAD_S   = float(os.environ.get("DATOS_INACTIVIDAD_S", 30))
+
+TIPO_JSON   = "application/json"
+TIPO_ARROW  = "application/vnd.apache.arrow.stream"
+FORMATOS    = {"json": TIPO_JSON, "arrow": TIPO_ARROW}
+COLUMNAS_ETV = ["cas_den", "cas_lei", "cas_mal"]
+
+
+class ErrorConsulta(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+# ── Datos ────────────────────────────────────────────────────────────────────
+def _rango(instantanea, parametros):
+    """
+    Tabla del dashboard, con los indicadores de un rango de periodos si se pide
+    """
+    desde, hasta = parametros.get("desde"), parametros.get("hasta")
+    if desde is None and hasta is None:
+        return instantanea.tabla
+    disponibles = periodos()
+    if not disponibles:
+        raise ErrorConsulta(HTTPStatus.BAD_REQUEST, "no hay histórico de periodos")
+    try:
+        desde = normalizar_periodo(desde) if desde else disponibles[0]
+        hasta = normalizar_periodo(hasta) if hasta else disponibles[-1]
+        agregado = leer_rango(desde, hasta)
+    except ValueError as error:
+        raise ErrorConsulta(HTTPStatus.BAD_REQUEST, str(error)) from error
+    return aplicar_rango(instantanea.tabla, agregado)
+
+
+# ── Rutas ────────────────────────────────────────────────────────────────────
+def ruta_municipios(instantanea, parametros, formato):
+    tabla = _rango(instantanea, parametros)
+    return (tabla[["mpio_cdpmp", instantanea.col_nombre] + COLUMNAS_NUMERICAS]
+            .rename(columns={instantanea.col_nombre: "nombre"}))
+
+
+def ruta_etv(instantanea, parametros, formato):
+    # Mismos municipios que el gráfico de ETV: con algún caso, de mayor a menor
+    tabla = _rango(instantanea, parametros)
+    casos = (tabla[["mpio_cdpmp", instantanea.col_nombre] + COLUMNAS_ETV]
+             .rename(columns={instantanea.col_nombre: "nombre"}))
+    casos["total"] = casos[COLUMNAS_ETV].sum(axis=1)
+    casos = casos[casos[COLUMNAS_ETV].gt(0).any(axis=1)]
+    return casos.sort_values("total", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def ruta_geometria(instantanea, parametros, formato):
+    try:
+        zoom = int(parametros.get("zoom", ZOOM_MAPA))
+    except ValueError as error:
+        raise ErrorConsulta(HTTPStatus.BAD_REQUEST, "zoom debe ser entero") from error
+    geojson = cargar_nivel(zoom) or instantanea.geojson
+    if formato == "json":
+        return geojson
+    import shapely
+
+    features = geojson["features"]
+    geometrias = shapely.from_geojson([json.dumps(f["geometry"]) for f in features])
+    return pd.DataFrame({"mpio_cdpmp": [str(f["id"]) for f in features],
+                         "geometry": shapely.to_wkb(geometrias)})
+
+
+# Ruta -> (función, parámetros que acepta)
+RUTAS = {
+    "/municipios": (ruta_municipios, ("desde", "hasta")),
+    "/etv": (ruta_etv, ("desde", "hasta")),
+    "/geometria": (ruta_geometria, ("zoom",)),
+}
+
+
+def serializar(valor, formato):
+    """
+    Cuerpo de la respuesta: DataFrame como registros JSON o Arrow IPC;
+    cualquier otro valor como JSON
+    """
+    if not isinstance(valor, pd.DataFrame):
+        return json.dumps(valor, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if formato == "arrow":
+        tabla = pa.Table.from_pandas(valor, preserve_index=False)
+        salida = pa.BufferOutputStream()
+        with pa.ipc.new_stream(salida, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        return salida.getvalue().to_pybytes()
+    return valor.to_json(orient="records", force_ascii=False).encode("utf-8")
+
+
+class Respuesta:
+    def __init__(self, cuerpo, tipo):
+        self.cuerpo = cuerpo
+        self.tipo = tipo
+        self.etag = '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+
+
+def calcular(instantanea, ruta, parametros, formato):
+    funcion, _ = RUTAS[ruta]
+    return Respuesta(serializar(funcion(instantanea, parametros, formato), formato),
+                     FORMATOS[formato])
+
+
+# ── Caché ────────────────────────────────────────────────────────────────────
+class CacheLRU:
+    """
+    Respuestas por clave, limitadas en cantidad y en bytes; se descartan
+    las menos usadas recientemente
+    """
+
+    def __init__(self, max_entradas=MAX_RESPUESTAS, max_bytes=MAX_BYTES_CACHE):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+
+    def obtener(self, clave):
+        respuesta = self._entradas.get(clave)
+        if respuesta is None:
+            self.fallos += 1
+            return None
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return respuesta
+
+    def guardar(self, clave, respuesta):
+        if clave in self._entradas:
+            self.bytes -= len(self._entradas.pop(clave).cuerpo)
+        self._entradas[clave] = respuesta
+        self.bytes += len(respuesta.cuerpo)
+        while self._entradas and (len(self._entradas) > self.max_entradas
+                                  or self.bytes > self.max_bytes):
+            _, descartada = self._entradas.popitem(last=False)
+            self.bytes -= len(descartada.cuerpo)
+
+    def estado(self):
+        return {"entradas": len(self._entradas), "bytes": self.bytes,
+                "aciertos": self.aciertos, "fallos": self.fallos}
+
+
+# ── Servidor ─────────────────────────────────────────────────────────────────
+class ServidorDatos:
+    """
+    Atiende conexiones HTTP/1.1 en un bucle ``asyncio``; los cálculos van
+    a un pool de ``hilos``
+    """
+
+    def __init__(self, hilos=HILOS, cache=None, datos=None):
+        self.pool = ThreadPoolExecutor(hilos, thread_name_prefix="servidor_datos")
+        self.cache = cache or CacheLRU()
+        self.datos = datos or compartidos()
+        self._en_curso = {}
+
+    async def _en_hilo(self, funcion, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, funcion, *args)
+
+    async def instantanea(self):
+        """
+        Instantánea vigente; solo la primera carga sale del bucle
+        """
+        if self.datos.lista():
+            return self.datos.actual()
+        return await self._en_hilo(self.datos.actual)
+
+    def _terminar(self, clave, tarea):
+        self._en_curso.pop(clave, None)
+        if not tarea.cancelled() and tarea.exception() is None:
+            self.cache.guardar(clave, tarea.result())
+
+    async def respuesta(self, ruta, parametros, formato):
+        instantanea = await self.instantanea()
+        clave = (instantanea.version, ruta, formato, tuple(sorted(parametros.items())))
+        respuesta = self.cache.obtener(clave)
+        if respuesta is not None:
+            return respuesta
+        # Un solo cálculo por clave aunque lleguen varios clientes a la vez
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(
+                self._en_hilo(calcular, instantanea, ruta, parametros, formato))
+            tarea.add_done_callback(lambda t: self._terminar(clave, t))
+            self._en_curso[clave] = tarea
+        return await asyncio.shield(tarea)
+
+    def indice(self):
+        return {"rutas": {r: list(p) for r, (_, p) in RUTAS.items()},
+                "formatos": list(FORMATOS), "cache": self.cache.estado(),
+                "datos": self.datos.reporte()}
+
+    async def despachar(self, metodo, destino, cabeceras):
+        """
+        (estado, cabeceras, cuerpo) de una petición
+        """
+        if metodo not in ("GET", "HEAD"):
+            return _error(HTTPStatus.METHOD_NOT_ALLOWED, f"método {metodo} no permitido",
+                          {"Allow": "GET, HEAD"})
+        url = urlsplit(destino)
+        parametros = dict(parse_qsl(url.query))
+        if url.path == "/":
+            return HTTPStatus.OK, {"Content-Type": TIPO_JSON}, serializar(self.indice(), "json")
+        if url.path not in RUTAS:
+            return _error(HTTPStatus.NOT_FOUND, f"ruta {url.path} no existe")
+        formato = parametros.pop("formato", None)
+        if formato is None:
+            formato = "arrow" if TIPO_ARROW in cabeceras.get("accept", "") else "json"
+        if formato not in FORMATOS:
+            return _error(HTTPStatus.BAD_REQUEST, f"formato {formato} no soportado (json, arrow)")
+        _, aceptados = RUTAS[url.path]
+        parametros = {k: v for k, v in parametros.items() if k in aceptados}
+        try:
+            respuesta = await self.respuesta(url.path, parametros, formato)
+        except ErrorConsulta as error:
+            return _error(error.estado, str(error))
+
+        extra = {"ETag": respuesta.etag, "Cache-Control": f"public, max-age={MAX_EDAD}",
+                 "Vary": "Accept"}
+        etiquetas = [e.strip() for e in cabeceras.get("if-none-match", "").split(",")]
+        if respuesta.etag in etiquetas or "*" in etiquetas:
+            return HTTPStatus.NOT_MODIFIED, extra, b""
+        return HTTPStatus.OK, {"Content-Type": respuesta.tipo, **extra}, respuesta.cuerpo
+
+    async def atender(self, lector, escritor):
+        """
+        Una conexión: peticiones en secuencia mientras el cliente la mantenga
+        """
+        try:
+            while True:
+                linea = await _leer_linea(lector)
+                if not linea:
+                    break
+                partes = linea.decode("latin-1").split()
+                try:
+                    cabeceras = await _leer_cabeceras(lector)
+                except ErrorConsulta as error:
+                    await _escribir(escritor, *_error(error.estado, str(error)), persistente=False)
+                    break
+                if len(partes) != 3:
+                    await _escribir(escritor, *_error(HTTPStatus.BAD_REQUEST, "petición inválida"),
+                                    persistente=False)
+                    break
+                metodo, destino, version = partes
+                conexion = cabeceras.get("connection", "").lower()
+                # La API no lee cuerpos: tras una petición con cuerpo (o un
+                # error del cliente) no se sabe dónde empieza la siguiente,
+                # así que se responde y se cierra la conexión
+                persistente = (not _tiene_cuerpo(cabeceras)
+                               and (conexion != "close" if version == "HTTP/1.1"
+                                    else conexion == "keep-alive"))
+                try:
+                    estado, extra, cuerpo = await self.despachar(metodo, destino, cabeceras)
+                except Exception as error:  # la conexión sigue; el error va al cliente
+                    estado, extra, cuerpo = _error(HTTPStatus.INTERNAL_SERVER_ERROR,
+                                                   f"{type(error).__name__}: {error}")
+                if 400 <= estado < 500:
+                    persistente = False
+                await _escribir(escritor, estado, extra, cuerpo, persistente,
+                                cuerpo_vacio=metodo == "HEAD")
+                if not persistente:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError,
+                asyncio.TimeoutError):
+            # Cliente caído, línea más larga que MAX_LINEA o inactivo
+            pass
+        finally:
+            escritor.close()
+
+
+def _error(estado, mensaje, extra=None):
+    cuerpo = serializar({"error": mensaje}, "json")
+    return estado, {"Content-Type": TIPO_JSON, **(extra or {})}, cuerpo
+
+
+def _tiene_cuerpo(cabeceras):
+    return ("transfer-encoding" in cabeceras
+            or cabeceras.get("content-length", "0").strip() not in ("", "0"))
+
+
+async def _leer_linea(lector):
+    """
+    Una línea, con ``INACTIVIDAD_S`` de espera (``asyncio.TimeoutError``)
+    """
+    return await asyncio.wait_for(lector.readline(), INACTIVIDAD_S)
+
+
+async def _leer_cabeceras(lector):
+    """
+    Cabeceras de una petición, limitadas en cantidad y en bytes
+    """
+    cabeceras = {}
+    leidos = 0
+    while True:
+        linea = await _leer_linea(lector)
+        if linea in (b"\r\n", b"\n", b""):
+            return cabeceras
+        leidos += len(linea)
+        if len(cabeceras) >= MAX_CABECERAS or leidos > MAX_BYTES_CAB:
+            raise ErrorConsulta(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                "demasiadas cabeceras")
+        nombre, _, valor = linea.decode("latin-1").partition(":")
+        cabeceras[nombre.strip().lower()] = valor.strip()
+
+
+async def _escribir(escritor, estado, extra, cuerpo, persistente, cuerpo_vacio=False):
+    estado = HTTPStatus(estado)
+    lineas = [f"HTTP/1.1 {estado.value} {estado.phrase}",
+              f"Content-Length: {len(cuerpo)}",
+              "Access-Control-Allow-Origin: *",
+              f"Connection: {'keep-alive' if persistente else 'close'}"]
+    lineas += [f"{k}: {v}" for k, v in extra.items()]
+    # Cabecera y cuerpo en una sola escritura (un solo segmento si cabe)
+    cabecera = ("\r\n".join(lineas) + "\r\n\r\n").encode("latin-1")
+    escritor.write(cabecera if cuerpo_vacio else cabecera + cuerpo)
+    await escritor.drain()
+
+
+async def servir(servidor, sock):
+    async with await asyncio.start_server(servidor.atender, sock=sock, limit=MAX_LINEA) as red:
+        await red.serve_forever()
+
+
+def crear_socket(puerto=PUERTO, host="127.0.0.1"):
+    return socket.create_server((host, puerto))
+
+
+def iniciar(puerto=PUERTO, host="127.0.0.1", hilos=HILOS):
+    """
+    Sirve la API en un hilo de fondo; devuelve el ``ServidorDatos``, o
+    ``None`` si el puerto ya está ocupado (p. ej. otro proceso ya sirve).
+    """
+    try:
+        sock = crear_socket(puerto, host)
+    except OSError:
+        return None
+    servidor = ServidorDatos(hilos)
+    threading.Thread(target=asyncio.run, args=(servir(servidor, sock),), daemon=True,
+                     name="servidor_datos").start()
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API de solo lectura de los datos del dashboard")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--hilos", type=int, default=HILOS)
+    args = parser.parse_args()
+    print(f"Datos en http://{args.host}:{args.puerto}/", flush=True)
+    asyncio.run(servir(ServidorDatos(args.hilos), crear_socket(args.puerto, args.host)))
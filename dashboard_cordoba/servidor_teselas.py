@@ -0,0 +1,75 @@
+"""
+Servidor HTTP local de las teselas vectoriales (``build/teselas``).
+
+El mapa de manzanas pide al navegador solo las teselas ``{z}/{x}/{y}.pbf``
+visibles en pantalla. Este servidor las entrega desde disco con la
+biblioteca estándar (sin servicios externos), con CORS abierto para que
+el iframe del componente de Streamlit pueda leerlas y caché del navegador.
+La caché es segura porque el mapa pide las teselas con la huella de la
+construcción en la URL (``?v=<huella>``, ver ``mapa_teselas.argumentos``);
+el parámetro no cambia el archivo servido. Una tesela que no existe (zona sin manzanas) responde 204 vacío.
+
+``iniciar()`` lo levanta en un hilo de fondo; el dashboard lo llama una
+sola vez por proceso. También se puede ejecutar aparte:
+
+    python dashboard_cordoba/servidor_teselas.py [--puerto 8765]
+"""
+import argparse
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from teselas import TESELAS_DIR
+
+PUERTO = int(os.environ.get("TESELAS_PUERTO", 8765))
+
+
+class ManejadorTeselas(SimpleHTTPRequestHandler):
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map,
+                      ".pbf": "application/x-protobuf",
+                      ".json": "application/json"}
+
+    def end_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "public, max-age=3600")
+        super().end_headers()
+
+    def send_error(self, code, message=None, explain=None):
+        if code == 404 and urlsplit(self.path).path.endswith(".pbf"):
+            self.send_response(204)
+            self.end_headers()
+            return
+        super().send_error(code, message, explain)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def crear(puerto=PUERTO, directorio=TESELAS_DIR, host="127.0.0.1"):
+    manejador = partial(ManejadorTeselas, directory=str(directorio))
+    return ThreadingHTTPServer((host, puerto), manejador)
+
+
+def iniciar(puerto=PUERTO, directorio=TESELAS_DIR):
+    """
+    Sirve ``directorio`` en un hilo de fondo; devuelve el servidor, o
+    ``None`` si el puerto ya está ocupado (p. ej. otro proceso ya sirve).
+    """
+    try:
+        servidor = crear(puerto, directorio)
+    except OSError:
+        return None
+    threading.Thread(target=servidor.serve_forever, daemon=True,
+                     name="servidor_teselas").start()
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sirve las teselas vectoriales de build/teselas")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+    print(f"Teselas en http://{args.host}:{args.puerto}/ ({TESELAS_DIR})")
+    crear(args.puerto, host=args.host).serve_forever()
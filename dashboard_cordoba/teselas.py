@@ -0,0 +1,436 @@
+"""
+Teselas vectoriales (Mapbox Vector Tiles) de la capa de manzanas.
+
+La capa final de ``ris_mzn_mgn_cnpv.ipynb`` (GeoParquet o shapefile, con
+``HACIN``, los ``PCT_*`` y, si se calcularon, los Gi* ``GI_*`` de
+``miv.autocorrelacion``) tiene cientos de miles de polígonos a escala
+nacional: no cabe en un GeoJSON para ``px.choropleth_mapbox``. Aquí se
+corta en teselas ``{z}/{x}/{y}.pbf`` por nivel de zoom, cada nivel
+simplificado a su tamaño de píxel y cuantizado a la grilla de la tesela.
+Los valores de los indicadores viajan como atributos de cada polígono: el
+navegador recolorea cambiando solo el estilo, sin volver a pedir teselas.
+
+El codificador MVT (protobuf) está escrito aquí con NumPy, sin dependencias
+nuevas. El resultado queda en ``build/teselas/<capa>/`` junto con
+``teselas.json`` (zooms, columnas, rangos y huella de la fuente); si la
+fuente y los parámetros no cambiaron, ``construir()`` no rehace nada.
+
+Uso:
+
+    python dashboard_cordoba/teselas.py manzanas.parquet [--capa manzanas] [--zmin 10] [--zmax 15]
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import struct
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from geometria import BASE_DIR, BUILD_DIR
+
+MANZANAS_PATH = Path(os.environ.get("MANZANAS_PATH", BASE_DIR / "manzanas.parquet"))
+TESELAS_DIR   = BUILD_DIR / "teselas"
+CAPA          = "manzanas"
+COL_CODIGO    = "COD_DANE_A"
+ZMIN, ZMAX    = 10, 15
+EXTENSION     = 4096   # resolución interna de la tesela
+MARGEN        = 64     # borde extra (en unidades de tesela) para no ver cortes
+# Indicadores que la capa de ``miv`` no guarda si no se exportaron: se
+# derivan de sus conteos con las razones de ``miv.indicadores`` (el
+# dashboard se despliega sin ``miv``). Nombre -> (numeradores, denominador, escala)
+DERIVADOS = {
+    "PCT_ENERGIA":        (["TP19_EE_1"], "TVIVIENDA", 100),
+    "PCT_ACUEDUCTO":      (["TP19_ACU_1"], "TVIVIENDA", 100),
+    "PCT_ALCANTARILLADO": (["TP19_ALC_1"], "TVIVIENDA", 100),
+    "PCT_GAS":            (["TP19_GAS_1"], "TVIVIENDA", 100),
+    "PCT_BASURAS":        (["TP19_RECB1"], "TVIVIENDA", 100),
+    "HACIN":              (["TP27_PERSO"], "NDOR", 1),
+}
+# Puntos calientes (Gi*, miv.autocorrelacion): cortes fijos de significancia
+PREFIJO_GI    = "GI_"
+CORTES_GI     = [-2.58, -1.96, -1.65, 0, 1.65, 1.96, 2.58]
+
+_ORIGEN = math.pi * 6378137.0   # semieje de Web Mercator (EPSG:3857)
+
+
+# ── PROTOBUF MÍNIMO ─────────────────────────────────────────────────────────
+def _varint(n):
+    salida = bytearray()
+    while n > 0x7F:
+        salida.append((n & 0x7F) | 0x80)
+        n >>= 7
+    salida.append(n)
+    return bytes(salida)
+
+
+def _varints(valores):
+    """
+    Varints de un arreglo de enteros no negativos (< 2**35), y el largo en
+    bytes de cada uno, vectorizado.
+    """
+    valores = np.asarray(valores, dtype=np.uint64)
+    largos = np.ones(len(valores), dtype=np.int64)
+    for k in range(1, 5):
+        largos += valores >= (1 << (7 * k))
+    grupos = np.stack([(valores >> np.uint64(7 * k)) & np.uint64(0x7F) for k in range(5)], axis=1)
+    continua = np.arange(5)[None, :] < (largos[:, None] - 1)
+    grupos = (grupos | (continua * 0x80).astype(np.uint64)).astype(np.uint8)
+    usados = np.arange(5)[None, :] < largos[:, None]
+    return grupos[usados].tobytes(), largos
+
+
+def _clave(numero, tipo):
+    return _varint((numero << 3) | tipo)
+
+
+def _bytes(numero, contenido):
+    return _clave(numero, 2) + _varint(len(contenido)) + contenido
+
+
+_CLAVE_ID      = _clave(1, 0)
+_TIPO_POLIGONO = _clave(3, 0) + _varint(3)
+
+
+def _zigzag(d):
+    return (d << 1) ^ (d >> 63)
+
+
+# ── CODIFICACIÓN MVT ────────────────────────────────────────────────────────
+def _geometria_mvt(geometrias):
+    """
+    Comandos de geometría MVT de polígonos ya en coordenadas de tesela.
+
+    Devuelve los bytes de todos los comandos y, por geometría, el rango de
+    bytes que le corresponde (vacío si quedó sin anillos válidos).
+    """
+    n = len(geometrias)
+    partes, de_geom = shapely.get_parts(geometrias, return_index=True)
+    es_poligono = shapely.get_type_id(partes) == 3
+    partes, de_geom = partes[es_poligono], de_geom[es_poligono]
+    anillos, de_parte = shapely.get_rings(partes, return_index=True)
+    coords, de_anillo = shapely.get_coordinates(anillos, return_index=True)
+
+    # Sin el punto de cierre (ClosePath lo implica); anillos de < 3 puntos fuera
+    largo = np.bincount(de_anillo, minlength=len(anillos))
+    cierre = np.zeros(len(coords), dtype=bool)
+    cierre[np.cumsum(largo)[largo > 0] - 1] = True
+    coords, de_anillo = coords[~cierre], de_anillo[~cierre]
+    largo = np.bincount(de_anillo, minlength=len(anillos))
+    valido = largo >= 3
+    mantener = valido[de_anillo]
+    coords, de_anillo = np.rint(coords[mantener]).astype(np.int64), de_anillo[mantener]
+    anillos_validos = np.flatnonzero(valido)
+    largo = largo[anillos_validos]
+    geom_anillo = de_geom[de_parte[anillos_validos]]
+
+    # Deltas respecto del punto anterior; el cursor se reinicia en cada geometría
+    geom_coord = np.repeat(geom_anillo, largo)
+    deltas = np.diff(coords, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    inicio_geom = np.ones(len(coords), dtype=bool)
+    inicio_geom[1:] = geom_coord[1:] != geom_coord[:-1]
+    deltas[inicio_geom] = coords[inicio_geom]
+    deltas = _zigzag(deltas)
+
+    # Por anillo: MoveTo(1) x y LineTo(L-1) x y ... ClosePath
+    tam = 2 * largo + 3
+    fin_anillo = np.cumsum(tam)
+    ini_anillo = fin_anillo - tam
+    flujo = np.empty(int(tam.sum()), dtype=np.int64)
+    flujo[ini_anillo] = (1 << 3) | 1
+    flujo[ini_anillo + 3] = ((largo - 1) << 3) | 2
+    flujo[fin_anillo - 1] = (1 << 3) | 7
+    j = np.arange(len(coords)) - np.repeat(np.cumsum(largo) - largo, largo)
+    pos = np.repeat(ini_anillo, largo) + 1 + 2 * j + (j > 0)
+    flujo[pos] = deltas[:, 0]
+    flujo[pos + 1] = deltas[:, 1]
+
+    datos, bytes_por_valor = _varints(flujo)
+    desde, hasta = _rangos(bytes_por_valor, np.repeat(geom_anillo, tam), n)
+    return datos, desde, hasta
+
+
+def _rangos(bytes_por_valor, grupo, n):
+    """
+    Rango [desde, hasta) de bytes de cada grupo (valores contiguos por grupo)
+    """
+    fin = np.cumsum(bytes_por_valor)
+    desde = np.zeros(n, dtype=np.int64)
+    hasta = np.zeros(n, dtype=np.int64)
+    if len(grupo):
+        primero = np.r_[True, grupo[1:] != grupo[:-1]]
+        ultimo = np.r_[grupo[1:] != grupo[:-1], True]
+        desde[grupo[primero]] = (fin - bytes_por_valor)[primero]
+        hasta[grupo[ultimo]] = fin[ultimo]
+    return desde, hasta
+
+
+def _etiquetas(atributos, n):
+    """
+    Tabla de valores de la capa y, por feature, los pares (clave, valor)
+    ya codificados como varints; los nulos no se escriben.
+    """
+    valores = []
+    pares = np.full((n, len(atributos), 2), -1, dtype=np.int64)
+    for k, col in enumerate(atributos):
+        codigos, unicos = pd.factorize(pd.Series(atributos[col]), use_na_sentinel=True)
+        presentes = codigos >= 0
+        pares[presentes, k] = np.stack([np.full(presentes.sum(), k),
+                                        codigos[presentes] + len(valores)], axis=1)
+        valores.extend(unicos.tolist())
+    validos = pares[:, :, 0] >= 0
+    planos = pares[validos].ravel()
+    datos, bytes_por_valor = _varints(planos)
+    grupo = np.repeat(np.nonzero(validos)[0], 2)
+    desde, hasta = _rangos(bytes_por_valor, grupo, n)
+    return valores, datos, desde, hasta
+
+
+def _valor(v):
+    if isinstance(v, str):
+        return _bytes(1, v.encode("utf-8"))
+    return _clave(3, 1) + struct.pack("<d", float(v))
+
+
+def codificar_capa(nombre, geometrias, atributos, ids, extension=EXTENSION):
+    """
+    Bytes de una tesela con una sola capa ``nombre``.
+
+    ``geometrias`` son polígonos en coordenadas de tesela (enteros, válidos
+    y orientados), ``atributos`` un dict columna -> arreglo; los nulos no se
+    escriben.
+    """
+    n = len(geometrias)
+    datos, desde, hasta = _geometria_mvt(geometrias)
+    valores, tags, t_desde, t_hasta = _etiquetas(atributos, n)
+
+    capa = [_clave(15, 0) + _varint(2), _bytes(1, nombre.encode("utf-8"))]
+    for i in np.flatnonzero(hasta > desde):
+        feature = (_CLAVE_ID + _varint(int(ids[i]))
+                   + _bytes(2, tags[t_desde[i]:t_hasta[i]])
+                   + _TIPO_POLIGONO
+                   + _bytes(4, datos[desde[i]:hasta[i]]))
+        capa.append(_bytes(2, feature))
+    if len(capa) == 2:
+        return b""
+    capa += [_bytes(3, c.encode("utf-8")) for c in atributos]
+    capa += [_bytes(4, _valor(v)) for v in valores]
+    capa.append(_clave(5, 0) + _varint(extension))
+    return _bytes(3, b"".join(capa))
+
+
+# ── CORTE EN TESELAS ────────────────────────────────────────────────────────
+def tamano_tesela(z):
+    return 2 * _ORIGEN / 2 ** z
+
+
+def limites_tesela(z, x, y):
+    s = tamano_tesela(z)
+    xmin, ymax = -_ORIGEN + x * s, _ORIGEN - y * s
+    return xmin, ymax - s, xmin + s, ymax
+
+
+def teselas_de(limites, z):
+    """
+    {(x, y): índices de las geometrías cuyo bbox (EPSG:3857) toca la tesela}
+    """
+    s, n = tamano_tesela(z), 2 ** z
+    x0 = np.clip(((limites[:, 0] + _ORIGEN) // s).astype(np.int64), 0, n - 1)
+    x1 = np.clip(((limites[:, 2] + _ORIGEN) // s).astype(np.int64), 0, n - 1)
+    y0 = np.clip(((_ORIGEN - limites[:, 3]) // s).astype(np.int64), 0, n - 1)
+    y1 = np.clip(((_ORIGEN - limites[:, 1]) // s).astype(np.int64), 0, n - 1)
+    ancho, alto = x1 - x0 + 1, y1 - y0 + 1
+    cuantas = ancho * alto
+    indice = np.repeat(np.arange(len(limites)), cuantas)
+    k = np.arange(cuantas.sum()) - np.repeat(np.cumsum(cuantas) - cuantas, cuantas)
+    xs = x0[indice] + k % ancho[indice]
+    ys = y0[indice] + k // ancho[indice]
+    llave = xs * n + ys
+    orden = np.argsort(llave, kind="stable")
+    llaves, cortes = np.unique(llave[orden], return_index=True)
+    grupos = np.split(indice[orden], cortes[1:])
+    return {(int(l // n), int(l % n)): g for l, g in zip(llaves, grupos)}
+
+
+def _orientar(geometrias):
+    # MVT: anillo exterior con área positiva en coordenadas de tesela
+    if hasattr(shapely, "orient_polygons"):
+        return shapely.orient_polygons(geometrias, exterior_cw=False)
+    from shapely.geometry.polygon import orient
+    return np.array([orient(g) if g.geom_type == "Polygon" else
+                     shapely.multipolygons([orient(p) for p in g.geoms])
+                     for g in geometrias], dtype=object)
+
+
+def cortar_tesela(geometrias, z, x, y, extension=EXTENSION, margen=MARGEN):
+    """
+    Recorta ``geometrias`` (EPSG:3857) a la tesela y las pasa a la grilla
+    entera de ``extension`` x ``extension``.
+    """
+    xmin, ymin, xmax, ymax = limites_tesela(z, x, y)
+    escala = extension / (xmax - xmin)
+    borde = margen / escala
+    recortadas = shapely.clip_by_rect(geometrias, xmin - borde, ymin - borde,
+                                      xmax + borde, ymax + borde)
+    locales = shapely.transform(recortadas, lambda c: (c - [xmin, ymax]) * [escala, -escala])
+    locales = shapely.set_precision(locales, 1.0)
+    return _orientar(locales)
+
+
+def huella(fuente, parametros):
+    e = Path(fuente).stat()
+    texto = json.dumps([str(Path(fuente).resolve()), e.st_size, e.st_mtime_ns, parametros],
+                       sort_keys=True)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def ruta_metadatos(capa=CAPA, teselas_dir=TESELAS_DIR):
+    return Path(teselas_dir) / capa / "teselas.json"
+
+
+def leer_metadatos(capa=CAPA, teselas_dir=TESELAS_DIR):
+    """
+    Metadatos de la capa construida o ``None``
+    """
+    ruta = ruta_metadatos(capa, teselas_dir)
+    if not ruta.exists():
+        return None
+    return json.loads(ruta.read_text(encoding="utf-8"))
+
+
+def columnas_indicadores(gdf):
+    return [c for c in gdf.columns
+            if (c == "HACIN" or c.startswith(("PCT_", PREFIJO_GI)))
+            and pd.api.types.is_numeric_dtype(gdf[c])]
+
+
+def derivar_indicadores(gdf):
+    """
+    ``gdf`` con los ``DERIVADOS`` que no trae y cuyas columnas base sí
+    (NaN donde el denominador es 0 o nulo)
+    """
+    nuevas = {}
+    for nombre, (numeradores, denominador, escala) in DERIVADOS.items():
+        if nombre in gdf.columns or not {*numeradores, denominador} <= set(gdf.columns):
+            continue
+        numerador = sum(gdf[c].astype("float64") for c in numeradores)
+        divisor = gdf[denominador].astype("float64")
+        nuevas[nombre] = (numerador / divisor.where(divisor > 0) * escala).round(2)
+    return gdf.assign(**nuevas) if nuevas else gdf
+
+
+def leer_fuente(fuente, col_codigo=COL_CODIGO, columnas=None):
+    import geopandas as gpd
+
+    fuente = Path(fuente)
+    if fuente.suffix == ".parquet":
+        gdf = gpd.read_parquet(fuente)
+    else:
+        gdf = gpd.read_file(fuente)
+    gdf = derivar_indicadores(gdf)
+    columnas = columnas or columnas_indicadores(gdf)
+    if not columnas:
+        raise ValueError(f"{fuente}: sin indicadores para las teselas (HACIN, PCT_*, GI_*) "
+                         "ni columnas base para derivarlos")
+    gdf = gdf[[col_codigo] + columnas + [gdf.geometry.name]]
+    return gdf.to_crs(epsg=3857), columnas
+
+
+def construir(fuente=MANZANAS_PATH, capa=CAPA, zmin=ZMIN, zmax=ZMAX, columnas=None,
+              col_codigo=COL_CODIGO, teselas_dir=TESELAS_DIR, forzar=False):
+    """
+    Corta la capa de manzanas en teselas ``{z}/{x}/{y}.pbf`` y escribe
+    ``teselas.json``. Devuelve los metadatos; si la huella coincide con la
+    de la última construcción, no rehace nada.
+    """
+    parametros = {"capa": capa, "zmin": zmin, "zmax": zmax, "columnas": columnas,
+                  "codigo": col_codigo, "extension": EXTENSION, "margen": MARGEN,
+                  "derivados": DERIVADOS}
+    firma = huella(fuente, parametros)
+    previo = leer_metadatos(capa, teselas_dir)
+    if previo and previo["huella"] == firma and not forzar:
+        return previo
+
+    gdf, columnas = leer_fuente(fuente, col_codigo, columnas)
+    destino = Path(teselas_dir) / capa
+    if destino.exists():
+        shutil.rmtree(destino)
+
+    atributos = {col_codigo: gdf[col_codigo].astype(str).to_numpy()}
+    for col in columnas:
+        atributos[col] = gdf[col].astype("float64").round(2).to_numpy()
+    base = gdf.geometry.values.to_numpy() if hasattr(gdf.geometry.values, "to_numpy") \
+        else np.asarray(gdf.geometry.values)
+    ids = np.arange(len(gdf))
+
+    conteo = {}
+    for z in range(zmin, zmax + 1):
+        pixel = tamano_tesela(z) / 256
+        geometrias = shapely.simplify(base, pixel / 2, preserve_topology=True)
+        visibles = np.ones(len(geometrias), dtype=bool)
+        if z < zmax:
+            # Manzanas de menos de un píxel no se ven a este zoom
+            visibles = shapely.area(geometrias) >= pixel ** 2
+        indices = np.flatnonzero(visibles)
+        # El código de manzana (el atributo más pesado) solo en el zoom máximo
+        atributos_z = {k: v for k, v in atributos.items() if z == zmax or k != col_codigo}
+        bytes_z, n_z = 0, 0
+        for (x, y), sel in teselas_de(shapely.bounds(geometrias[indices]), z).items():
+            sel = indices[sel]
+            locales = cortar_tesela(geometrias[sel], z, x, y)
+            datos = codificar_capa(capa, locales, {k: v[sel] for k, v in atributos_z.items()},
+                                   ids[sel])
+            if not datos:
+                continue
+            ruta = destino / str(z) / str(x) / f"{y}.pbf"
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            ruta.write_bytes(datos)
+            bytes_z += len(datos)
+            n_z += 1
+        conteo[z] = {"teselas": n_z, "bytes": bytes_z}
+
+    limites = gdf.to_crs(epsg=4326).total_bounds.tolist()
+    valores = {c: gdf[c].replace([np.inf, -np.inf], np.nan).dropna() for c in columnas}
+    metadatos = {
+        "capa": capa,
+        "codigo": col_codigo,
+        "columnas": columnas,
+        "zmin": zmin,
+        "zmax": zmax,
+        "limites": limites,
+        "centro": {"lon": (limites[0] + limites[2]) / 2, "lat": (limites[1] + limites[3]) / 2},
+        # Cortes por cuantiles para la escala de colores de cada indicador
+        # (los Gi* con los umbrales de z de 90, 95 y 99 %)
+        "cortes": {c: (CORTES_GI if c.startswith(PREFIJO_GI)
+                       else v.quantile(np.linspace(0, 1, 6)).round(2).tolist() if len(v)
+                       else [0, 1])
+                   for c, v in valores.items()},
+        "teselas": conteo,
+        "huella": firma,
+    }
+    ruta_metadatos(capa, teselas_dir).write_text(json.dumps(metadatos, indent=1), encoding="utf-8")
+    return metadatos
+
+
+def informar(metadatos):
+    print(f"Capa '{metadatos['capa']}': {', '.join(metadatos['columnas'])}")
+    for z, c in metadatos["teselas"].items():
+        print(f"  zoom {z:>2}: {c['teselas']:,} teselas, {c['bytes'] / 1024:,.0f} KB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Corta la capa de manzanas en teselas MVT")
+    parser.add_argument("fuente", nargs="?", default=MANZANAS_PATH)
+    parser.add_argument("--capa", default=CAPA)
+    parser.add_argument("--zmin", type=int, default=ZMIN)
+    parser.add_argument("--zmax", type=int, default=ZMAX)
+    parser.add_argument("--codigo", default=COL_CODIGO)
+    parser.add_argument("--forzar", action="store_true")
+    args = parser.parse_args()
+    informar(construir(args.fuente, args.capa, args.zmin, args.zmax,
+                       col_codigo=args.codigo, forzar=args.forzar))